@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 
 class WordapiConfig(AppConfig):
-    name = 'wordapi'
+    name = 'apps.wordapi'
+    label = 'wordapi'
+
+    def ready(self):
+        # Connect model signal handlers (dictionary version bumps), and the SQLite WAL connection handler
+        from . import routing, signals
@@ -0,0 +1,158 @@
+""" Dictionary-Words / Anagram API - Response caching
+
+    The dictionary only changes when words are written (init_db, saves, deletes), so lookup responses can be reused until then.
+
+    - ResponseCache is an in-process LRU of response data, with a configurable size (WORDAPI_RESPONSE_CACHE_SIZE) and TTL in seconds (WORDAPI_RESPONSE_CACHE_TTL).
+      Responses of more than WORDAPI_RESPONSE_CACHE_MAX_ROWS rows (e.g. the words containing 'a') aren't kept: one would hold the memory of thousands of lookups.
+    - Keys are the view, its URL input and query-string (page, flags). The whole cache is dropped when the dictionary version stamp changes. See versioning.py.
+    - Cached 200 responses carry an ETag derived from the dictionary version and key, and conditional requests (If-None-Match) for them get a 304 without any lookup work.
+      Errors (404, 400) and uncached responses get neither.
+
+    Used on API views' GET methods with the @cached_response decorator.
+"""
+
+import functools, hashlib, threading, time
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from .renderers import PrerenderedJSON
+from .versioning import current_version
+
+
+class ResponseCache():
+    """ Thread-safe LRU of (status, data) entries with a time-to-live, scoped to one dictionary version.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (expires_at, status, data)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def size(self):
+        return getattr(settings, 'WORDAPI_RESPONSE_CACHE_SIZE', 1024)
+
+    def ttl(self):
+        return getattr(settings, 'WORDAPI_RESPONSE_CACHE_TTL', 300)
+
+    def max_rows(self):
+        return getattr(settings, 'WORDAPI_RESPONSE_CACHE_MAX_ROWS', 5000)
+
+    def enabled(self):
+        return self.size() > 0
+
+    def _check_version(self, version):
+        # Caller holds the lock
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        """ Cached (status, data) for a key at a dictionary version, or None.
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def set(self, key, version, status, data):
+        """ Cache (status, data) for a key at a dictionary version. False if the data has too many rows to be kept.
+        """
+        if data_rows(data) > self.max_rows():
+            return False
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl(), status, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size():
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'size': self.size(),
+            'ttl': self.ttl(),
+            'max_rows': self.max_rows(),
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def data_rows(data):
+    """ Number of rows in response data: items of its lists, those nested in dicts included (pages' results, grouped words), or of pre-rendered JSON
+    """
+    if isinstance(data, PrerenderedJSON):
+        return data.rows
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(data_rows(value) for value in data.values())
+    return 0
+
+
+def request_key(view, request, kwargs):
+    """ Cache key of a request to a view: view class, negotiated format, URL inputs and (sorted) query-string.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return (
+        type(view).__name__,
+        renderer.format if renderer is not None else None,
+        tuple(sorted(kwargs.items())),
+        tuple(sorted((name, tuple(values)) for name, values in request.query_params.lists())),
+    )
+
+
+def make_etag(version, key):
+    return '"%s"' % hashlib.md5(("%s:%r" % (version, key)).encode('utf-8')).hexdigest()
+
+
+def cached_response(get):
+    """ Decorator for API views' GET methods: serve from the response cache, with ETag / 304 support for cached 200s.
+
+        Only Responses with data (including 404 "None") are cached- not streamed responses, nor ones over the row limit.
+    """
+    @functools.wraps(get)
+    def wrapper(view, request, *args, **kwargs):
+        if not response_cache.enabled():
+            return get(view, request, *args, **kwargs)
+
+        version = current_version()
+        key = request_key(view, request, kwargs)
+
+        cached = response_cache.get(key, version)
+        if cached is not None:
+            status, data = cached
+            response = Response(data, status=status)
+        else:
+            response = get(view, request, *args, **kwargs)
+            cached = isinstance(response, Response) and response_cache.set(key, version, response.status_code, response.data)
+        if not cached or response.status_code != 200:
+            return response
+
+        etag = make_etag(version, key)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', "")):
+            response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    return wrapper
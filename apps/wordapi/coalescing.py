@@ -0,0 +1,124 @@
+""" Dictionary-Words / Anagram API - Request coalescing
+
+    Identical lookups arriving together (typeahead clients firing the same substring at once) are computed once: the first request runs the view,
+    concurrent requests with the same key wait for it and answer with its result. Database work then follows distinct lookups, not request count.
+
+    - Keys are the view, its URL input (normalized, e.g. lowercased for case-insensitive substring searches), negotiated format, query-string and the dictionary version.
+    - Waiting requests give up after WORDAPI_COALESCE_TIMEOUT seconds and run the view themselves, as they do if the first request fails.
+    - Only Responses with data are shared (each waiting request gets its own Response of the same data); streamed responses are not.
+    - Counts of requests run, coalesced and timed out, per view, are served at /api/metrics/.
+
+    Sits behind the response cache (see caching.py): a cache hit never waits, coalescing only covers misses. Switched off by WORDAPI_COALESCE_REQUESTS = False.
+    Used on API views' GET methods with the @coalesced_response decorator.
+"""
+
+import functools, threading
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from .caching import request_key
+from .renderers import NDJSONRenderer
+from .versioning import current_version
+
+
+class Flight():
+    """ One in-flight computation: set when done, with its result or error
+    """
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    """ Thread-safe: runs one call per key at a time, concurrent callers of the same key share its result.
+
+        Figures are kept per group (e.g. view name): calls run, calls coalesced (answered with another call's result) and waits timed out.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {} # key -> Flight
+        self._counts = {} # group -> {'executed', 'coalesced', 'timeouts'}
+
+    def _count(self, group, name):
+        # Caller holds the lock
+        counts = self._counts.setdefault(group, {'executed': 0, 'coalesced': 0, 'timeouts': 0})
+        counts[name] += 1
+
+    def do(self, key, fn, timeout=5.0, group=None):
+        """ (result of fn(), shared flag). Waits up to timeout seconds on a call in flight for the key; past that, or if it failed, calls fn() itself.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if leader:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                    self._count(group, 'executed')
+                flight.done.set()
+            return flight.result, False
+
+        if flight.done.wait(timeout) and flight.error is None:
+            with self._lock:
+                self._count(group, 'coalesced')
+            return flight.result, True
+
+        with self._lock:
+            self._count(group, 'timeouts' if flight.error is None else 'executed')
+        return fn(), False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self):
+        with self._lock:
+            return {group: dict(counts) for group, counts in self._counts.items()}
+
+
+request_flights = SingleFlight()
+
+
+def _timeout():
+    return getattr(settings, 'WORDAPI_COALESCE_TIMEOUT', 5.0)
+
+
+def coalesced_response(normalize=None):
+    """ Decorator for API views' GET methods: concurrent identical requests share one run of the view.
+
+        normalize: applied to URL inputs for the key, for views whose lookups ignore e.g. case.
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            renderer = getattr(request, 'accepted_renderer', None)
+            if not getattr(settings, 'WORDAPI_COALESCE_REQUESTS', True) or (renderer is not None and renderer.format == NDJSONRenderer.format):
+                return get(view, request, *args, **kwargs) # Streams are written from each request's own cursor
+
+            inputs = {name: normalize(value) for name, value in kwargs.items()} if normalize is not None else kwargs
+            key = (current_version(), request_key(view, request, inputs))
+            response, shared = request_flights.do(key, lambda: get(view, request, *args, **kwargs), _timeout(), type(view).__name__)
+            if not shared:
+                return response
+            if isinstance(response, Response):
+                return Response(response.data, status=response.status_code)
+            return get(view, request, *args, **kwargs) # No data to share
+
+        return wrapper
+    return decorator
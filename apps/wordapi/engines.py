@@ -0,0 +1,731 @@
+""" Dictionary-Words / Anagram API - In-process lookup engines
+
+    Lookups that never change between dictionary loads don't need the database on every request.
+    Engines here are in-memory structures built from Word/Alphagram data and served straight from the process.
+
+    - Engines build lazily on first use (or at WSGI startup, via warm_engines()), and rebuild when the dictionary version stamp changes. See versioning.py.
+    - While a rebuild runs, other threads keep serving the previous build instead of waiting.
+    - Each engine records its build time and approximate memory footprint, served at /api/engines/.
+    - Engines are optional, switched on or off by their settings flag. Views fall back to database queries when an engine is off.
+
+    - Engines that support it are updated in place by Word save/delete signals (see word_changed()), rather than rebuilt.
+    - Engines hold the default language's words only (see languages.py). Other languages are looked up with language-filtered queries,
+      and writes to their words leave engine builds current.
+
+    Engines:
+        AnagramIndex : alphagram -> words map, for AnagramView (and one-letter-away alphagrams, for NearAnagramView)
+        TrigramIndex : trigram -> word ids posting lists, for substring searches
+        LetterSetIndex : letter-set bitmask -> alphagrams, for finding every alphagram spelled from a set of letters (phrase anagrams)
+        RackIndex : letter-count matrix of every word (NumPy), for words spelled from a rack of letters
+        PatternIndex : (position, letter) -> word posting lists per word length, for crossword-style patterns
+        CompletionIndex : sorted label arrays (all, and per length), for prefix completion by bisect
+"""
+
+import bisect, heapq, itertools, re, sys, threading, time
+
+from array import array
+
+from django.conf import settings
+from django.db import DatabaseError
+
+try:
+    import numpy
+except ImportError: # Optional: RackIndex is off without it
+    numpy = None
+
+from .languages import default_scope
+from .models import *
+from .versioning import current_version
+
+
+###############
+##  Helpers  ##
+###############
+def deep_sizeof(obj):
+    """ Approximate memory footprint in bytes of an object and everything reachable through its containers.
+
+        Shared objects (e.g. interned strings) are only counted once.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+###################
+##  Base Engine  ##
+###################
+class DictionaryEngine():
+    """ Inheritable class for in-memory lookup structures built from dictionary data.
+
+        Subclasses set `name` and `setting`, and implement build() to return the engine's data, from words() / alphagrams(). Lookups go through data().
+    """
+    name = ""
+    setting = ""  # Settings flag switching the engine on/off
+    default_enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self.version = None
+        self.build_seconds = None
+        self.memory_bytes = None
+        self.language_id = None # Language built from, and its alphagram normalization
+        self.normalization = ""
+
+    def enabled(self):
+        return getattr(settings, self.setting, self.default_enabled)
+
+    def build(self):
+        raise NotImplementedError
+
+    def footprint(self, data):
+        return deep_sizeof(data)
+
+    def words(self):
+        """ Word queryset to build from: the default language's words
+        """
+        return Word.objects.filter(language_id=self.language_id)
+
+    def alphagrams(self):
+        """ Alphagram queryset to build from: the default language's alphagrams
+        """
+        return Alphagram.objects.filter(language_id=self.language_id)
+
+    def alphagram_of(self, label=""):
+        """ Alphagram label of a word-label, under the built language's normalization
+        """
+        return make_alphagram(label, self.normalization)
+
+    def rebuild(self, version=None):
+        """ Build the engine's data from the database, recording build time and memory footprint.
+        """
+        if version is None:
+            version = current_version()
+        language = default_scope()
+        self.language_id, self.normalization = language.id, language.normalization
+        start = time.perf_counter()
+        data = self.build()
+        self.build_seconds = time.perf_counter() - start
+        self.memory_bytes = self.footprint(data)
+        self._data, self.version = data, version
+        return data
+
+    def data(self):
+        """ The engine's data, for the current dictionary version.
+
+            Builds on first use. If stale, rebuilds, unless another thread is already rebuilding- then the previous build is served.
+        """
+        version = current_version()
+        if self._data is not None and self.version == version:
+            return self._data
+
+        if self._lock.acquire(blocking=self._data is None):
+            try:
+                if self._data is None or self.version != version:
+                    self.rebuild(version)
+            finally:
+                self._lock.release()
+        return self._data
+
+    def update(self, data, word, deleted=False):
+        """ Apply a single Word save/delete to built data, in place. Returns False if the engine can't, and needs a rebuild instead.
+        """
+        return False
+
+    def word_changed(self, word, from_version, to_version, deleted=False):
+        """ Keep a build that was current at from_version in step with one Word write, so it's current at to_version without a rebuild.
+
+            Called by Word save/delete signal handlers, after bumping the dictionary version. Words in other languages don't change the build.
+        """
+        if self._data is None or self.version != from_version:
+            return
+        with self._lock:
+            if self.version == from_version and (word.language_id != self.language_id or self.update(self._data, word, deleted)):
+                self.version = to_version
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'enabled': self.enabled(),
+            'built': self._data is not None,
+            'version': self.version,
+            'build_seconds': self.build_seconds,
+            'memory_bytes': self.memory_bytes,
+        }
+
+
+###############
+##  Engines  ##
+###############
+class AnagramIndex(DictionaryEngine):
+    """ Alphagram -> words map, for anagram lookups in O(1).
+
+        data:
+            words: alphagram label -> tuple of (word id, word label), ordered by label
+            subjects: word label -> alphagram label. None for homographs (labels on more than one word), which AnagramView doesn't resolve.
+    """
+    name = "anagrams"
+    setting = "WORDAPI_ANAGRAM_INDEX"
+
+    def build(self):
+        words = {}
+        subjects = {}
+        rows = self.words().order_by('label', 'id').values_list('id', 'label', 'alphagram__label')
+        for word_id, label, alpha_label in rows.iterator():
+            words.setdefault(alpha_label, []).append((word_id, label))
+            subjects[label] = None if label in subjects else alpha_label
+
+        return {
+            'words': {alpha_label: tuple(family) for alpha_label, family in words.items()},
+            'subjects': subjects,
+        }
+
+    def anagrams(self, label=""):
+        """ Anagrams of the word with this exact label, as a list of {'id', 'label'} dicts (as WordSerializer gives).
+
+            None if there's no single word by that label.
+        """
+        data = self.data()
+        alpha_label = data['subjects'].get(label)
+        if alpha_label is None:
+            return None
+
+        # The subject-word is the only word in its family with its label (homographs were ruled out above)
+        return [
+            {'id': word_id, 'label': word_label}
+            for word_id, word_label in data['words'][alpha_label]
+            if word_label != label
+        ]
+
+    def with_anagrams(self, words, include_anagrams=False, has_anagrams=False):
+        """ Add anagrams inline to a list of {'id', 'label'} word dicts, and/or keep only words that have anagrams.
+        """
+        return list(self.iter_with_anagrams(words, include_anagrams, has_anagrams))
+
+    def iter_with_anagrams(self, words, include_anagrams=False, has_anagrams=False):
+        """ with_anagrams() as a generator, over any iterable of word dicts (for streamed responses)
+        """
+        families = self.data()['words']
+        for word in words:
+            siblings = [
+                {'id': word_id, 'label': word_label}
+                for word_id, word_label in families.get(self.alphagram_of(word['label']), ())
+                if word_id != word['id']
+            ]
+            if has_anagrams and not siblings:
+                continue
+            yield dict(word, anagrams=siblings) if include_anagrams else word
+
+
+def trigrams(label=""):
+    """ Set of every 3-character substring of a label.
+    """
+    return {label[i:i + 3] for i in range(len(label) - 2)}
+
+
+class TrigramIndex(DictionaryEngine):
+    """ Trigram inverted index, for case-insensitive substring (icontains) searches of 3 or more characters.
+
+        Every substring of 3+ characters is made of trigrams, and only words containing all of them can match.
+        Searches walk the rarest trigram's posting list and verify each candidate with a plain substring check.
+        (Intersecting further posting lists first measured slower than verifying the rarest list's candidates outright.)
+
+        data:
+            labels: word id -> word label
+            postings: trigram -> array of word ids containing it
+    """
+    name = "trigrams"
+    setting = "WORDAPI_TRIGRAM_INDEX"
+    min_length = 3
+
+    def build(self):
+        labels = {}
+        postings = {}
+        for word_id, label in self.words().values_list('id', 'label').iterator():
+            labels[word_id] = label
+            for gram in trigrams(label):
+                postings.setdefault(gram, []).append(word_id)
+
+        return {
+            'labels': labels,
+            'postings': {gram: array('I', ids) for gram, ids in postings.items()},
+        }
+
+    def update(self, data, word, deleted=False):
+        # matches() reads without the lock: a word id is only ever in postings while it has a label
+        labels, postings = data['labels'], data['postings']
+
+        old_label = labels.get(word.id)
+        if old_label is not None:
+            for gram in trigrams(old_label):
+                postings[gram].remove(word.id)
+
+        if deleted:
+            labels.pop(word.id, None)
+        else:
+            labels[word.id] = word.label
+            for gram in trigrams(word.label):
+                postings.setdefault(gram, array('I')).append(word.id)
+        return True
+
+    def matches(self, substr=""):
+        """ Words containing substr (case-insensitive), as an unordered list of (label, id) tuples.
+
+            substr must be at least min_length characters.
+        """
+        substr = substr.lower()
+        data = self.data()
+        labels, postings = data['labels'], data['postings']
+
+        rarest = min((postings.get(gram, ()) for gram in trigrams(substr)), key=len)
+        # An id read from postings just before a concurrent update() removes it can have lost its label since: skipped
+        candidates = ((labels.get(word_id), word_id) for word_id in rarest)
+        return [(label, word_id) for label, word_id in candidates if label is not None and substr in label]
+
+    def search(self, substr=""):
+        """ Words containing substr (case-insensitive), as a list of {'id', 'label'} dicts ordered by label.
+        """
+        return list(self.iter_search(substr))
+
+    def iter_search(self, substr=""):
+        """ search() as a generator: matches are found and sorted up front, their dicts made as they're consumed (for streamed responses)
+        """
+        return ({'id': word_id, 'label': label} for label, word_id in sorted(self.matches(substr)))
+
+
+def letter_mask(label=""):
+    """ Bitmask of the distinct letters in a label. Letters share bits modulo 64, so masks rule alphagrams out, but don't prove a match.
+    """
+    mask = 0
+    for char in label:
+        mask |= 1 << (ord(char) % 64)
+    return mask
+
+
+class LetterCounts():
+    """ Letter-count vectors packed into one int: a fixed-width field per letter, with a guard bit on top of each field.
+
+        Vectors are compared and subtracted whole, with int arithmetic:
+            fits(vector, rack): every letter count in vector is at most rack's- ((rack | guards) - vector) keeps every guard bit
+            rack - vector: the letters left over, once vector fits
+    """
+    width = 8 # 7 bits of count (up to 127 of a letter), 1 guard bit
+
+    def __init__(self, letters=""):
+        self.shifts = {}
+        self.guards = 0
+        for letter in sorted(set(letters)):
+            self.add_letter(letter)
+
+    def add_letter(self, letter):
+        shift = len(self.shifts) * self.width
+        self.shifts[letter] = shift
+        self.guards |= 1 << (shift + self.width - 1)
+
+    def pack(self, label=""):
+        """ Packed vector of a label's letter counts. None if it has a letter outside the alphabet.
+        """
+        vector = 0
+        for char in label:
+            shift = self.shifts.get(char)
+            if shift is None:
+                return None
+            vector += 1 << shift
+        return vector
+
+    def fits(self, vector, rack):
+        guards = self.guards
+        return ((rack | guards) - vector) & guards == guards
+
+
+class LetterSetIndex(DictionaryEngine):
+    """ Alphagrams grouped by the set of letters they use, for finding every alphagram that can be spelled from some letters.
+
+        A rack rules out every group using a letter it doesn't have with one AND per group. Alphagrams in the remaining groups are
+        checked by letter counts, as packed vectors (see LetterCounts) computed at build time.
+
+        data:
+            counts: LetterCounts over every letter in the dictionary
+            by_mask: letter mask -> list of (alphagram label, packed letter counts), for alphagrams with words
+    """
+    name = "letter_sets"
+    setting = "WORDAPI_PHRASE_INDEX"
+
+    def build(self):
+        counts = LetterCounts()
+        by_mask = {}
+        for alpha_label in self.alphagrams().filter(word_count__gt=0).values_list('label', flat=True).iterator():
+            self._add(counts, by_mask, alpha_label)
+        return {'counts': counts, 'by_mask': by_mask}
+
+    def _add(self, counts, by_mask, alpha_label):
+        for letter in sorted(set(alpha_label) - set(counts.shifts)):
+            counts.add_letter(letter)
+        by_mask.setdefault(letter_mask(alpha_label), []).append((alpha_label, counts.pack(alpha_label)))
+
+    def footprint(self, data):
+        return deep_sizeof(data['by_mask'])
+
+    def update(self, data, word, deleted=False):
+        # Alphagrams left without words stay listed; they expand to no words
+        alpha_label = self.alphagram_of(word.label)
+        entries = data['by_mask'].get(letter_mask(alpha_label), ())
+        if not deleted and not any(label == alpha_label for label, vector in entries):
+            self._add(data['counts'], data['by_mask'], alpha_label)
+        return True
+
+    def alphagrams_within(self, letters=""):
+        """ (LetterCounts, list of (alphagram label, packed vector)) for alphagrams spelled from letters, each letter used at most as often as it's there.
+
+            The vector list is None if letters has a letter no alphagram uses.
+        """
+        data = self.data()
+        counts = data['counts']
+        rack = counts.pack(letters)
+        if rack is None:
+            return counts, None
+
+        excluded = ~letter_mask(letters)
+        return counts, [
+            (alpha_label, vector)
+            for mask, entries in data['by_mask'].items() if not mask & excluded
+            for alpha_label, vector in entries if counts.fits(vector, rack)
+        ]
+
+
+class RackIndex(DictionaryEngine):
+    """ Letter-count matrix of every word, for "which words can be spelled from these letters" in one vectorized pass.
+
+        Word i's count of each letter is column i (uint8). A rack's words are those where every count is at most the rack's- all(counts <= rack)-
+        compared over the whole dictionary in vectorized passes, instead of a Python loop over words. Needs NumPy.
+        The matrix is stored letter-major, (letters, words): each letter's pass reads one contiguous row (~10x faster than comparing word rows).
+
+        data:
+            columns: letter -> matrix row
+            matrix: uint8 array, (letters, words)
+            lengths: word lengths, in word order
+            ids, labels: word ids and labels, in word order (by label)
+    """
+    name = "racks"
+    setting = "WORDAPI_RACK_INDEX"
+
+    def enabled(self):
+        return numpy is not None and super(RackIndex, self).enabled()
+
+    def build(self):
+        rows = list(self.words().order_by('label', 'id').values_list('id', 'label').iterator())
+        labels = [label for word_id, label in rows]
+        columns = {letter: column for column, letter in enumerate(sorted(set("".join(labels))))}
+
+        # Every letter occurrence, as (letter, word) coordinates, counted into the matrix in one pass
+        lengths = numpy.fromiter((len(label) for label in labels), dtype=numpy.int64, count=len(labels))
+        letter_rows = numpy.repeat(numpy.arange(len(labels)), lengths)
+        letter_columns = numpy.fromiter((columns[char] for label in labels for char in label), dtype=numpy.int64, count=int(lengths.sum()))
+        matrix = numpy.zeros((len(columns), len(labels)), dtype=numpy.uint8)
+        numpy.add.at(matrix, (letter_columns, letter_rows), 1)
+
+        return {
+            'columns': columns,
+            'matrix': matrix,
+            'lengths': lengths.astype(numpy.uint16),
+            'ids': [word_id for word_id, label in rows],
+            'labels': labels,
+        }
+
+    def footprint(self, data):
+        return data['matrix'].nbytes + data['lengths'].nbytes + deep_sizeof([data['columns'], data['ids'], data['labels']])
+
+    def words_within(self, letters="", min_length=1, max_length=None, limit=None):
+        """ Words spelled from letters (each used at most as often as it's there), as {'id', 'label'} dicts, longest first, then by label
+        """
+        data = self.data()
+        columns, lengths = data['columns'], data['lengths']
+
+        rack = [0] * len(columns)
+        for char in letters:
+            if char in columns:
+                rack[columns[char]] = min(rack[columns[char]] + 1, 255)
+
+        max_length = min(max_length or len(letters), len(letters))
+        matches = (lengths >= min_length) & (lengths <= max_length)
+        for counts, allowed in zip(data['matrix'], rack):
+            numpy.logical_and(matches, counts <= allowed, out=matches)
+
+        rows = numpy.flatnonzero(matches)
+        rows = rows[numpy.argsort(-lengths[rows].astype(numpy.int32), kind='stable')][:limit] # Words are already by label
+
+        ids, labels = data['ids'], data['labels']
+        return [{'id': ids[row], 'label': labels[row]} for row in rows.tolist()]
+
+
+def normalize_pattern(pattern=""):
+    """ A word pattern, lowercased, with wildcards as '?' (any one letter) and '*' (any letters, or none).
+
+        '.' and '_' are accepted for '?' (which has to be URL-encoded in a path), and '%' for '*'. Runs of '*' are collapsed.
+    """
+    pattern = pattern.lower().translate(str.maketrans({'.': '?', '_': '?', '%': '*'}))
+    return re.sub(r'\*+', '*', pattern)
+
+
+def pattern_regex(pattern=""):
+    """ Compiled regular expression for a normalized pattern, matching whole labels
+    """
+    return re.compile("".join('.' if char == '?' else '.*' if char == '*' else re.escape(char) for char in pattern) + r'\Z')
+
+
+def _sorted_contains(rows, row):
+    position = bisect.bisect_left(rows, row)
+    return position < len(rows) and rows[position] == row
+
+
+class PatternIndex(DictionaryEngine):
+    """ Positional index of word labels, for patterns with fixed letters at fixed positions, e.g. l?st?n or ??ag*.
+
+        Words are bucketed by length. In a bucket, each (position, letter) has a sorted posting list of the words with that letter there.
+        A pattern's fixed letters- anchored from the start, or from the end after a '*'- select posting lists, which are intersected (smallest first,
+        by binary search) rather than matching a regex against every word. Only patterns with letters between two '*'s are checked by regex too, and only on the intersection.
+
+        data:
+            buckets: length -> {'ids', 'labels': words of that length, by label; 'postings': (position, letter) -> array of word indexes in the bucket}
+            alphabet: every letter in the dictionary
+    """
+    name = "patterns"
+    setting = "WORDAPI_PATTERN_INDEX"
+
+    def build(self):
+        buckets = {}
+        alphabet = set()
+        for word_id, label in self.words().order_by('label', 'id').values_list('id', 'label').iterator():
+            bucket = buckets.setdefault(len(label), {'ids': [], 'labels': [], 'postings': {}})
+            row = len(bucket['ids'])
+            bucket['ids'].append(word_id)
+            bucket['labels'].append(label)
+            for position, letter in enumerate(label):
+                bucket['postings'].setdefault((position, letter), []).append(row)
+            alphabet.update(label)
+
+        for bucket in buckets.values():
+            bucket['postings'] = {key: array('I', rows) for key, rows in bucket['postings'].items()}
+        return {'buckets': buckets, 'alphabet': "".join(sorted(alphabet))}
+
+    def _bucket_matches(self, bucket, anchored, regex):
+        """ Generator of (label, id) in a bucket with every anchored (position, letter), and matching regex if given- by label
+        """
+        labels, ids = bucket['labels'], bucket['ids']
+        if anchored:
+            lists = sorted((bucket['postings'].get(key, ()) for key in anchored), key=len)
+            rows = lists[0]
+            for other in lists[1:]:
+                if not rows:
+                    break
+                rows = [row for row in rows if _sorted_contains(other, row)]
+        else:
+            rows = range(len(labels))
+
+        for row in rows:
+            if regex is None or regex.match(labels[row]):
+                yield labels[row], ids[row]
+
+    def matches(self, pattern="", limit=None):
+        """ Words matching a normalized pattern, as a list of {'id', 'label'} dicts ordered by label
+        """
+        buckets = self.data()['buckets']
+        segments = pattern.split('*')
+        min_length = len(pattern) - (len(segments) - 1)
+
+        matched = []
+        if len(segments) == 1:
+            bucket = buckets.get(min_length)
+            if bucket is not None:
+                anchored = [(position, char) for position, char in enumerate(pattern) if char != '?']
+                matched.append(self._bucket_matches(bucket, anchored, None))
+        else:
+            prefix, suffix = segments[0], segments[-1]
+            regex = pattern_regex(pattern) if any(segments[1:-1]) else None # Letters between '*'s can't be anchored
+            for length in sorted(buckets):
+                if length < min_length:
+                    continue
+                anchored = [(position, char) for position, char in enumerate(prefix) if char != '?']
+                anchored += [(length - len(suffix) + position, char) for position, char in enumerate(suffix) if char != '?']
+                matched.append(self._bucket_matches(buckets[length], anchored, regex))
+
+        return [{'id': word_id, 'label': label} for label, word_id in itertools.islice(heapq.merge(*matched), limit)]
+
+    def alphabet(self):
+        return self.data()['alphabet']
+
+
+class CompletionIndex(DictionaryEngine):
+    """ Sorted arrays of distinct word labels, for prefix completions in O(log n + k), however many words share the prefix.
+
+        Labels with a prefix are a contiguous run of a sorted array, found by bisect.
+        Alphabetical completions are the first k of the run. Shortest-first completions take runs from per-length arrays, shortest length first.
+
+        data:
+            labels: distinct labels, sorted
+            counts: anagram count of each label, in the same order
+            by_length: length -> (labels of that length, sorted; their anagram counts)
+    """
+    name = "completions"
+    setting = "WORDAPI_COMPLETION_INDEX"
+
+    def build(self):
+        labels, counts, by_length = [], array('I'), {}
+        for label, anagram_count in self.words().order_by('label').values_list('label', 'anagram_count').iterator():
+            if labels and labels[-1] == label:
+                continue # Homographs complete once
+            labels.append(label)
+            counts.append(anagram_count)
+            length_labels, length_counts = by_length.setdefault(len(label), ([], array('I')))
+            length_labels.append(label)
+            length_counts.append(anagram_count)
+        return {'labels': labels, 'counts': counts, 'by_length': by_length}
+
+    def _run(self, labels, counts, prefix, limit):
+        """ Up to limit (label, anagram count) pairs starting with prefix, from sorted labels
+        """
+        run = []
+        position = bisect.bisect_left(labels, prefix)
+        for i in range(position, min(position + limit, len(labels))):
+            if not labels[i].startswith(prefix):
+                break
+            run.append((labels[i], counts[i]))
+        return run
+
+    def complete(self, prefix="", limit=10, by_length=False):
+        """ Up to limit completions of prefix, as (label, anagram count) pairs: alphabetical, or shortest first (then alphabetical)
+        """
+        data = self.data()
+        if not by_length:
+            return self._run(data['labels'], data['counts'], prefix, limit)
+
+        completions = []
+        for length in sorted(data['by_length']):
+            if len(completions) >= limit:
+                break
+            if length >= len(prefix):
+                labels, counts = data['by_length'][length]
+                completions += self._run(labels, counts, prefix, limit - len(completions))
+        return completions
+
+
+anagram_index = AnagramIndex()
+trigram_index = TrigramIndex()
+letter_set_index = LetterSetIndex()
+rack_index = RackIndex()
+pattern_index = PatternIndex()
+completion_index = CompletionIndex()
+
+ENGINES = [anagram_index, trigram_index, letter_set_index, rack_index, pattern_index, completion_index]
+
+
+def substring_anagrams(substr="", limit=10):
+    """ AnagramBySubstringView results from the trigram and anagram indexes: the first `limit` anagrams of words containing substr, by 2nd character.
+
+        A word is a result if another word in its alphagram family contains substr. The top results are kept with a bounded heap, not a full sort.
+    """
+    families = anagram_index.data()['words']
+
+    matched = {} # alphagram -> ids of words in that family containing substr
+    for label, word_id in trigram_index.matches(substr):
+        matched.setdefault(anagram_index.alphagram_of(label), []).append(word_id)
+
+    candidates = (
+        (word_label[1:], word_label, word_id)
+        for alpha_label, match_ids in matched.items()
+        for word_id, word_label in families.get(alpha_label, ())
+        if len(match_ids) > 1 or match_ids[0] != word_id
+    )
+    return [
+        {'id': word_id, 'label': word_label}
+        for tail, word_label, word_id in heapq.nsmallest(limit, candidates)
+    ]
+
+
+def rack_words(letters="", min_length=1, max_length=None, limit=None):
+    """ Words spelled from a rack of letters, as RackIndex.words_within() gives them, without NumPy.
+
+        From the letter-set and anagram indexes: alphagrams fitting in the rack, expanded to their words. Slower than the matrix, but no table scan.
+    """
+    known = letter_set_index.data()['counts'].shifts
+    counts, alphagrams = letter_set_index.alphagrams_within("".join(char for char in letters if char in known)) # Letters no word uses go unplayed
+    max_length = min(max_length or len(letters), len(letters))
+    families = anagram_index.data()['words']
+
+    words = sorted(
+        (-len(word_label), word_label, word_id)
+        for alpha_label, vector in alphagrams or ()
+        if min_length <= len(alpha_label) <= max_length
+        for word_id, word_label in families.get(alpha_label, ())
+    )
+    return [{'id': word_id, 'label': word_label} for length, word_label, word_id in words[:limit]]
+
+
+def blank_alphagrams(letters="", blanks=1, alphabet="", normalization=""):
+    """ Generator of alphagram labels for letters plus `blanks` unknown letters (blank tiles): one per way of filling the blanks from alphabet
+    """
+    for filling in itertools.combinations_with_replacement(alphabet, blanks):
+        yield make_alphagram(letters + "".join(filling), normalization)
+
+
+def blank_anagrams(letters="", blanks=1, alphabet="", limit=None):
+    """ Words that are anagrams of letters plus blank tiles, from alphagram probes of the anagram index, as {'id', 'label'} dicts ordered by label
+    """
+    families = anagram_index.data()['words']
+    found = set()
+    for alpha_label in blank_alphagrams(letters, blanks, alphabet, anagram_index.normalization):
+        found.update(families.get(alpha_label, ()))
+    return [{'id': word_id, 'label': label} for word_id, label in sorted(found, key=lambda word: (word[1], word[0]))[:limit]]
+
+
+def near_alphagrams(alpha_label="", alphabet=""):
+    """ Generator of (change, letter, alphagram label) for the alphagrams one letter away from an alphagram: ('added', letter, ...) for each letter
+        of alphabet inserted, ('removed', letter, ...) for each distinct letter taken out. Alphagrams are sorted, so each is built by a slice, not a sort.
+    """
+    for letter in alphabet:
+        position = bisect.bisect(alpha_label, letter)
+        yield 'added', letter, alpha_label[:position] + letter + alpha_label[position:]
+    for letter in sorted(set(alpha_label)):
+        position = alpha_label.index(letter)
+        if len(alpha_label) > 1:
+            yield 'removed', letter, alpha_label[:position] + alpha_label[position + 1:]
+
+
+def near_anagrams(letters="", alphabet=""):
+    """ Words one letter away from an anagram of letters, from one anagram index probe per neighbouring alphagram.
+
+        Grouped by the letter added or removed: {'added': {letter: [{'id', 'label'}, ...]}, 'removed': {...}}, words ordered by label.
+    """
+    families = anagram_index.data()['words']
+    groups = {'added': {}, 'removed': {}}
+    for change, letter, alpha_label in near_alphagrams(anagram_index.alphagram_of(letters), alphabet):
+        family = families.get(alpha_label)
+        if family:
+            groups[change][letter] = [{'id': word_id, 'label': label} for word_id, label in family]
+    return groups
+
+
+def warm_engines():
+    """ Build every enabled engine now, rather than on first request. Called at WSGI startup.
+
+        Skipped quietly if the database isn't set up yet (e.g. before migrations).
+    """
+    for engine in ENGINES:
+        if engine.enabled():
+            try:
+                engine.data()
+            except DatabaseError:
+                pass
@@ -0,0 +1,564 @@
+""" Dictionary-Words / Anagram API - Bulk dictionary ingestion
+
+    Loads a dictionary file into Word and Alphagram data without going through Word.save() per line.
+
+    - The dictionary file is streamed line by line, but bulk loads still hold the whole dictionary in memory: every word's id and label,
+      grouped into anagram families, and every word's alphagram label.
+    - Alphagrams are resolved in memory (label -> id map, within the dictionary's language), so no per-word alphagram queries are made.
+    - Alphagram rows are inserted first, then Word rows, in chunked transactions. Bulk loads assign their own ids, so anagram family
+      columns are inserted with the rows instead of updated afterwards.
+
+    Lowercasing, palindrome flags and alphagrams use the same label helpers as Word.save(), so results match a save()-based load.
+
+    Derived tables (e.g. ShortSubstring) are also generated here, after words are loaded and the dictionary version bumped.
+
+    Dictionaries already in data are updated incrementally (sync_dictionary()): a sorted merge of the file against the language's words,
+    then only the inserts and deletes, with their alphagrams created, refreshed or dropped, in one transaction per batch.
+"""
+
+import bisect, json, threading, time
+
+from collections import namedtuple
+from itertools import chain, count, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .languages import default_language_id
+from .models import Alphagram, ShortSubstring, Word, WordDefinition, WordLanguage, make_alphagram, is_palindrome_label, SUBSTRING_ANAGRAM_LIMIT
+from .versioning import bump_deferred, current_version
+
+
+IngestReport = namedtuple('IngestReport', ['words', 'alphagrams', 'seconds'])
+
+SyncReport = namedtuple('SyncReport', ['inserted', 'deleted', 'alphagrams_created', 'alphagrams_deleted', 'seconds'])
+
+# One difference between a dictionary file and data: a label to insert (word_id None), or a word row to delete
+DictionaryChange = namedtuple('DictionaryChange', ['label', 'word_id', 'alphagram_id'])
+
+
+def read_dictionary_labels(dict_file="data/dictionary.txt"):
+    """ Generator of word-labels from a dictionary file, one per non-empty line, lowercased.
+    """
+    with open(dict_file, "r") as f:
+        for line in f:
+            label = line.strip().lower()
+            if label:
+                yield label
+
+
+def chunked(iterable, size):
+    """ Generator of lists of up to `size` items from any iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalization_of(language=None):
+    """ Alphagram normalization of a language (none for words without one)
+    """
+    return language.normalization if language is not None else ""
+
+
+def alphagram_id_map(language=None):
+    """ Dict of every alphagram label in data to its id, for a language.
+    """
+    return dict(Alphagram.objects.filter(language=language).values_list('label', 'id'))
+
+
+def bulk_create_words(labels, alpha_ids, language=None, batch_size=5000):
+    """ bulk_create Word rows for an iterable of (already lowercased) labels, in chunked transactions.
+
+        Every label's alphagram must already be in alpha_ids. Returns the number of words created.
+    """
+    word_count = 0
+    normalization = normalization_of(language)
+    for chunk in chunked(labels, batch_size):
+        with transaction.atomic():
+            Word.objects.bulk_create([
+                Word(
+                    label=label,
+                    language=language,
+                    alphagram_id=alpha_ids[make_alphagram(label, normalization)],
+                    is_palindrome=is_palindrome_label(label),
+                )
+                for label in chunk
+            ])
+        word_count += len(chunk)
+    return word_count
+
+
+def family_map(words):
+    """ Dict of alphagram id -> list of (id, label) of words in the family, ordered by label, from a Word queryset.
+    """
+    families = {}
+    rows = words.order_by('label', 'id').values_list('id', 'label', 'alphagram_id')
+    for word_id, label, alpha_id in rows.iterator():
+        families.setdefault(alpha_id, []).append((word_id, label))
+    return families
+
+
+def refresh_families(alpha_ids=None, batch_size=5000, languages=None):
+    """ Recompute denormalized anagram family data (Alphagram.family/word_count, Word.anagram_count) in bulk.
+
+        For the given alphagram ids, or every alphagram (of the given languages, if any). One pass over their words, then chunked bulk updates.
+    """
+    if alpha_ids is None:
+        words, alphagrams = Word.objects.all(), Alphagram.objects.all()
+        if languages is not None:
+            words, alphagrams = words.filter(language__in=languages), alphagrams.filter(language__in=languages)
+        families = family_map(words)
+        alpha_ids = list(alphagrams.values_list('id', flat=True))
+    else:
+        alpha_ids = sorted(set(alpha_ids))
+        families = {}
+        for chunk in chunked(alpha_ids, 500):
+            families.update(family_map(Word.objects.filter(alphagram_id__in=chunk)))
+
+    # Plain executemany of UPDATE by primary key: bulk_update()'s CASE expressions are far slower at this row count
+    update_sql = "UPDATE %s SET word_count = %%s, family = %%s WHERE id = %%s" % connection.ops.quote_name(Alphagram._meta.db_table)
+
+    ids_by_anagram_count = {}
+    for chunk in chunked(alpha_ids, batch_size):
+        updates = []
+        for alpha_id in chunk:
+            family = families.get(alpha_id, [])
+            updates.append((len(family), json.dumps(family), alpha_id))
+            ids_by_anagram_count.setdefault(max(len(family) - 1, 0), []).append(alpha_id)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(update_sql, updates)
+
+    # Words share their family's anagram_count: one UPDATE per count, per chunk of alphagrams
+    for anagram_count, count_alpha_ids in ids_by_anagram_count.items():
+        for chunk in chunked(count_alpha_ids, 500):
+            with transaction.atomic():
+                Word.objects.filter(alphagram_id__in=chunk).exclude(anagram_count=anagram_count).update(anagram_count=anagram_count)
+
+
+def next_id(model):
+    """ First primary key past every row of a model in data (for loads that assign their own ids).
+    """
+    return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+
+def insert_rows(model, fields, rows, batch_size=5000):
+    """ Plain executemany INSERT of value tuples (in `fields` order, ready for the database) into a model's table, in chunked transactions.
+
+        Skips bulk_create()'s per-instance model and field preparation, which dominates at dictionary scale. Returns the number of rows inserted.
+    """
+    quote_name = connection.ops.quote_name
+    columns = [quote_name(model._meta.get_field(name).column) for name in fields]
+    insert_sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        quote_name(model._meta.db_table), ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+    row_count = 0
+    for chunk in chunked(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(insert_sql, chunk)
+        row_count += len(chunk)
+    return row_count
+
+
+def bulk_load_dictionary(dict_file="data/dictionary.txt", language=None, batch_size=5000):
+    """ Stream a dictionary file into data with bulk inserts.
+
+        Two passes over the file: the first groups labels into anagram families (under the language's normalization), the second inserts words.
+        Word and new Alphagram ids are assigned here (words in file order, alphagrams in label order), so family, word_count and anagram_count
+        are inserted with their rows rather than updated afterwards. Only families already in data (from an earlier load into the language)
+        are refreshed: other dictionaries are left alone. Expects no other writers during the load.
+        Returns an IngestReport of rows created and seconds taken.
+    """
+    start = time.perf_counter()
+    normalization = normalization_of(language)
+    language_id = language.pk if language is not None else None
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    # Pass 1: families of the file's words, with the ids they'll be inserted under
+    first_word_id = next_id(Word)
+    families, word_alphagrams = {}, []
+    for word_id, label in enumerate(read_dictionary_labels(dict_file), first_word_id):
+        alpha_label = make_alphagram(label, normalization)
+        families.setdefault(alpha_label, []).append((word_id, label))
+        word_alphagrams.append(alpha_label)
+
+    alpha_ids = alphagram_id_map(language)
+    new_labels = sorted(set(families) - set(alpha_ids))
+    alpha_ids.update(zip(new_labels, count(next_id(Alphagram))))
+    insert_rows(
+        Alphagram,
+        ['id', 'label', 'language', 'created_at', 'word_count', 'family'],
+        (
+            (alpha_ids[alpha_label], alpha_label, language_id, created_at, len(families[alpha_label]), json.dumps(sorted(families[alpha_label], key=itemgetter(1, 0))))
+            for alpha_label in new_labels
+        ),
+        batch_size=batch_size,
+    )
+
+    # Pass 2: words, in the same order as pass 1. Words joining families already in data are counted by the refresh below.
+    word_count = insert_rows(
+        Word,
+        ['id', 'label', 'language', 'alphagram', 'is_palindrome', 'anagram_count', 'created_at'],
+        (
+            (word_id, label, language_id, alpha_ids[alpha_label], is_palindrome_label(label), max(len(families[alpha_label]) - 1, 0), created_at)
+            for word_id, (label, alpha_label) in enumerate(zip(read_dictionary_labels(dict_file), word_alphagrams), first_word_id)
+        ),
+        batch_size=batch_size,
+    )
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Alphagram, Word]):
+            cursor.execute(sql)
+
+    existing = set(families) - set(new_labels)
+    if existing:
+        refresh_families([alpha_ids[alpha_label] for alpha_label in existing], batch_size=batch_size)
+
+    return IngestReport(word_count, len(new_labels), time.perf_counter() - start)
+
+
+def sorted_dictionary_labels(dict_file="data/dictionary.txt"):
+    """ Distinct word-labels of a dictionary file, sorted (as SQLite orders them: by code point)
+    """
+    return sorted(set(read_dictionary_labels(dict_file)))
+
+
+def diff_dictionary(labels, words):
+    """ Generator of DictionaryChanges turning words in data into a dictionary, by sorted merge.
+
+        labels: sorted, distinct word-labels. words: (id, label, alphagram id) rows ordered by label, then id.
+        Labels not in data are inserted, words not in the dictionary deleted- and so are repeats of a label (from a dictionary loaded twice), past its first word.
+    """
+    labels, words = iter(labels), iter(words)
+    label, word = next(labels, None), next(words, None)
+    previous = None
+    while word is not None:
+        word_id, word_label, alpha_id = word
+        if word_label == previous:
+            yield DictionaryChange(word_label, word_id, alpha_id) # Repeat
+            word = next(words, None)
+        elif label is not None and label < word_label:
+            yield DictionaryChange(label, None, None)
+            label = next(labels, None)
+        else:
+            if label == word_label:
+                label = next(labels, None)
+            else:
+                yield DictionaryChange(word_label, word_id, alpha_id)
+            previous = word_label
+            word = next(words, None)
+    while label is not None:
+        yield DictionaryChange(label, None, None)
+        label = next(labels, None)
+
+
+def delete_rows(model, ids):
+    """ DELETE a model's rows by primary key, in chunks, without loading them or sending delete signals. Returns the number deleted.
+    """
+    deleted = 0
+    delete_sql = "DELETE FROM %s WHERE %s IN (%%s)" % (connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(model._meta.pk.column))
+    with connection.cursor() as cursor:
+        for chunk in chunked(ids, 500):
+            cursor.execute(delete_sql % ", ".join(["%s"] * len(chunk)), chunk)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def alphagram_ids(alpha_labels, language=None, batch_size=5000):
+    """ Alphagram label -> id map for the given alphagram labels of a language, creating the ones not yet in data.
+
+        Returns (number created, map).
+    """
+    alpha_labels = sorted(set(alpha_labels))
+    alpha_ids = {}
+    for chunk in chunked(alpha_labels, 500):
+        alpha_ids.update(Alphagram.objects.filter(language=language, label__in=chunk).values_list('label', 'id'))
+
+    new_labels = [label for label in alpha_labels if label not in alpha_ids]
+    for chunk in chunked(new_labels, batch_size):
+        Alphagram.objects.bulk_create([Alphagram(label=label, language=language) for label in chunk])
+    for chunk in chunked(new_labels, 500):
+        alpha_ids.update(Alphagram.objects.filter(language=language, label__in=chunk).values_list('label', 'id'))
+
+    return len(new_labels), alpha_ids
+
+
+def apply_dictionary_changes(changes, language=None, batch_size=5000):
+    """ Apply DictionaryChanges to a language's words, one transaction per batch of changes.
+
+        Each batch deletes and inserts its words, creates the alphagrams new words need, refreshes the families it touched
+        and drops alphagrams left without words, so data is consistent after every batch. Sends no signals: see sync_dictionary().
+        Returns (words inserted, words deleted, alphagrams created, alphagrams deleted).
+    """
+    normalization = normalization_of(language)
+    inserted = deleted = alphagrams_created = alphagrams_deleted = 0
+
+    for chunk in chunked(changes, batch_size):
+        labels = [change.label for change in chunk if change.word_id is None]
+        removed = [change for change in chunk if change.word_id is not None]
+
+        with transaction.atomic():
+            word_ids = [change.word_id for change in removed]
+            for ids in chunked(word_ids, 500):
+                WordDefinition.objects.filter(word_id__in=ids).delete()
+            deleted += delete_rows(Word, word_ids)
+
+            created, alpha_ids = alphagram_ids((make_alphagram(label, normalization) for label in labels), language, batch_size)
+            alphagrams_created += created
+            inserted += bulk_create_words(labels, alpha_ids, language=language, batch_size=batch_size)
+
+            touched = set(alpha_ids.values()) | {change.alphagram_id for change in removed}
+            refresh_families(touched, batch_size=batch_size)
+            emptied = []
+            for ids in chunked(sorted(touched), 500):
+                emptied += Alphagram.objects.filter(id__in=ids, word_count=0).values_list('id', flat=True)
+            alphagrams_deleted += delete_rows(Alphagram, emptied)
+
+    return inserted, deleted, alphagrams_created, alphagrams_deleted
+
+
+def sync_dictionary(dict_file="data/dictionary.txt", language=None, batch_size=5000, dry_run=False):
+    """ Update a language's words to match a dictionary file, touching only the words that differ.
+
+        The file's labels (sorted in memory) are merged against the language's words, read in label order from the (language, label, id) index.
+        Like bulk loads, no model signals are sent: callers bump the dictionary version and rebuild derived tables and statistics after changes.
+        Returns (SyncReport, list of DictionaryChanges). With dry_run, nothing is written and the report only counts words.
+    """
+    start = time.perf_counter()
+    words = Word.objects.filter(language=language).order_by('label', 'id').values_list('id', 'label', 'alphagram_id')
+    # Read in full before writing: SQLite results aren't stable while their table changes
+    changes = list(diff_dictionary(sorted_dictionary_labels(dict_file), words.iterator()))
+
+    if dry_run:
+        inserts = sum(1 for change in changes if change.word_id is None)
+        return SyncReport(inserts, len(changes) - inserts, 0, 0, time.perf_counter() - start), changes
+
+    counts = apply_dictionary_changes(changes, language=language, batch_size=batch_size)
+    return SyncReport(*counts, seconds=time.perf_counter() - start), changes
+
+
+def short_substrings(label="", max_length=2):
+    """ Set of every substring of a label, from 1 to max_length characters long.
+    """
+    return {
+        label[i:i + length]
+        for length in range(1, max_length + 1)
+        for i in range(len(label) - length + 1)
+    }
+
+
+def build_short_substrings(max_length=2, top_n=50, batch_size=5000, language=None):
+    """ Regenerate ShortSubstring rows for every substring of 1 to max_length characters found in words of a language (the default language's, as served).
+        Rows are stamped with the current dictionary version: build after bumping it.
+
+        Two passes over words, in memory:
+            - By label: match counts, and the first top_n matching words.
+            - By 2nd character (label[1:]), for words in multi-word alphagram families: the first anagram results for each substring, as AnagramBySubstringView gives them.
+              A word is an anagram result for a substring if another word in its family contains it.
+        Returns the number of rows created.
+    """
+    counts = {}
+    top_words = {}
+    families = {}
+
+    rows = Word.objects.filter(language=language).order_by('label', 'id').values_list('id', 'label', 'alphagram_id')
+    for word_id, label, alpha_id in rows.iterator():
+        families.setdefault(alpha_id, []).append((word_id, label))
+        for substr in short_substrings(label, max_length):
+            counts[substr] = counts.get(substr, 0) + 1
+            matches = top_words.setdefault(substr, [])
+            if len(matches) < top_n:
+                matches.append({'id': word_id, 'label': label})
+
+    anagrams = {}
+    family_words = sorted(
+        (label[1:], label, word_id, alpha_id)
+        for alpha_id, family in families.items() if len(family) > 1
+        for word_id, label in family
+    )
+    for tail, label, word_id, alpha_id in family_words:
+        found_in_siblings = set()
+        for sibling_id, sibling_label in families[alpha_id]:
+            if sibling_id != word_id:
+                found_in_siblings |= short_substrings(sibling_label, max_length)
+
+        for substr in found_in_siblings:
+            results = anagrams.setdefault(substr, [])
+            if len(results) < SUBSTRING_ANAGRAM_LIMIT:
+                results.append({'id': word_id, 'label': label})
+
+    version = current_version()
+    with transaction.atomic():
+        ShortSubstring.objects.all().delete()
+        for chunk in chunked(sorted(counts), batch_size):
+            ShortSubstring.objects.bulk_create([
+                ShortSubstring(
+                    label=substr,
+                    match_count=counts[substr],
+                    words=json.dumps(top_words[substr]),
+                    anagrams=json.dumps(anagrams.get(substr, [])),
+                    version=version,
+                )
+                for substr in chunk
+            ])
+
+    return len(counts)
+
+
+def substring_anagram_queryset(substr="", language_id=None):
+    """ Single query for the first anagrams of words (in a language) containing the substring, by 2nd character- AnagramBySubstringView's results
+
+        A word is an anagram result if another word sharing its alphagram (a sibling) contains the substring: its alphagram has two or more
+        substring-matches, or one that isn't the word itself.
+        - Substring-matches are grouped by alphagram once (uncorrelated subqueries, each evaluated a single time), and candidates looked up
+          by alphagram id, rather than checking every candidate for a sibling match with a correlated subquery.
+        - Ordering by label[1:] and the result limit are pushed into the database, which keeps a bounded top-N rather than sorting every anagram.
+        Query count is constant, however many words match.
+    """
+    matches = Word.objects.filter(language_id=language_id, label__icontains=substr).order_by() # Subject-words containing substring
+    shared = matches.values('alphagram').annotate(match_count=Count('id')).filter(match_count__gt=1).values('alphagram')
+
+    # No language filter: alphagrams belong to one language, and a language_id term would let SQLite pick the language index over alphagram ids
+    return (
+        Word.objects
+        .filter(alphagram__in=matches.values('alphagram'))
+        .filter(Q(alphagram__in=shared) | ~Q(label__icontains=substr))
+        .annotate(tail=Substr('label', 2))
+        .order_by('tail', 'label', 'id')[:SUBSTRING_ANAGRAM_LIMIT]
+    )
+
+
+def _word_key(word):
+    return word['label'], word['id']
+
+
+def _anagram_key(word):
+    return word['label'][1:], word['label'], word['id']
+
+
+def update_short_substrings(word_id=None, old=None, new=None, language_id=None):
+    """ Apply one word write to ShortSubstring rows, in the writer's transaction (called by Word save/delete signal handlers).
+
+        old / new: the word's (label, alphagram id) before and after the write- None for a new word, and for a delete.
+        - Rows of the word's substrings get its match count and top-N words changed.
+        - Rows of its families' substrings get their anagram results redone for those families' words (which are all the write can change).
+        Most writes take two queries. A top-N list the write shortens, past which more words match, is refilled by one more.
+        Only rows current at this dictionary version are updated, for default language words. Rows are restamped once the write's version bump is made.
+        Writes inside deferred_version_bump() (save()-based loads) are left to a rebuild.
+    """
+    if bump_deferred() or language_id != default_language_id() or short_substrings_version() != current_version():
+        return
+    max_length = getattr(settings, 'WORDAPI_SHORT_SUBSTRING_MAX_LENGTH', 2)
+    top_n = getattr(settings, 'WORDAPI_SHORT_SUBSTRING_TOP_N', 50)
+    old_label, old_alpha_id = old or (None, None)
+    new_label, new_alpha_id = new or (None, None)
+
+    # The families the word left or joined, as they are now- and were, with the write undone
+    after = {alpha_id: [] for alpha_id in (old_alpha_id, new_alpha_id) if alpha_id is not None}
+    for member_id, label, alpha_id in Word.objects.filter(alphagram_id__in=list(after)).values_list('id', 'label', 'alphagram_id'):
+        after[alpha_id].append((member_id, label))
+    before = {alpha_id: [member for member in family if member[0] != word_id] for alpha_id, family in after.items()}
+    if old is not None:
+        before[old_alpha_id].append((word_id, old_label))
+
+    old_substrs = short_substrings(old_label or "", max_length)
+    new_substrs = short_substrings(new_label or "", max_length)
+    family_substrs = {substr for family in chain(before.values(), after.values()) for member_id, label in family for substr in short_substrings(label, max_length)}
+    family_ids = {member_id for family in chain(before.values(), after.values()) for member_id, label in family}
+
+    version = current_version()
+    rows = {row.label: row for row in ShortSubstring.objects.filter(label__in=old_substrs | new_substrs | family_substrs)}
+    changed, created = [], []
+    for substr in sorted(old_substrs | new_substrs | family_substrs):
+        row = rows.get(substr)
+        if row is None:
+            if substr not in new_substrs:
+                continue # Only a new word's substrings can match where nothing did
+            row = ShortSubstring(label=substr, version=version)
+            created.append(row)
+        else:
+            changed.append(row)
+
+        if substr in old_substrs | new_substrs:
+            words = [word for word in json.loads(row.words) if word['id'] != word_id]
+            row.match_count += (substr in new_substrs) - (substr in old_substrs)
+            if substr in new_substrs:
+                entry = {'id': word_id, 'label': new_label}
+                keys = [_word_key(word) for word in words]
+                words.insert(bisect.bisect(keys, _word_key(entry)), entry)
+                words = words[:top_n]
+            if len(words) < min(top_n, row.match_count):
+                words += short_substring_words(substr, language_id, top_n - len(words), after=words[-1] if words else None)
+            row.words = json.dumps(words)
+
+        if substr in family_substrs:
+            anagrams = json.loads(row.anagrams)
+            # A full list's last result bounds what's known: other families' results past it were cut off
+            cutoff = _anagram_key(anagrams[-1]) if len(anagrams) >= SUBSTRING_ANAGRAM_LIMIT else None
+            results = [word for word in anagrams if word['id'] not in family_ids]
+            for family in after.values():
+                for member_id, label in family:
+                    if any(substr in sibling_label for sibling_id, sibling_label in family if sibling_id != member_id):
+                        results.append({'id': member_id, 'label': label})
+            results = sorted((word for word in results if cutoff is None or _anagram_key(word) <= cutoff), key=_anagram_key)[:SUBSTRING_ANAGRAM_LIMIT]
+            if cutoff is not None and len(results) < SUBSTRING_ANAGRAM_LIMIT:
+                results = list(substring_anagram_queryset(substr, language_id).values('id', 'label'))
+            row.anagrams = json.dumps(results)
+
+    deleted = [row.id for row in changed if row.match_count <= 0]
+    if deleted:
+        ShortSubstring.objects.filter(id__in=deleted).delete()
+    changed = [row for row in changed if row.match_count > 0]
+    if changed:
+        ShortSubstring.objects.bulk_update(changed, ['match_count', 'words', 'anagrams'])
+    if created:
+        ShortSubstring.objects.bulk_create(created)
+
+
+def short_substring_words(substr="", language_id=None, limit=50, after=None):
+    """ List of the first words (as {'id', 'label'} dicts, by label) containing a substring, after a word if given.
+
+        A range of the (language, label) index, from that word on.
+    """
+    words = Word.objects.filter(language_id=language_id, label__contains=substr)
+    if after is not None:
+        words = words.filter(Q(label__gt=after['label']) | Q(id__gt=after['id']), label__gte=after['label'])
+    return list(words.order_by('label', 'id').values('id', 'label')[:limit])
+
+
+def restamp_short_substrings(from_version, to_version):
+    """ Stamp ShortSubstring rows kept current through a word write (rows at from_version) with the version the write's bump made.
+
+        Rows that missed a bump in between- another writer's, made first, or a language write's- are rebuilt instead.
+    """
+    if ShortSubstring.objects.filter(version=from_version).update(version=to_version):
+        return
+    if ShortSubstring.objects.filter(version__lt=from_version).exists():
+        build_short_substrings(
+            getattr(settings, 'WORDAPI_SHORT_SUBSTRING_MAX_LENGTH', 2), getattr(settings, 'WORDAPI_SHORT_SUBSTRING_TOP_N', 50), language=WordLanguage.default()
+        )
+
+
+_short_state = {'version': None, 'built_version': None}
+_short_lock = threading.Lock()
+
+
+def short_substrings_version():
+    """ Dictionary version ShortSubstring rows are stamped with, None if there are none. Read once per dictionary version-
+        and again while the rows are behind it, as they're restamped just after a word write's bump.
+    """
+    version = current_version()
+    if _short_state['version'] != version or _short_state['built_version'] not in (None, version):
+        with _short_lock:
+            if _short_state['version'] != version or _short_state['built_version'] not in (None, version):
+                _short_state['built_version'] = ShortSubstring.objects.values_list('version', flat=True).first()
+                _short_state['version'] = version
+    return _short_state['built_version']
@@ -0,0 +1,75 @@
+""" Dictionary-Words / Anagram API - Languages
+
+    Every word and alphagram belongs to a language (WordLanguage), and lookups are scoped to one language at a time:
+    ?language=<label> on API requests, or the default language (WORDAPI_DEFAULT_LANGUAGE) without it.
+
+    - Alphagrams are computed under each language's normalization (casefold, NFKD, accent folding- see models.normalize_label), and are unique per language.
+    - Database lookups filter on language, backed by composite (language, label) indexes, so a second dictionary doesn't grow the rows an English query reads.
+    - In-process engines are built from the default language's words only. Requests for other languages are answered by those language-filtered queries.
+    - Languages are read once per dictionary version (language writes bump it too), not on every request. See versioning.py.
+"""
+
+import threading
+
+from collections import namedtuple
+
+from django.db import DatabaseError
+
+from .models import WordLanguage
+from .versioning import current_version
+
+
+# The language a request is scoped to. default: True for the default language, which in-process engines are built from
+LanguageScope = namedtuple('LanguageScope', ['id', 'label', 'normalization', 'default'])
+
+_state = {'version': None, 'by_label': {}, 'default': LanguageScope(None, None, "", True)}
+_lock = threading.Lock()
+
+
+def _read_languages():
+    """ (label -> LanguageScope map, default LanguageScope) from data
+    """
+    try:
+        default = WordLanguage.default()
+        rows = list(WordLanguage.objects.values_list('id', 'label', 'normalization'))
+    except DatabaseError:
+        return {}, LanguageScope(None, None, "", True)
+
+    default_id = default.id if default is not None else None
+    by_label = {
+        label.lower(): LanguageScope(language_id, label, normalization, language_id == default_id)
+        for language_id, label, normalization in rows
+    }
+    if default is None:
+        return by_label, LanguageScope(None, None, "", True) # No languages: words without one
+    return by_label, by_label[default.label.lower()]
+
+
+def _languages():
+    version = current_version()
+    if _state['version'] != version:
+        with _lock:
+            if _state['version'] != version:
+                _state['by_label'], _state['default'] = _read_languages()
+                _state['version'] = version
+    return _state
+
+
+def default_scope():
+    """ LanguageScope of the default language
+    """
+    return _languages()['default']
+
+
+def default_language_id():
+    """ Id of the default language, which in-process engines are built from. None if there are no languages.
+    """
+    return default_scope().id
+
+
+def language_scope(label=None):
+    """ LanguageScope for a language label (case-insensitive), or the default language if no label is given. None for an unknown language.
+    """
+    if not label:
+        return default_scope()
+    return _languages()['by_label'].get(label.lower())
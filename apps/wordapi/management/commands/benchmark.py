@@ -0,0 +1,118 @@
+""" Benchmark lookup paths against the App's DB
+
+    Times in-process engines and fast paths against the database queries and serializers they replace, on the current data.
+
+    Suites:
+        substrings : trigram index search vs. the icontains (LIKE '%x%') scan of WordBySubstringView
+        serializers : WordValuesSerializer (values_list rows written straight to JSON) vs. WordSerializer(many=True), both rendered to JSON bytes
+
+    ex: python manage.py benchmark substrings --samples 20 --repeat 5
+    ex: python manage.py benchmark serializers --rows 10000
+"""
+
+import random, statistics, time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.wordapi.engines import trigram_index
+from apps.wordapi.models import *
+from apps.wordapi.renderers import PrerenderedJSONRenderer
+from apps.wordapi.serializers import WordSerializer, WordValuesSerializer
+
+
+# Fixed inputs, from very common to rare trigrams, on top of random samples
+SUBSTRING_INPUTS = ['ing', 'tion', 'ster', 'ation', 'quiz', 'zzz', 'restaurant']
+
+
+def time_call(fn, repeat=5):
+    """ Median wall-clock seconds of `repeat` calls to fn. Returns (seconds, last result).
+    """
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+class Command(BaseCommand):
+    """ Command methods for manage.py benchmark
+    """
+
+    help = 'Benchmarks lookup engines and serializers against the paths they replace.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=['substrings', 'serializers'], help='Benchmark suite to run.')
+        parser.add_argument('--samples', type=int, default=20, help='Random inputs to add to the fixed ones.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed calls per input (median is reported).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for sampled inputs.')
+        parser.add_argument('--rows', type=int, default=10000, help='Rows to serialize (serializers suite).')
+
+    def _sample_substrings(self, samples, seed):
+        """ Fixed inputs plus random 3-6 character substrings of random dictionary words
+        """
+        rng = random.Random(seed)
+        labels = list(Word.objects.values_list('label', flat=True))
+        if not labels:
+            raise CommandError("No words in data. Run init_db first.")
+
+        inputs = list(SUBSTRING_INPUTS)
+        while len(inputs) < len(SUBSTRING_INPUTS) + samples:
+            label = rng.choice(labels)
+            if len(label) >= 3:
+                length = rng.randint(3, min(6, len(label)))
+                start = rng.randint(0, len(label) - length)
+                inputs.append(label[start:start + length])
+        return inputs
+
+    def _bench_substrings(self, options):
+        """ Trigram index search vs. icontains queryset serialization, per input
+        """
+        inputs = self._sample_substrings(options['samples'], options['seed'])
+        trigram_index.data() # Build outside of the timings
+
+        self.stdout.write("%-12s %8s %12s %12s %9s" % ("input", "matches", "icontains ms", "trigram ms", "speedup"))
+        totals = [0.0, 0.0]
+        for substr in inputs:
+            scan_seconds, scanned = time_call(
+                lambda: WordSerializer(Word.objects.filter(label__icontains=substr).order_by('label', 'id'), many=True).data,
+                options['repeat'],
+            )
+            index_seconds, indexed = time_call(lambda: trigram_index.search(substr), options['repeat'])
+
+            if [dict(row) for row in scanned] != indexed:
+                raise CommandError("Trigram results differ from icontains results for '%s'" % substr)
+
+            totals[0] += scan_seconds
+            totals[1] += index_seconds
+            self.stdout.write("%-12s %8d %12.2f %12.3f %8.0fx" % (
+                substr, len(indexed), scan_seconds * 1000, index_seconds * 1000, scan_seconds / max(index_seconds, 1e-9)
+            ))
+
+        self.stdout.write("%-12s %8s %12.2f %12.3f %8.0fx" % (
+            "total", "", totals[0] * 1000, totals[1] * 1000, totals[0] / max(totals[1], 1e-9)
+        ))
+
+    def _bench_serializers(self, options):
+        """ Read-only list serialization of the first N words, query included: ModelSerializer vs. values_list path
+        """
+        queryset = Word.objects.order_by('label', 'id')[:options['rows']]
+        renderer = PrerenderedJSONRenderer()
+
+        model_seconds, model_json = time_call(
+            lambda: renderer.render(WordSerializer(queryset, many=True).data), options['repeat']
+        )
+        values_seconds, values_json = time_call(
+            lambda: renderer.render(WordValuesSerializer(queryset).json), options['repeat']
+        )
+        if model_json != values_json:
+            raise CommandError("WordValuesSerializer JSON differs from WordSerializer JSON")
+
+        rows = len(WordValuesSerializer(queryset).rows)
+        self.stdout.write("%-22s %8s %10s %12s" % ("serializer", "rows", "ms", "rows/sec"))
+        for name, seconds in (("WordSerializer", model_seconds), ("WordValuesSerializer", values_seconds)):
+            self.stdout.write("%-22s %8d %10.2f %12.0f" % (name, rows, seconds * 1000, rows / max(seconds, 1e-9)))
+        self.stdout.write("speedup: %.1fx, JSON identical (%d bytes)" % (model_seconds / max(values_seconds, 1e-9), len(values_json)))
+
+    def handle(self, *args, **options):
+        getattr(self, '_bench_' + options['suite'])(options)
@@ -0,0 +1,237 @@
+""" Benchmark suite for ingestion and the lookup API, on a temporary database
+
+    Creates a throwaway test database, loads it from data/dictionary.txt (or --file) with init_db --bulk, and times:
+        - init_db itself
+        - a single Word.save(), for new words
+        - AnagramView, WordBySubstringView and AnagramBySubstringView, on short, medium and long inputs
+        - AnagramBySubstringView again with the in-process engines off: its database query, as other languages are answered, on the full-size dictionary
+
+    Every metric reports p50/p95/p99 latency (ms) and database query count, as JSON (stdout, or --output).
+    Lookups are timed with the response cache off, and with in-process engines built beforehand- their build times are reported separately.
+    A lookup whose query runs past --max-seconds is interrupted: its metric reports the error instead of timings, and the command fails once the results are written.
+
+    --save-baseline stores the results; --baseline compares against stored results, and fails (non-zero exit) on regressions:
+    a p95 slower than baseline by more than --tolerance, or more queries than baseline.
+
+    ex: python manage.py benchmark_suite --save-baseline benchmark_baseline.json
+    ex: python manage.py benchmark_suite --baseline benchmark_baseline.json --tolerance 0.25
+"""
+
+import contextlib, io, itertools, json, logging, math, string, threading, time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from apps.wordapi.engines import ENGINES
+from apps.wordapi.models import *
+
+
+# Representative inputs per view: URL pattern, and short / medium / long inputs
+VIEW_INPUTS = {
+    'anagrams': ('/api/anagrams/%s/', {'short': 'stop', 'medium': 'listen', 'long': 'restraint'}),
+    'substrings': ('/api/substrings/%s/', {'short': 'ab', 'medium': 'ster', 'long': 'ational'}),
+    'substringanagrams': ('/api/substringanagrams/%s/', {'short': 'ab', 'medium': 'ster', 'long': 'ational'}),
+}
+
+# Views timed a second time with every engine off (as '<view>:db:<size>'), for their database fallbacks
+FALLBACK_VIEWS = ('substringanagrams',)
+
+
+def percentile(sorted_values, pct):
+    """ Nearest-rank percentile of an ascending list
+    """
+    rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(timings, queries, **extra):
+    """ Metric dict of latency percentiles (ms) from timings in seconds, with a query count
+    """
+    ordered = sorted(timings)
+    metric = {
+        'samples': len(ordered),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'queries': queries,
+    }
+    metric.update(extra)
+    return metric
+
+
+def regressions(results, baseline, tolerance=0.25):
+    """ List of regression messages: metrics whose p95 is over baseline by more than tolerance, or with more queries than baseline.
+
+        Metrics missing from either side are ignored.
+    """
+    found = []
+    for name, metric in sorted(results['metrics'].items()):
+        base = baseline.get('metrics', {}).get(name)
+        if base is None or 'error' in metric:
+            continue # Failed lookups fail the command on their own
+        if metric['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            found.append("%s: p95 %.3f ms, baseline %.3f ms (+%.0f%%)" % (
+                name, metric['p95_ms'], base['p95_ms'], (metric['p95_ms'] / max(base['p95_ms'], 1e-9) - 1) * 100
+            ))
+        if metric['queries'] > base['queries']:
+            found.append("%s: %d queries, baseline %d" % (name, metric['queries'], base['queries']))
+    return found
+
+
+class Command(BaseCommand):
+    """ Command methods for manage.py benchmark_suite
+    """
+
+    help = 'Times ingestion and lookup views on a temporary database, reporting JSON and comparing against a baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', dest='dict_file', default="data/dictionary.txt", help='Dictionary file to load into the temporary database.')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per view input.')
+        parser.add_argument('--saves', type=int, default=20, help='Timed Word.save() calls.')
+        parser.add_argument('--output', help='Write JSON results to this file, instead of stdout.')
+        parser.add_argument('--baseline', help='Stored results to compare against. Regressions fail the command.')
+        parser.add_argument('--save-baseline', help='Store the results as a baseline file.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown over baseline, as a fraction.')
+        parser.add_argument('--max-seconds', type=float, default=30, help='Longest a single lookup request may run before its query is interrupted.')
+
+    def _bench_init_db(self, dict_file):
+        """ One timed, bulk init_db run (also loads the temporary database for the rest of the suite)
+        """
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            call_command('init_db', '--bulk', dict_file=dict_file, stdout=io.StringIO())
+            seconds = time.perf_counter() - start
+        return summarize([seconds], len(queries), words=Word.objects.count())
+
+    def _bench_word_save(self, saves):
+        """ Word.save() of new words, one at a time (including signal handlers and family refreshes). Words are deleted afterwards, untimed.
+        """
+        labels = ('benchmark' + ''.join(letters) for letters in itertools.product(string.ascii_lowercase, repeat=3))
+        timings, query_counts, saved = [], [], []
+        for label in itertools.islice(labels, saves):
+            word = Word(label=label)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                word.save()
+                timings.append(time.perf_counter() - start)
+            query_counts.append(len(queries))
+            saved.append(word.id)
+
+        Word.objects.filter(id__in=saved).delete()
+        return summarize(timings, max(query_counts))
+
+    def _capped_get(self, client, url, max_seconds):
+        """ GET response of a URL, with the database query running when max_seconds are up interrupted (SQLite's interrupt(), raising DatabaseError)
+        """
+        connection.ensure_connection()
+        timer = threading.Timer(max_seconds, connection.connection.interrupt)
+        timer.start()
+        try:
+            return client.get(url)
+        finally:
+            timer.cancel()
+
+    def _bench_view(self, client, url, repeat, max_seconds=30):
+        """ Timed GET requests to one URL. The query count is for a single request.
+
+            Fails if the request read from any database but the temporary one (e.g. a read replica of real data).
+            A request over max_seconds ends the URL's timings: its metric reports the error, and no percentiles.
+        """
+        elsewhere = [] # Aliases of other databases queried
+        try:
+            with CaptureQueriesContext(connection) as queries, contextlib.ExitStack() as stack:
+                for alias in connections:
+                    if alias != connection.alias:
+                        stack.enter_context(connections[alias].execute_wrapper(lambda execute, *args, alias=alias: elsewhere.append(alias) or execute(*args)))
+                response = self._capped_get(client, url, max_seconds)
+            query_count = len(queries)
+            if elsewhere:
+                raise CommandError("%s read from the %s database, not the temporary one" % (url, elsewhere[0]))
+
+            timings = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                self._capped_get(client, url, max_seconds)
+                timings.append(time.perf_counter() - start)
+        except DatabaseError as e:
+            return {'url': url, 'error': "Over the %gs time cap (%s)" % (max_seconds, e)}
+        return summarize(timings, query_count, url=url, status=response.status_code)
+
+    def _run(self, options):
+        results = {'dictionary': options['dict_file'], 'repeat': options['repeat'], 'metrics': {}}
+        metrics = results['metrics']
+
+        metrics['init_db'] = self._bench_init_db(options['dict_file'])
+
+        # Engines are built outside of lookup timings; their build costs are reported on their own
+        results['engines'] = {}
+        for engine in ENGINES:
+            if engine.enabled():
+                engine.data()
+            results['engines'][engine.name] = engine.stats()
+
+        metrics['word_save'] = self._bench_word_save(options['saves'])
+        for engine in ENGINES:
+            if engine.enabled():
+                engine.data() # Rebuilt here if saves couldn't be applied in place
+
+        client = Client()
+        for view, (pattern, inputs) in VIEW_INPUTS.items():
+            for size in ('short', 'medium', 'long'):
+                metrics['%s:%s' % (view, size)] = self._bench_view(client, pattern % inputs[size], options['repeat'], options['max_seconds'])
+        with override_settings(**{engine.setting: False for engine in ENGINES}):
+            for view in FALLBACK_VIEWS:
+                pattern, inputs = VIEW_INPUTS[view]
+                for size in ('short', 'medium', 'long'):
+                    metrics['%s:db:%s' % (view, size)] = self._bench_view(client, pattern % inputs[size], options['repeat'], options['max_seconds'])
+        if not any(metrics['%s:%s' % (view, size)].get('queries') for view in VIEW_INPUTS for size in ('short', 'medium', 'long')):
+            raise CommandError("No lookup queried the temporary database")
+
+        return results
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Word.save() prints, and 404s (and interrupted requests' 500s, reported in their metrics) are logged: keep both out of the JSON output
+            request_logger = logging.getLogger('django.request')
+            request_level = request_logger.level
+            request_logger.setLevel(logging.CRITICAL)
+            # No periodic version re-reads either: this process makes every write, and sees its own bumps.
+            # Only the default database is swapped for a temporary one, so reads stay off replicas (snapshots of the real data).
+            settings_overrides = {'WORDAPI_RESPONSE_CACHE_SIZE': 0, 'WORDAPI_VERSION_CHECK_SECONDS': 3600, 'WORDAPI_READ_REPLICAS': []}
+            with override_settings(**settings_overrides), contextlib.redirect_stdout(io.StringIO()):
+                results = self._run(options)
+        finally:
+            request_logger.setLevel(request_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        failed = ["%s: %s" % (name, metric['error']) for name, metric in sorted(results['metrics'].items()) if 'error' in metric]
+        if failed:
+            raise CommandError("Lookups failed:\n  %s" % "\n  ".join(failed))
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                f.write(output + "\n")
+
+        if baseline is not None:
+            found = regressions(results, baseline, options['tolerance'])
+            if found:
+                raise CommandError("Performance regressions against %s:\n  %s" % (options['baseline'], "\n  ".join(found)))
+            self.stderr.write("No regressions against %s" % options['baseline'])
@@ -1,19 +1,26 @@
 """ Populate Database words to App's DB, from dictionary
 
-    Reads dictionary of words from data/dictionary.txt
+    Reads dictionary of words from data/dictionary.txt (or --file)
     
     Work for alphagram creation (and thus finding anagrams by querying for alphagram relationships), is handled in the model. This saves a lot of work for initial database population and maintaining anagram relationships, but does cause other issues because of that overhead.
 
-    NOTE: An area of this module that is significantly needed is bulk batching of ORM/model objects before insertion. 
-    This is currently ommitted due to complication with alphagram/anagram creation, foreign key setting, and the lack of time saved by it.
-    This ommission really extends the setup time, is inefficient, and would be a high-priority enhancement to the project with more time.
+    --bulk skips Word.save() entirely: the file is streamed, alphagrams are resolved in memory and rows are bulk_created in chunked transactions (see apps/wordapi/ingest.py). A full dictionary loads in seconds rather than minutes.
+
+    Each dictionary is loaded into a language (--language), whose alphagrams are normalized per --normalization and kept apart from other languages' anagram families.
+
+    ex: python manage.py init_db --bulk --file data/dictionary.txt --language English --batch-size 5000
+    ex: python manage.py init_db --bulk --file data/french.txt --language French --normalization casefold,fold_accents
 """
 
 import os, sys
 
 from collections import defaultdict
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from apps.wordapi.models import *
+from apps.wordapi.ingest import build_short_substrings, bulk_load_dictionary
+from apps.wordapi.stats import rebuild_stats
+from apps.wordapi.versioning import bump_version, deferred_version_bump
 
 
 class Command(BaseCommand):
@@ -24,23 +31,33 @@ class Command(BaseCommand):
     
     help = 'Populates the database.' # help attribute For info on module/command
 
-    def _set_language(self, lang_label="English"):
+    def add_arguments(self, parser):
+        parser.add_argument('--file', dest='dict_file', default="data/dictionary.txt", help='Dictionary file, one word per line.')
+        parser.add_argument('--language', default="English", help='Language label for the dictionary words.')
+        parser.add_argument('--normalization', default="casefold", help='Alphagram normalization for a new language: comma-separated steps of ' + ", ".join(NORMALIZATION_STEPS) + '.')
+        parser.add_argument('--bulk', action='store_true', help='Stream the file and bulk insert rows, instead of saving each word.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert transaction (with --bulk).')
+        parser.add_argument('--short-max-length', type=int, default=getattr(settings, 'WORDAPI_SHORT_SUBSTRING_MAX_LENGTH', 2), help='Longest substring to precompute ShortSubstring results for.')
+        parser.add_argument('--short-top-n', type=int, default=getattr(settings, 'WORDAPI_SHORT_SUBSTRING_TOP_N', 50), help='Words kept per precomputed short substring.')
+
+    def _set_language(self, lang_label="English", normalization="casefold"):
         """ Helper method to handle() for language object
 
             Callable by handle() to save a language object. Defaults to English, for this project's dictionary purposes. A different language label can be passed.
+            Normalization is only set for a new language: changing an existing one would invalidate its alphagrams.
         """
         if lang_label: # Ignore setup if blank value passed
             if WordLanguage.objects.filter(label=lang_label).count():
                 # Setup only proceeds if there isn't already a language in data by this label
                 pass
             else:
-                lang = WordLanguage(label=lang_label)
+                lang = WordLanguage(label=lang_label, normalization=normalization)
                 lang.save()
         
-    def _read_dict_to_words(self, dict_file="data/dictionary.txt"):
+    def _read_dict_to_words(self, dict_file="data/dictionary.txt", language=None):
         """ Helper method to handle() for reading file and creating new word objects
 
-            File can be reassigned by parameter value. No CLI-level parameters are provided currently, however.
+            File can be reassigned by parameter value, or by --file from the command line.
         """
         
         input_file_word_count = 0 # for count at the end of file read/insertion
@@ -53,25 +70,62 @@ class Command(BaseCommand):
                     pass #raise ValueError('empty string')
                 else:
                     input_file_word_count += 1
-                    w = Word(label=new_word_label)
+                    w = Word(label=new_word_label, language=language)
                     w.save()
                     
 
         print( "\n\nTotal number of lines/words:\t" + str(input_file_word_count) )
     
+    def _bulk_load(self, dict_file, language, batch_size):
+        """ Helper method to handle() for --bulk loading, reporting rows created and rows per second.
+        """
+
+        report = bulk_load_dictionary(dict_file, language=language, batch_size=batch_size)
+        version = bump_version() # bulk_create sends no save signals; invalidate derived data once here
+
+        rows = report.words + report.alphagrams
+        self.stdout.write("Words created:\t\t" + str(report.words))
+        self.stdout.write("Alphagrams created:\t" + str(report.alphagrams))
+        self.stdout.write("Seconds:\t\t%.2f" % report.seconds)
+        self.stdout.write("Rows per second:\t%.0f" % (rows / report.seconds if report.seconds else rows))
+        self.stdout.write("Dictionary version:\t" + str(version))
+
+    def _build_derived(self, options):
+        """ Helper method to handle() for regenerating data derived from words, after loading
+        """
+        # Short substring queries are served for the default language
+        short_count = build_short_substrings(options['short_max_length'], options['short_top_n'], options['batch_size'], WordLanguage.default())
+        self.stdout.write("Short substrings:\t" + str(short_count))
+
+        stats = rebuild_stats() # Bulk inserts send no signals to keep statistics up to date
+        self.stdout.write("Anagram families:\t" + str(stats.family_count))
+
     def handle(self, *args, **options):
         """ Code run by manage.py and commands for this module
 
-            Checks for words in data. Sets up English as a default if missing.
+            Checks for words in data. Sets up English (or --language) as a default if missing.
             Reads word-input/dictionary, batches Word objects, saves objects into DB.
         """
 
         print("Initializing...")
 
-        if not WordLanguage.objects.count(): # If no languages are already set up
-            self._set_language() # Add English language by default, from helper method
+        try:
+            normalize_label("", options['normalization'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self._set_language(options['language'], options['normalization']) # Add English language by default, from helper method
+        language = WordLanguage.objects.filter(label=options['language']).first()
+
+        if options['bulk']:
+            self._bulk_load(options['dict_file'], language, options['batch_size'])
+
+        else:
+            with deferred_version_bump() as bump: # One dictionary version bump for the whole load, not one per word
+                self._read_dict_to_words(options['dict_file'], language) # Read and add words from helper method
+            self.stdout.write("Dictionary version:\t" + str(bump['version']))
 
-        self._read_dict_to_words() # Read and add words from helper method
+        self._build_derived(options) # Precomputed tables, from the words now in data
         
 
 
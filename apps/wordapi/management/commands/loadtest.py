@@ -0,0 +1,286 @@
+""" Load test the WSGI application at increasing concurrency
+
+    Drives config.wsgi.application in-process (default), or a running server (--url), from a pool of threads or processes (--pool),
+    and reports throughput and latency at each concurrency level- to find where the app saturates, and compare that between commits.
+
+    - Requests are a weighted mix (--mix) of the substrings, anagrams, anagrams_by_substring and word listing routes.
+    - Inputs come from words of data/dictionary.txt (or --file) sampled with a Zipf skew (--zipf): a few words are very popular, most are rare,
+      as in real traffic- which is what the response cache and request coalescing see. Substring inputs are typeahead prefixes and infixes of sampled words.
+    - Request streams are generated up front from --seed, so runs with the same options send the same requests.
+    - Each level runs --duration seconds with that many concurrent workers, each sending requests back to back.
+      Reported: requests per second, p50/p90/p99/max latency (ms), error rate (exceptions and 5xx) and 4xx rate (404 "None" answers), per level and per route.
+    - In-process runs go through the whole WSGI stack- middleware, routing, rendering- with the settings the app is deployed with (response cache included).
+      Thread pools share one process, as a threaded server does; process pools fork one app per worker, as a prefork server does.
+
+    ex: python manage.py loadtest --concurrency 1,2,4,8,16 --duration 5
+    ex: python manage.py loadtest --url http://127.0.0.1:8000 --pool process --mix substrings=1 --output loadtest.json
+"""
+
+import bisect, http.client, itertools, json, logging, math, random, time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.wordapi.ingest import read_dictionary_labels
+from apps.wordapi.pagination import KeysetPagination
+
+
+def substrings_path(word, rng):
+    # Typeahead: a prefix of 2 to 5 letters
+    return '/api/substrings/%s/' % quote(word[:rng.randint(2, 5)])
+
+
+def anagrams_path(word, rng):
+    return '/api/anagrams/%s/' % quote(word)
+
+
+def anagrams_by_substring_path(word, rng):
+    length = min(rng.randint(3, 4), len(word))
+    start = rng.randint(0, len(word) - length)
+    return '/api/substringanagrams/%s/' % quote(word[start:start + length])
+
+
+def words_path(word, rng):
+    # A listing page starting at the word
+    return '/api/words/?cursor=' + KeysetPagination().encode_cursor(False, word, 0)
+
+
+# Route name -> request path for a sampled word
+ROUTES = {
+    'substrings': substrings_path,
+    'anagrams': anagrams_path,
+    'anagrams_by_substring': anagrams_by_substring_path,
+    'words': words_path,
+}
+
+DEFAULT_MIX = 'substrings=4,anagrams=3,anagrams_by_substring=2,words=1'
+
+
+class ZipfSampler():
+    """ Samples words with Zipf-distributed popularity: the word at popularity rank r (a seeded shuffle of the dictionary) has weight 1 / r^s
+    """
+    def __init__(self, words, s=1.1, seed=0):
+        self.words = list(words)
+        random.Random(seed).shuffle(self.words)
+        self.cum_weights = list(itertools.accumulate(1.0 / rank ** s for rank in range(1, len(self.words) + 1)))
+
+    def sample(self, rng):
+        return self.words[bisect.bisect(self.cum_weights, rng.random() * self.cum_weights[-1])]
+
+
+def parse_mix(mix=""):
+    """ (route names, weights) from a mix spec: comma-separated route=weight
+    """
+    routes, weights = [], []
+    for part in mix.split(','):
+        route, _, weight = part.partition('=')
+        route = route.strip()
+        if route not in ROUTES:
+            raise CommandError('Unknown route %r in --mix: choose from %s.' % (route, ", ".join(ROUTES)))
+        try:
+            weights.append(float(weight or 1))
+        except ValueError:
+            raise CommandError('Invalid weight for %s in --mix: %r' % (route, weight))
+        routes.append(route)
+    return routes, weights
+
+
+def request_stream(sampler, routes, weights, seed=0, length=5000):
+    """ List of (route, path) requests: routes drawn by weight, inputs by word popularity
+    """
+    rng = random.Random(seed)
+    return [(route, ROUTES[route](sampler.sample(rng), rng)) for route in rng.choices(routes, weights, k=length)]
+
+
+def wsgi_sender():
+    """ Function sending a GET for a path to config.wsgi.application in-process, returning the status code
+    """
+    from config.wsgi import application
+
+    def send(path):
+        path, _, query = path.partition('?')
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query}
+        setup_testing_defaults(environ)
+        statuses = []
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for chunk in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close() # Ends the request: request_finished, connection upkeep
+        return int(statuses[0].split()[0])
+    return send
+
+
+def url_sender(url, timeout=10.0):
+    """ Function sending a GET for a path to a server, on one kept-alive connection, returning the status code
+    """
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    state = {'connection': None}
+
+    def send(path):
+        if state['connection'] is None:
+            state['connection'] = connection_class(parts.netloc, timeout=timeout)
+        try:
+            state['connection'].request('GET', parts.path.rstrip('/') + path)
+            response = state['connection'].getresponse()
+            response.read()
+            return response.status
+        except Exception:
+            state['connection'].close()
+            state['connection'] = None # Reconnect for the next request
+            raise
+    return send
+
+
+def run_worker(url, requests, seconds, timeout=10.0, cycle=True):
+    """ Send requests back to back for `seconds` (cycling through them, or once). Returns (start, end, list of (route, latency seconds, status- 0 for exceptions)).
+
+        A module function, so process pools can run it.
+    """
+    send = url_sender(url, timeout) if url else wsgi_sender()
+    logging.getLogger('django.request').setLevel(logging.CRITICAL) # 404 "None" answers are expected (after the app has set up logging)
+    samples = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    for route, path in itertools.cycle(requests) if cycle else requests:
+        request_start = time.perf_counter()
+        if request_start >= deadline:
+            break
+        try:
+            status = send(path)
+        except Exception:
+            status = 0
+        samples.append((route, time.perf_counter() - request_start, status))
+    if not url:
+        connections.close_all()
+    return start, time.perf_counter(), samples
+
+
+def percentile(sorted_values, pct):
+    """ Nearest-rank percentile of an ascending list
+    """
+    rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, seconds):
+    """ Throughput, latency percentiles (ms) and error rates of (route, latency, status) samples over a wall-clock time
+    """
+    latencies = sorted(latency for route, latency, status in samples)
+    count = len(samples)
+    if not count:
+        return {'requests': 0, 'rps': 0.0}
+    return {
+        'requests': count,
+        'rps': round(count / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'error_rate': round(sum(1 for route, latency, status in samples if status == 0 or status >= 500) / count, 4),
+        'client_error_rate': round(sum(1 for route, latency, status in samples if 400 <= status < 500) / count, 4),
+    }
+
+
+def saturation_level(levels):
+    """ The level past which more concurrency gains less than 10% throughput (the last level if it never levels off)
+    """
+    for previous, level in zip(levels, levels[1:]):
+        if level['rps'] < previous['rps'] * 1.1:
+            return previous
+    return levels[-1]
+
+
+class Command(BaseCommand):
+    """ Command methods for manage.py loadtest
+    """
+
+    help = 'Load tests the WSGI application (in-process or at --url) at increasing concurrency, reporting throughput, latency percentiles and error rates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server (default: config.wsgi.application, in-process).')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread', help='Run concurrent workers as threads or processes.')
+        parser.add_argument('--concurrency', default='1,2,4,8,16', help='Comma-separated concurrency levels, run in order.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per concurrency level.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='Comma-separated route=weight request mix, of routes: ' + ", ".join(ROUTES) + '.')
+        parser.add_argument('--file', dest='dict_file', default="data/dictionary.txt", help='Dictionary file to sample inputs from.')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of word popularity (0 samples uniformly).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for request streams.')
+        parser.add_argument('--warmup', type=int, default=200, help='Untimed requests before the first level.')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Request timeout in seconds (with --url).')
+        parser.add_argument('--output', help='Write JSON results to this file.')
+
+    def _run_level(self, concurrency, streams, options):
+        """ Summary of one concurrency level: overall, and per route
+        """
+        executor_class = ProcessPoolExecutor if options['pool'] == 'process' else ThreadPoolExecutor
+        if options['pool'] == 'process':
+            connections.close_all() # Not shared with forked workers
+        with executor_class(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(run_worker, options['url'], streams[worker], options['duration'], options['timeout'])
+                for worker in range(concurrency)
+            ]
+            runs = [future.result() for future in futures]
+
+        seconds = max(end for start, end, samples in runs) - min(start for start, end, samples in runs)
+        samples = [sample for start, end, worker_samples in runs for sample in worker_samples]
+        level = dict(concurrency=concurrency, **summarize(samples, seconds))
+        level['routes'] = {
+            route: summarize([sample for sample in samples if sample[0] == route], seconds)
+            for route in sorted({sample[0] for sample in samples})
+        }
+        return level
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency takes comma-separated integers.')
+        if not levels or min(levels) < 1:
+            raise CommandError('Concurrency levels must be at least 1.')
+        routes, weights = parse_mix(options['mix'])
+
+        try:
+            sampler = ZipfSampler(read_dictionary_labels(options['dict_file']), options['zipf'], options['seed'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        # One request stream per worker, the same at every level
+        streams = [request_stream(sampler, routes, weights, seed=options['seed'] + worker) for worker in range(max(levels))]
+
+        target = options['url'] or 'config.wsgi.application (in-process)'
+        self.stdout.write('Target: %s, %s pool, %.1fs per level, mix %s' % (target, options['pool'], options['duration'], options['mix']))
+        if options['warmup']:
+            # Engines built, connections opened, popular responses cached- as on a server that's been up a while
+            run_worker(options['url'], streams[0][:options['warmup']], options['duration'] * 10, options['timeout'], cycle=False)
+
+        self.stdout.write('%11s %9s %9s %9s %9s %9s %9s %7s %7s' % ('concurrency', 'requests', 'rps', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'errors', '4xx'))
+        results = []
+        for concurrency in levels:
+            level = self._run_level(concurrency, streams, options)
+            results.append(level)
+            self.stdout.write('%11d %9d %9.1f %9.2f %9.2f %9.2f %9.2f %6.2f%% %6.2f%%' % (
+                concurrency, level['requests'], level['rps'], level.get('p50_ms', 0), level.get('p90_ms', 0), level.get('p99_ms', 0),
+                level.get('max_ms', 0), level.get('error_rate', 0) * 100, level.get('client_error_rate', 0) * 100,
+            ))
+
+        saturated = saturation_level(results)
+        self.stdout.write('Saturates at concurrency %d: %.1f rps, p99 %.2f ms' % (saturated['concurrency'], saturated['rps'], saturated.get('p99_ms', 0)))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'target': target,
+                    'options': {name: options[name] for name in ('pool', 'duration', 'mix', 'dict_file', 'zipf', 'seed')},
+                    'levels': results,
+                    'saturation': saturated['concurrency'],
+                }, f, indent=2, sort_keys=True)
+                f.write("\n")
@@ -0,0 +1,76 @@
+""" Snapshot the primary database into its SQLite read replicas
+
+    Copies the 'default' database into each replica in WORDAPI_READ_REPLICAS (or the aliases given), with SQLite's online backup API:
+    a consistent copy, taken while the primary keeps serving reads and writes (under WAL, the copy doesn't block the writer).
+
+    Each copy is written next to the replica's file and moved over it in one rename, so readers never see a half-written replica.
+    Connections already open keep reading the previous snapshot until they're recycled (CONN_MAX_AGE). See apps/wordapi/routing.py.
+
+    Run after each dictionary load (e.g. after init_db), or on a schedule.
+
+    ex: python manage.py snapshot_replicas
+    ex: python manage.py snapshot_replicas replica
+"""
+
+import os, sqlite3, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.wordapi.routing import replica_aliases, sqlite_path
+from apps.wordapi.versioning import expire_version
+
+
+class Command(BaseCommand):
+    """ Command methods for manage.py snapshot_replicas
+    """
+
+    help = 'Copies the primary SQLite database into its read replicas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica database aliases (default: WORDAPI_READ_REPLICAS).')
+        parser.add_argument('--pages', type=int, default=-1, help='Pages copied per backup step (-1 copies everything in one step, under one read lock).')
+
+    def snapshot(self, source, path, pages=-1):
+        """ Copy the source sqlite3 connection's database to a file at path, replacing it atomically. Returns its size in bytes.
+        """
+        partial = path + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+
+        target = sqlite3.connect(partial)
+        try:
+            source.backup(target, pages=pages)
+            # Replicas are opened read-only: a rollback journal needs no -wal/-shm files next to them
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+
+        os.replace(partial, path)
+        return os.path.getsize(path)
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No read replicas configured (WORDAPI_READ_REPLICAS).')
+
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Snapshots copy an SQLite primary database.')
+
+        paths = {}
+        for alias in aliases:
+            if alias not in connections.databases or alias == 'default':
+                raise CommandError('%s is not a replica database alias.' % alias)
+            path = sqlite_path(connections[alias].settings_dict)
+            if path is None:
+                raise CommandError('%s is not an SQLite file database.' % alias)
+            paths[alias] = path
+
+        primary.ensure_connection()
+        for alias, path in paths.items():
+            start = time.perf_counter()
+            size = self.snapshot(primary.connection, path, options['pages'])
+            connections[alias].close() # This process's next read opens the new snapshot
+            expire_version(alias)
+            self.stdout.write('%s: %s (%.1f MB) in %.2fs' % (alias, path, size / 1e6, time.perf_counter() - start))
@@ -0,0 +1,73 @@
+""" Sync the App's DB words with a dictionary file
+
+    Updates a language's words, already loaded by init_db, to match a new version of its dictionary file: words missing from data are inserted,
+    words no longer in the file (and repeated words) are deleted. Nothing else is written, so a small update takes seconds, not a full reload.
+
+    The file is diffed against data by a sorted merge, and changes are applied one transaction per --batch-size changes, alphagrams included-
+    new ones are created, emptied ones dropped, and the anagram families touched are refreshed (see sync_dictionary() in apps/wordapi/ingest.py).
+    After changes, derived data is brought up to date: statistics, the dictionary version (which in-process engines and cached responses rebuild from)
+    and short substrings (for the default language, stamped with the new version). Read replicas catch up at their next snapshot_replicas.
+
+    ex: python manage.py sync_db --file data/dictionary.txt --language English
+    ex: python manage.py sync_db --file data/dictionary.txt --dry-run -v 2
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.wordapi.models import *
+from apps.wordapi.ingest import build_short_substrings, sync_dictionary
+from apps.wordapi.stats import rebuild_stats
+from apps.wordapi.versioning import bump_version
+
+
+class Command(BaseCommand):
+    """ Command methods for manage.py sync_db
+    """
+
+    help = 'Inserts and deletes words so a language matches a dictionary file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', dest='dict_file', default="data/dictionary.txt", help='Dictionary file, one word per line.')
+        parser.add_argument('--language', default="English", help='Language label of the words to sync (loaded by init_db).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Changes applied per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without writing them.')
+        parser.add_argument('--short-max-length', type=int, default=getattr(settings, 'WORDAPI_SHORT_SUBSTRING_MAX_LENGTH', 2), help='Longest substring to precompute ShortSubstring results for.')
+        parser.add_argument('--short-top-n', type=int, default=getattr(settings, 'WORDAPI_SHORT_SUBSTRING_TOP_N', 50), help='Words kept per precomputed short substring.')
+
+    def _build_derived(self, language, options):
+        """ Helper method to handle() for data derived from words, after changes
+        """
+        stats = rebuild_stats() # Changes are written without signals to keep statistics up to date
+        self.stdout.write("Anagram families:\t" + str(stats.family_count))
+        self.stdout.write("Dictionary version:\t" + str(bump_version()))
+
+        default = WordLanguage.default()
+        if default is not None and default.id == language.id:
+            # Short substring queries are served for the default language, from rows stamped with the new version
+            short_count = build_short_substrings(options['short_max_length'], options['short_top_n'], options['batch_size'], default)
+            self.stdout.write("Short substrings:\t" + str(short_count))
+
+    def handle(self, *args, **options):
+        language = WordLanguage.objects.filter(label=options['language']).first()
+        if language is None:
+            raise CommandError('No %s words to sync: load the dictionary with init_db first.' % options['language'])
+
+        try:
+            report, changes = sync_dictionary(options['dict_file'], language=language, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['verbosity'] > 1:
+            for change in changes:
+                self.stdout.write(('+ ' if change.word_id is None else '- ') + change.label)
+
+        self.stdout.write("Words inserted:\t\t" + str(report.inserted))
+        self.stdout.write("Words deleted:\t\t" + str(report.deleted))
+        if options['dry_run']:
+            return
+        self.stdout.write("Alphagrams created:\t" + str(report.alphagrams_created))
+        self.stdout.write("Alphagrams deleted:\t" + str(report.alphagrams_deleted))
+        self.stdout.write("Seconds:\t\t%.2f" % report.seconds)
+
+        if changes:
+            self._build_derived(language, options)
@@ -0,0 +1,138 @@
+""" Dictionary-Words / Anagram API - Request metrics
+
+    Per-request timings recorded by RequestTimingMiddleware (see middleware.py), aggregated in-process per URL name, e.g. substrings, anagrams, anagrams_by_substring.
+
+    - Histograms have fixed buckets: an observation is a bisect and a few additions under one lock, cheap enough to leave on under load.
+    - Served at /api/metrics/ in Prometheus text format, alongside response cache, request coalescing and lookup engine figures.
+    - Figures are per process; a scraper sums them across workers.
+"""
+
+import bisect, threading
+
+from collections import OrderedDict
+
+
+# Bucket upper bounds
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram():
+    """ Cumulative-bucket histogram of observations, Prometheus style. Not locked itself- see RequestMetrics.
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """ (le, cumulative count) pairs, ending with +Inf
+        """
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+# Recorded per request: metric name -> (help, buckets)
+REQUEST_METRICS = OrderedDict([
+    ('request_seconds', ("Total time handling the request.", SECONDS_BUCKETS)),
+    ('sql_seconds', ("Time spent executing SQL queries.", SECONDS_BUCKETS)),
+    ('view_seconds', ("Time in the view, SQL included (serializer work excepted).", SECONDS_BUCKETS)),
+    ('serialize_seconds', ("Time in serializers (.data, .json) and rendering the response body.", SECONDS_BUCKETS)),
+    ('queries', ("SQL queries per request.", QUERY_BUCKETS)),
+])
+
+
+class RequestMetrics():
+    """ Thread-safe histograms of request timings and query counts, per URL name.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {} # (metric, url name) -> Histogram
+
+    def record(self, url_name, values):
+        """ Observe one request's values: dict of metric name (in REQUEST_METRICS) -> value
+        """
+        with self._lock:
+            for metric, value in values.items():
+                key = (metric, url_name)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(REQUEST_METRICS[metric][1])
+                histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def prometheus_lines(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            lines = []
+            for metric, (help_text, buckets) in REQUEST_METRICS.items():
+                name = 'wordapi_request_' + metric if metric == 'queries' else 'wordapi_' + metric
+                lines.append("# HELP %s %s" % (name, help_text))
+                lines.append("# TYPE %s histogram" % name)
+                for (histogram_metric, url_name), histogram in histograms:
+                    if histogram_metric != metric:
+                        continue
+                    for bound, count in histogram.samples():
+                        lines.append('%s_bucket{view="%s",le="%s"} %d' % (name, url_name, bound, count))
+                    lines.append('%s_sum{view="%s"} %s' % (name, url_name, repr(float(histogram.sum))))
+                    lines.append('%s_count{view="%s"} %d' % (name, url_name, histogram.count))
+            return lines
+
+
+request_metrics = RequestMetrics()
+
+
+def _metric_lines(name, metric_type, help_text, samples):
+    """ Prometheus text lines for a simple metric: samples are (labels string, value) pairs
+    """
+    lines = ["# HELP %s %s" % (name, help_text), "# TYPE %s %s" % (name, metric_type)]
+    lines.extend("%s%s %s" % (name, labels, value) for labels, value in samples)
+    return lines
+
+
+def render_prometheus():
+    """ Every metric, in Prometheus text exposition format
+    """
+    from .caching import response_cache
+    from .coalescing import request_flights
+    from .engines import ENGINES
+
+    lines = request_metrics.prometheus_lines()
+
+    cache = response_cache.stats()
+    lines += _metric_lines('wordapi_response_cache_hits_total', 'counter', "Response cache hits.", [("", cache['hits'])])
+    lines += _metric_lines('wordapi_response_cache_misses_total', 'counter', "Response cache misses.", [("", cache['misses'])])
+    lines += _metric_lines('wordapi_response_cache_entries', 'gauge', "Entries in the response cache.", [("", cache['entries'])])
+
+    flights = sorted(request_flights.stats().items())
+    lines += _metric_lines('wordapi_coalesce_executed_total', 'counter', "Requests that ran their view (first of a coalesced group, or alone).", [
+        ('{view="%s"}' % view, counts['executed']) for view, counts in flights
+    ])
+    lines += _metric_lines('wordapi_coalesce_shared_total', 'counter', "Requests answered with a concurrent identical request's result.", [
+        ('{view="%s"}' % view, counts['coalesced']) for view, counts in flights
+    ])
+    lines += _metric_lines('wordapi_coalesce_timeouts_total', 'counter', "Requests that gave up waiting on an identical request, and ran their view.", [
+        ('{view="%s"}' % view, counts['timeouts']) for view, counts in flights
+    ])
+    lines += _metric_lines('wordapi_coalesce_in_flight', 'gauge', "Coalesced computations in flight.", [("", request_flights.in_flight())])
+
+    engines = [engine.stats() for engine in ENGINES]
+    lines += _metric_lines('wordapi_engine_memory_bytes', 'gauge', "Approximate memory footprint of a lookup engine's build.", [
+        ('{engine="%s"}' % stats['name'], stats['memory_bytes'] or 0) for stats in engines
+    ])
+    lines += _metric_lines('wordapi_engine_build_seconds', 'gauge', "Time taken by a lookup engine's last build.", [
+        ('{engine="%s"}' % stats['name'], stats['build_seconds'] or 0) for stats in engines
+    ])
+
+    return "\n".join(lines) + "\n"
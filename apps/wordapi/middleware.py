@@ -0,0 +1,132 @@
+""" Dictionary-Words / Anagram API - Request timing middleware
+
+    Records, for every request:
+        - query count and SQL time, from a database execute wrapper
+        - view time: from the view being called until it returns, SQL included- serializer work excepted
+        - serialization time: serializers turning rows into response data (.data, .json: see serializing()), and rendering the view's Response to bytes
+        - total time
+
+    The figures go out in a Server-Timing header, and into per-URL-name histograms served at /api/metrics/ (see metrics.py).
+    Switched off by WORDAPI_METRICS = False.
+
+    SQL time is time spent in cursor.execute(). SQLite steps through result rows as they're fetched, so fetching a large result set counts as view time.
+    Queries run by serializers (e.g. evaluating a queryset in ModelSerializer(many=True).data) are counted as view time too, not serialization.
+    Streamed responses (NDJSON) do their SQL and encoding after the response leaves the middleware- only work up to the first byte is counted for them.
+"""
+
+import threading, time
+
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import request_metrics
+
+
+# Timings of the request each thread is handling, for serializing()
+_active = threading.local()
+
+
+class RequestTimings():
+    """ One request's running totals. Also the database execute wrapper counting its queries.
+    """
+    __slots__ = ('start', 'queries', 'sql_seconds', 'serializer_seconds', 'serializing', 'view_start', 'view_end', 'render_end')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0 # Serializer work within the view, its SQL excepted
+        self.serializing = False
+        self.view_start = None
+        self.view_end = None
+        self.render_end = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.queries += 1
+
+    def rendered(self, response):
+        # Post-render callback: the response body has just been rendered
+        self.render_end = time.perf_counter()
+
+    def values(self, end):
+        view_end = self.view_end or end
+        return {
+            'request_seconds': end - self.start,
+            'sql_seconds': self.sql_seconds,
+            'view_seconds': view_end - self.view_start - self.serializer_seconds if self.view_start is not None else 0.0,
+            'serialize_seconds': self.serializer_seconds + (self.render_end - view_end if self.render_end is not None else 0.0),
+            'queries': self.queries,
+        }
+
+
+@contextmanager
+def serializing():
+    """ Context manager timing serializer work as the current request's serialization time, rather than view time. SQL run inside stays view time.
+
+        Nested uses count once; outside a timed request (or with WORDAPI_METRICS off) it does nothing.
+    """
+    timings = getattr(_active, 'timings', None)
+    if timings is None or timings.serializing:
+        yield
+        return
+    timings.serializing = True
+    start, sql_seconds = time.perf_counter(), timings.sql_seconds
+    try:
+        yield
+    finally:
+        timings.serializer_seconds += time.perf_counter() - start - (timings.sql_seconds - sql_seconds)
+        timings.serializing = False
+
+
+def server_timing(values):
+    """ Server-Timing header value for a request's values
+    """
+    return 'db;dur=%.2f;desc="%d queries", view;dur=%.2f, serialize;dur=%.2f, total;dur=%.2f' % (
+        values['sql_seconds'] * 1000, values['queries'],
+        values['view_seconds'] * 1000, values['serialize_seconds'] * 1000, values['request_seconds'] * 1000,
+    )
+
+
+class RequestTimingMiddleware():
+    """ Times requests, for a Server-Timing header and per-URL-name metrics. Best placed first in MIDDLEWARE, so totals cover the other middleware.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'WORDAPI_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = request._wordapi_timings = _active.timings = RequestTimings()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _active.timings = None
+        end = time.perf_counter()
+
+        values = timings.values(end)
+        response['Server-Timing'] = server_timing(values)
+
+        match = getattr(request, 'resolver_match', None)
+        request_metrics.record(match.url_name if match is not None and match.url_name else 'unmatched', values)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._wordapi_timings.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF Responses are rendered after this hook- time the render with a post-render callback
+        timings = request._wordapi_timings
+        timings.view_end = time.perf_counter()
+        response.add_post_render_callback(timings.rendered)
+        return response
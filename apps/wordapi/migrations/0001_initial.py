@@ -0,0 +1,122 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alphagram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('word_count', models.PositiveIntegerField(db_index=True, default=0, editable=False)),
+                ('family', models.TextField(default='[]', editable=False)),
+            ],
+            options={
+                'ordering': ['label'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DictionaryStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('language_count', models.PositiveIntegerField(default=0)),
+                ('alphagram_count', models.PositiveIntegerField(default=0)),
+                ('family_count', models.PositiveIntegerField(default=0)),
+                ('palindrome_count', models.PositiveIntegerField(default=0)),
+                ('family_sizes', models.TextField(default='{}')),
+                ('top_families', models.TextField(default='[]')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DictionaryVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShortSubstring',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=5, unique=True)),
+                ('match_count', models.PositiveIntegerField(default=0)),
+                ('words', models.TextField(default='[]')),
+                ('anagrams', models.TextField(default='[]')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Word',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(db_index=True, max_length=50)),
+                ('is_palindrome', models.BooleanField(default=False, editable=False)),
+                ('anagram_count', models.PositiveIntegerField(db_index=True, default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('alphagram', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='wordapi.Alphagram')),
+            ],
+            options={
+                'ordering': ['label'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WordLanguage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=30, unique=True)),
+                ('normalization', models.CharField(blank=True, default='casefold', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WordDefinition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=30)),
+                ('detail', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('language', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wordapi.WordLanguage')),
+                ('word', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wordapi.Word')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='word',
+            name='language',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='wordapi.WordLanguage'),
+        ),
+        migrations.AddField(
+            model_name='alphagram',
+            name='language',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='wordapi.WordLanguage'),
+        ),
+        migrations.AddIndex(
+            model_name='word',
+            index=models.Index(fields=['label', 'id'], name='wordapi_word_label_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='word',
+            index=models.Index(fields=['language', 'label', 'id'], name='wordapi_word_lang_label_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alphagram',
+            index=models.Index(fields=['label', 'id'], name='wordapi_alphagram_label_id_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='alphagram',
+            unique_together={('language', 'label')},
+        ),
+    ]
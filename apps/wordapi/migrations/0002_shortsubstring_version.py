@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wordapi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortsubstring',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
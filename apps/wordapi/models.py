@@ -11,10 +11,13 @@ This model exists for querying words and their anagrams, across lanaugages/dicti
 
 
 Models:
-    WordLanguage
-    Alphagram
+    WordLanguage : Language of a dictionary, with its alphagram normalization. Anagram families never cross languages.
+    Alphagram : Unique per (language, label).
     Word
     WordDefinition : Not really used at this point, but available.
+    ShortSubstring : Precomputed results for 1-2 character substring queries, generated at ingestion time.
+    DictionaryVersion : Version stamp, bumped when words change. Used to invalidate in-process/derived data.
+    DictionaryStats : Precomputed dictionary-wide aggregates (counts, family sizes, largest families), kept up to date by ingestion and signals. See stats.py.
 
 
 A lot of the heavy lifting in the Word model. This is because:
@@ -23,7 +26,7 @@ A lot of the heavy lifting in the Word model. This is because:
     - Words need to have some form of relationship with their alphagram or anagram. (Here, the have a many-to-one relationship witht their alphagram, by which anagrams can be queried and associated).
 
     In Word's overridden save() method, alphagrams are solved, saved in data if needed, and set as a foreign relation to word.
-    A caveat here is that it is very hard (slow) to bulk initialize the word list, because it relies so heavily on the save() method, and alphagrams aren't currently designed to be left blank.
+    A caveat here is that it is very hard (slow) to bulk initialize the word list one save() at a time. The label helpers below (make_alphagram, is_palindrome_label) are shared with the bulk loader in ingest.py, which resolves alphagrams in memory and bulk_creates rows instead.
 
 
 Future optimizations are very possible, especially in this data model:
@@ -42,6 +45,8 @@ Future optimizations are very possible, especially in this data model:
         
         Again, it's a lot more overhead to set up, so it's ommitted here.
 
+        ** Now implemented per alphagram: Alphagram.family packs its words' ids and labels, with Alphagram.word_count and an indexed Word.anagram_count. Kept up to date by Word.save(), Word deletes and the bulk loader.
+
     - A separate data model for substring queries would help optimization and would be an interesting/useful enhancement to this project.
         
         Particularly in a frontend implementation where API data is requested for updates as the user types, shorter substrings (API input-params/search strings) for "contains" are VERY slow. They require the DB to look over too many entries.
@@ -51,15 +56,63 @@ Future optimizations are very possible, especially in this data model:
         Furthermore, rather than using an "icontains" query-filter, these search references would represent exact matches to string input, which is quicker to search in a sorted data table. This could even be served by a separate database (diverting traffic and machine work), called via a separate API endpoint by the client, or an in-memory data-store.
 
         Depending on size, something like single letter query data could be pre-cached by the client. 26 entries. But they'd have to be designed to not be overwhelming to serve.
+
+        ** Now implemented as the ShortSubstring model: match counts and top-N results per 1-2 character substring, generated by init_db and served at /api/shortsubstrings/.
 """
 
 
-import datetime
+import datetime, json, unicodedata
 
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 
+#####################
+##  Label Helpers  ##
+#####################
+# Alphagram normalization steps, applied in the order a language lists them (comma-separated)
+NORMALIZATION_STEPS = ('casefold', 'nfkd', 'fold_accents')
+
+
+def normalize_label(label="", normalization=""):
+    """ Label as compared for anagrams, under a language's normalization: a comma-separated list of NORMALIZATION_STEPS.
+
+        casefold : Unicode case folding (e.g. "Straße" -> "strasse")
+        nfkd : compatibility decomposition (e.g. ligatures -> letters, accented letters -> letter + combining mark)
+        fold_accents : decomposition with combining marks dropped (e.g. "été" -> "ete")
+    """
+    for step in normalization.split(','):
+        step = step.strip()
+        if step == 'casefold':
+            label = label.casefold()
+        elif step == 'nfkd':
+            label = unicodedata.normalize('NFKD', label)
+        elif step == 'fold_accents':
+            label = "".join(char for char in unicodedata.normalize('NFKD', label) if not unicodedata.combining(char))
+        elif step:
+            raise ValueError("Unknown normalization step: %s (expected one of %s)" % (step, ", ".join(NORMALIZATION_STEPS)))
+    return label
+
+
+def make_alphagram(label="", normalization=""):
+    """ Alphagram string of a word-label: the label's characters (normalized, for a language's normalization), sorted alphabetically.
+    """
+    return "".join( sorted(list(normalize_label(label, normalization))) )
+
+
+def is_palindrome_label(label=""):
+    """ Boolean - if a word-label is the same reversed.
+
+        Uses extended slice syntax for reversal, for efficiency
+    """
+    return label == label[::-1]
+
+
+# Anagrams-by-substring responses are the first this-many anagrams, ordered by 2nd character
+SUBSTRING_ANAGRAM_LIMIT = 10
+
+
 ###################
 ##  Data Models  ##
 ###################
@@ -70,12 +123,20 @@ class WordLanguage(models.Model):
     """
     ##  Attributes  ##
     label = models.CharField(max_length=30, unique=True)
+    normalization = models.CharField(max_length=50, default="casefold", blank=True) # Alphagram normalization steps, comma-separated- see normalize_label()
 
     ##  Non-editable attributes  ##
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
 
     def __str__(self):
         return self.label
+
+    @classmethod
+    def default(cls):
+        """ Default language, for words saved without one and requests without ?language: WORDAPI_DEFAULT_LANGUAGE by label, else the first language in data. None if there are none.
+        """
+        label = getattr(settings, 'WORDAPI_DEFAULT_LANGUAGE', "English")
+        return cls.objects.filter(label__iexact=label).first() or cls.objects.order_by('id').first()
     
     # TODO: Order by label
 
@@ -83,19 +144,51 @@ class WordLanguage(models.Model):
 class Alphagram(models.Model):
     """ Alphagram - alphabetically sorted string/word. 
     
-    Referenced by words as many-to-one relationship. Used to find words' anagrams. Unique by label; redundancy would make this useless as an anagram-key.
+    Referenced by words as many-to-one relationship. Used to find words' anagrams. Unique by (language, label); redundancy would make this useless as an anagram-key.
+    Scoped to a language, so dictionaries in different languages never share anagram families.
     """
     ##  Attributes  ##
-    label = models.CharField(max_length=50, unique=True)
+    label = models.CharField(max_length=50)
+    language = models.ForeignKey(WordLanguage, blank=True, null=True, on_delete=models.CASCADE)
 
     ##  Non-editable attributes  ##
     created_at = models.DateTimeField(auto_now_add=True)
+
+    ##  Denormalized anagram family- every word with this alphagram  ##
+    word_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    family = models.TextField(default="[]", editable=False) # JSON - packed [id, label] pairs, ordered by label
     
     def __str__(self):
         return self.label
 
+    def family_words(self, exclude_id=None):
+        """ Words in this alphagram's family as {'id', 'label'} dicts (as WordSerializer gives), optionally leaving one word out.
+        """
+        return [
+            {'id': word_id, 'label': label}
+            for word_id, label in json.loads(self.family)
+            if word_id != exclude_id
+        ]
+
+    def refresh_family(self):
+        """ Recompute denormalized family data from words in data: family, word_count, and anagram_count of every word in the family.
+        """
+        from .stats import family_resized
+
+        family = list(self.word_set.order_by('label', 'id').values_list('id', 'label'))
+        previous_count = self.word_count
+        self.word_count = len(family)
+        self.family = json.dumps(family)
+        self.save(update_fields=['word_count', 'family'])
+        self.word_set.update(anagram_count=max(len(family) - 1, 0))
+        family_resized(self, previous_count, self.word_count)
+
     class Meta:
         ordering = ['label']
+        unique_together = [('language', 'label')] # Also the index for alphagram lookups within a language
+        indexes = [
+            models.Index(fields=['label', 'id'], name='wordapi_alphagram_label_id_idx'), # Keyset pagination order
+        ]
 
 
 class Word(models.Model): #### ORDER_BY
@@ -108,6 +201,7 @@ class Word(models.Model): #### ORDER_BY
     ##  Non-editable attributes  ##
     alphagram = models.ForeignKey(Alphagram, editable=False, on_delete=models.CASCADE)
     is_palindrome = models.BooleanField(default=False, editable=False)
+    anagram_count = models.PositiveIntegerField(default=0, db_index=True, editable=False) # Other words sharing this word's alphagram
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     
     # TODO: homograph_count = models.IntegerField(default=0) # use if able to initialize (would require updating other words with same label).
@@ -118,7 +212,7 @@ class Word(models.Model): #### ORDER_BY
     def save(self, *args, **kwargs):
         """ Save overrides, for setting up attribute-fields from the word's label.
         
-        Attributes checked here: label-lowercasing, alphagram object, language
+        Attributes checked here: label-lowercasing, language, alphagram object (within the language), anagram family (denormalized)
         """
 
         ##  Enforcing lowercase in database, for uniformity  ##
@@ -126,37 +220,49 @@ class Word(models.Model): #### ORDER_BY
         print("word-label is: " + self.label + "  -- SAVED!")
 
         ##  Check for palindrome (if word is same reversed)  ##
-        # Uses extended slice syntax for reversal, for efficiency
-        if self.label == self.label[::-1]:
-            self.is_palindrome = True
-        else:
-            self.is_palindrome = False
+        self.is_palindrome = is_palindrome_label(self.label)
 
-        ##  Default language - set language if there is only 1 present in data.  ##
-        if WordLanguage.objects.count() == 1:
-            self.language = WordLanguage.objects.get(id=1)
+        ##  Default language - set language if none was given (see WordLanguage.default).  ##
+        if self.language_id is None:
+            self.language = WordLanguage.default()
 
         # TODO: Update Homograph count (would need to maintain count across words with same spelling).
         #       Could also set a boolean value, for if a word is a homograph at all.
         
         ##  Alphagram setup  ##
-        # Find alphagram (sorted label)
-        alpha_str = "".join( sorted(list(self.label)) )
+        # Find alphagram (sorted label, under the language's normalization)
+        alpha_str = make_alphagram(self.label, self.language.normalization if self.language_id else "")
         
-        if Alphagram.objects.filter(label=alpha_str).exists():
-            # If alphagram is in data, set it as foreign key.
-            self.alphagram = Alphagram.objects.get(label=alpha_str)
+        # Alphagram before this save, if the word is already in data and being relabeled
+        previous_alpha_id = Word.objects.filter(pk=self.pk).values_list('alphagram_id', flat=True).first() if self.pk else None
+
+        existing_alpha = Alphagram.objects.filter(language_id=self.language_id, label=alpha_str).first()
+        if existing_alpha is not None:
+            # If alphagram is in data (for this language), set it as foreign key.
+            self.alphagram = existing_alpha
         else:
             # Create alphagram object, save it, and set it as foreign key.
             new_alpha = Alphagram()
             new_alpha.label = alpha_str
+            new_alpha.language_id = self.language_id
             new_alpha.save()
             self.alphagram = new_alpha
 
         super(Word, self).save(*args, **kwargs)
 
+        ##  Anagram family data, for the word's alphagram (and the one it left, if relabeled)  ##
+        self.alphagram.refresh_family()
+        if previous_alpha_id and previous_alpha_id != self.alphagram_id:
+            for previous_alpha in Alphagram.objects.filter(pk=previous_alpha_id):
+                previous_alpha.refresh_family()
+        self.anagram_count = self.alphagram.word_count - 1
+
     class Meta:
         ordering = ['label']
+        indexes = [
+            models.Index(fields=['label', 'id'], name='wordapi_word_label_id_idx'), # Keyset pagination order
+            models.Index(fields=['language', 'label', 'id'], name='wordapi_word_lang_label_idx'), # Lookups and pagination within a language
+        ]
 
 
 class WordDefinition(models.Model):
@@ -176,3 +282,62 @@ class WordDefinition(models.Model):
 
     def __str__(self):
         return self.label
+
+
+class ShortSubstring(models.Model):
+    """ Precomputed results for short substring queries (1 or 2 characters, optionally 3). Unique, by label.
+
+    Short substrings match too many words to scan for on every request. These rows are generated at ingestion time (see ingest.build_short_substrings) and served by exact-key lookup.
+    Substrings that no word contains have no row. Rows are only served at the dictionary version they are stamped with- single word writes of the default language adjust them and restamp them once committed.
+    """
+    ##  Attributes  ##
+    label = models.CharField(max_length=5, unique=True)
+    match_count = models.PositiveIntegerField(default=0) # Words containing the substring
+    words = models.TextField(default="[]") # JSON - first N words containing the substring, by label, as WordSerializer gives them
+    anagrams = models.TextField(default="[]") # JSON - AnagramBySubstringView results for the substring
+    version = models.PositiveIntegerField(default=0) # Dictionary version the rows were built at
+
+    ##  Non-editable attributes  ##
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    def __str__(self):
+        return self.label
+
+
+class DictionaryVersion(models.Model):
+    """ Dictionary version stamp. A single row, bumped whenever words change.
+
+    In-process lookup engines (and anything else derived from dictionary data) compare against it to know when to rebuild. See versioning.py.
+    """
+    ##  Attributes  ##
+    version = models.PositiveIntegerField(default=0)
+
+    ##  Non-editable attributes  ##
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.version)
+
+
+class DictionaryStats(models.Model):
+    """ Dictionary-wide aggregates, precomputed. A single row.
+
+    Counting and grouping the whole dictionary per request is slow; these are read by primary key instead.
+    Rebuilt from data by ingestion (bulk writes send no signals), and adjusted in place by Word, Alphagram and WordLanguage save/delete signals. See stats.py.
+    """
+    ##  Counts  ##
+    word_count = models.PositiveIntegerField(default=0)
+    language_count = models.PositiveIntegerField(default=0)
+    alphagram_count = models.PositiveIntegerField(default=0)
+    family_count = models.PositiveIntegerField(default=0) # Alphagrams with at least one word
+    palindrome_count = models.PositiveIntegerField(default=0)
+
+    ##  Distributions  ##
+    family_sizes = models.TextField(default="{}") # JSON - family size (words per alphagram) -> number of alphagrams that size
+    top_families = models.TextField(default="[]") # JSON - largest families, as [alphagram label, word count, [word labels]], largest first
+
+    ##  Non-editable attributes  ##
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "%d words" % self.word_count
@@ -0,0 +1,106 @@
+""" Dictionary-Words / Anagram API - Keyset (cursor) pagination
+
+    Page-number pagination counts every row and OFFSETs past every earlier page, so deep pages get slower and walking the whole dictionary is quadratic.
+    Here pages are keyed on (label, id) instead:
+
+    - Each page is one indexed range query- WHERE label >= last label AND (label > last label OR id > last id) ORDER BY label, id LIMIT n+1- at the same cost at any depth.
+    - next/previous links carry an opaque cursor (the boundary row's label and id), as ?cursor=...
+    - The total count is still given, as page-number pagination gave it. Clients that don't need it can skip its query with ?count=false.
+
+    Used by the words, languages and alphagrams listings. Their (label, id) order is backed by an index: composite (label, id) indexes on Word and Alphagram, and WordLanguage's unique label index.
+"""
+
+import base64, binascii, json
+
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """ Cursor pagination on (label, id), for models with a label field.
+
+        Cursors encode a direction and a boundary row: forward from a page's last row, or backward from its first row.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def encode_cursor(self, reverse, label, pk):
+        payload = json.dumps([int(reverse), label, pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """ (reverse, label, id) from the request's cursor param, or None for the first page. Invalid cursors 404.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            reverse, label, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if not isinstance(label, str) or not isinstance(pk, int):
+                raise ValueError
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), label, pk
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, "").lower() not in ('0', 'false', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = queryset.count() if self.wants_count(request) else None
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            reverse = False
+            page = queryset.order_by('label', 'id')
+        else:
+            reverse, label, pk = cursor
+            # The bare label bound is what the index range is searched by: with bound parameters, SQLite can't derive one from the OR alone
+            if reverse:
+                page = queryset.filter(Q(label__lt=label) | Q(id__lt=pk), label__lte=label).order_by('-label', '-id')
+            else:
+                page = queryset.filter(Q(label__gt=label) | Q(id__gt=pk), label__gte=label).order_by('label', 'id')
+
+        # One extra row tells whether there's another page in this direction
+        rows = list(page[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Paging backward always came from a later page; paging forward from a cursor, from an earlier one
+        has_next = not reverse and has_more or reverse and bool(rows)
+        has_previous = reverse and has_more or not reverse and cursor is not None and bool(rows)
+
+        self.next_cursor = self.encode_cursor(False, rows[-1].label, rows[-1].id) if has_next else None
+        self.previous_cursor = self.encode_cursor(True, rows[0].label, rows[0].id) if has_previous else None
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        page = OrderedDict()
+        if self.count is not None:
+            page['count'] = self.count
+        page['next'] = self.get_next_link()
+        page['previous'] = self.get_previous_link()
+        page['results'] = data
+        return Response(page)
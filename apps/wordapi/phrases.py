@@ -0,0 +1,176 @@
+""" Dictionary-Words / Anagram API - Phrase anagrams
+
+    Multi-word anagrams of a phrase: every combination of dictionary words using exactly the phrase's letters, e.g. "dormitory" -> "dirty room".
+
+    - The search runs over alphagrams, not words: words sharing an alphagram are interchangeable, and are only expanded into phrases at the end.
+    - Alphagrams are letter-count vectors, packed into ints (see LetterCounts in engines.py). Only alphagrams that fit inside the phrase (a subset check) are candidates.
+    - Candidates are tried longest first, each combination once (candidate indexes never decrease along a combination).
+      Candidate lists are re-filtered to what fits the remaining letters at each step, the last word is found by a hash lookup of the remainder,
+      and remainders found to have no completion are memoized, so they're not searched again.
+    - The number of words per phrase, the number of results and the time spent searching are limited (WORDAPI_PHRASE_* settings).
+      The time budget starts once candidates are found, so a slower candidate query (e.g. without the letter-set index) doesn't use it up.
+      Searches that hit a limit return what they found, marked incomplete. Expanding alphagrams into phrases stops at the result limit too.
+    - Searches are within one language (see languages.py): the default language's from the in-process indexes, others' from language-filtered queries.
+"""
+
+import itertools, json, re, time
+
+from .engines import LetterCounts, anagram_index, letter_set_index
+from .ingest import chunked
+from .languages import default_scope
+from .models import *
+
+
+class SearchStopped(Exception):
+    """ Raised inside a search when a result or time limit is reached
+    """
+
+
+class PhraseSearch():
+    """ One phrase anagram search, over alphagrams.
+
+        Takes the phrase's letters, and candidate (alphagram label, packed letter counts) pairs for alphagrams fitting in them, packed by `counts`.
+        results: list of combinations found, each a tuple of alphagram labels
+        complete: False if the search stopped at a limit
+    """
+    def __init__(self, counts, letters, candidates, max_words=4, max_results=100, seconds=0.25):
+        self.counts = counts
+        self.target = counts.pack(letters)
+        self.target_length = len(letters)
+        self.max_words = max_words
+        self.max_results = max_results
+        self.deadline = time.monotonic() + seconds
+
+        # Longest first
+        candidates = sorted(candidates, key=lambda candidate: (-len(candidate[0]), candidate[0]))
+        self.labels = [alpha_label for alpha_label, vector in candidates]
+        self.vectors = [vector for alpha_label, vector in candidates]
+        self.lengths = [len(alpha_label) for alpha_label in self.labels]
+        self.index_by_vector = {vector: i for i, vector in enumerate(self.vectors)}
+
+        self.dead = {} # (remainder, words left) -> lowest candidate index from which no completion was found
+        self.results = []
+        self.complete = True
+
+    def run(self):
+        try:
+            self._search(self.target, self.target_length, 0, list(range(len(self.labels))), self.max_words, ())
+        except SearchStopped:
+            self.complete = False
+        return self
+
+    def _found(self, combination):
+        self.results.append(tuple(self.labels[i] for i in combination))
+        if len(self.results) >= self.max_results:
+            raise SearchStopped
+
+    def _search(self, remainder, remainder_length, start, candidates, words_left, chosen):
+        """ Find completions of `chosen` using exactly `remainder`, from candidates (indexes >= start, all fitting the remainder). True if any were found.
+        """
+        if time.monotonic() > self.deadline:
+            raise SearchStopped
+
+        key = (remainder, words_left)
+        if self.dead.get(key, len(self.labels)) <= start:
+            return False
+
+        found = False
+        last = self.index_by_vector.get(remainder)
+        if last is not None and last >= start:
+            self._found(chosen + (last,))
+            found = True
+
+        if words_left > 1:
+            fits, vectors = self.counts.fits, self.vectors
+            for position, i in enumerate(candidates):
+                length = self.lengths[i]
+                if length >= remainder_length:
+                    continue # An exact fit is the lookup above
+                if remainder_length - length > (words_left - 1) * length:
+                    break # Later candidates are no longer than this one: the rest can't be covered in the words left
+
+                next_remainder = remainder - vectors[i]
+                next_candidates = [j for j in candidates[position:] if fits(vectors[j], next_remainder)]
+                if self._search(next_remainder, remainder_length - length, i, next_candidates, words_left - 1, chosen + (i,)):
+                    found = True
+
+        if not found:
+            self.dead[key] = min(start, self.dead.get(key, len(self.labels)))
+        return found
+
+
+def phrase_letters(phrase="", normalization=""):
+    """ The letters of a phrase, lowercased, without spaces or punctuation. Normalized as a language's alphagrams are, if given one.
+    """
+    return normalize_label("".join(char for char in phrase.lower() if char.isalpha()), normalization)
+
+
+def fitting_alphagrams(letters="", language=None):
+    """ (LetterCounts, list of (alphagram label, packed letter counts)) for a language's alphagrams with words that fit in the letters.
+
+        From the letter-set index for the default language, or queried and counted here. The list is None if no alphagram uses some letter.
+    """
+    language = language or default_scope()
+    if language.default and letter_set_index.enabled():
+        return letter_set_index.alphagrams_within(letters)
+
+    counts = LetterCounts(letters)
+    rack = counts.pack(letters)
+    pattern = '^[%s]+$' % re.escape("".join(sorted(set(letters))))
+    candidates = []
+    alphagrams = Alphagram.objects.filter(language_id=language.id, word_count__gt=0, label__regex=pattern)
+    for alpha_label in alphagrams.values_list('label', flat=True).iterator():
+        vector = counts.pack(alpha_label)
+        if counts.fits(vector, rack):
+            candidates.append((alpha_label, vector))
+    return counts, candidates
+
+
+def alphagram_words(alpha_labels, language=None):
+    """ Dict of alphagram label -> list of word labels in a language, from the anagram index, or alphagrams' family data when it's off (or for other languages)
+    """
+    language = language or default_scope()
+    if language.default and anagram_index.enabled():
+        families = anagram_index.data()['words']
+        return {alpha_label: [label for word_id, label in families.get(alpha_label, ())] for alpha_label in alpha_labels}
+
+    words = {}
+    for chunk in chunked(sorted(alpha_labels), 500):
+        for alpha_label, family in Alphagram.objects.filter(language_id=language.id, label__in=chunk).values_list('label', 'family'):
+            words[alpha_label] = [label for word_id, label in json.loads(family)]
+    return words
+
+
+def phrase_anagrams(phrase="", max_words=4, max_results=100, seconds=0.25, language=None):
+    """ Phrase anagrams of a phrase in a language (LanguageScope, default language if None),
+        as (list of phrases- space-separated words, ordered by word count then alphabetically; complete flag).
+
+        The phrase's own words (in any order) aren't a result.
+    """
+    language = language or default_scope()
+    letters = phrase_letters(phrase, language.normalization)
+    counts, candidates = fitting_alphagrams(letters, language)
+    if candidates is None:
+        return [], True
+
+    search = PhraseSearch(counts, letters, candidates, max_words, max_results, seconds).run()
+
+    words = alphagram_words({alpha_label for combination in search.results for alpha_label in combination}, language)
+    own_words = sorted(phrase.lower().split())
+
+    def expansions():
+        # Fewest words first. Each combination expands to the product of its alphagrams' words, which can be far more than the limit.
+        for combination in sorted(search.results, key=lambda combination: (len(combination), combination)):
+            for phrase_words in itertools.product(*(words.get(alpha_label, ()) for alpha_label in combination)):
+                phrase_words = sorted(phrase_words)
+                if phrase_words != own_words:
+                    yield " ".join(phrase_words)
+
+    phrases = set()
+    for result in expansions():
+        phrases.add(result)
+        if len(phrases) > max_results: # One past the limit: there are more
+            break
+
+    ordered = sorted(phrases, key=lambda result: (result.count(" "), result))
+    return ordered[:max_results], search.complete and len(ordered) <= max_results
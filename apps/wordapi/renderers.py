@@ -0,0 +1,71 @@
+""" Dictionary-Word/Anagram API - Response renderers
+
+    - JSON: DRF's JSONRenderer, passing pre-rendered JSON (PrerenderedJSON, from read-only list serializers) through as-is.
+    - NDJSON (newline-delimited JSON): one JSON object per line, selected by ?format=ndjson or an "Accept: application/x-ndjson" header.
+    - Lists render one item per line; anything else renders as a single line.
+    - Large result sets are streamed by views in the same format (see NDJSONStreamMixin in views.py), rather than rendered here in one piece.
+"""
+
+
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+# DRF's JSONRenderer output: compact, unicode (not ASCII-escaped)
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class PrerenderedJSON(bytes):
+    """ Response data that's already JSON (UTF-8 bytes), exactly as JSONRenderer would render it. rows is its number of array items.
+    """
+    rows = 0
+
+    @staticmethod
+    def encode_value(value):
+        return _encoder.encode(value)
+
+    @classmethod
+    def from_items(cls, items):
+        """ A JSON array from a list of already-encoded JSON items (str)
+        """
+        text = '[' + ','.join(items) + ']'
+        # As JSONRenderer does: escape line/paragraph separators, which are valid JSON but not valid javascript
+        text = text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        data = cls(text.encode('utf-8'))
+        data.rows = len(items)
+        return data
+
+    def loads(self):
+        return json.loads(self.decode('utf-8'))
+
+
+class PrerenderedJSONRenderer(JSONRenderer):
+    """ DRF's JSONRenderer, writing PrerenderedJSON data as-is (unless indented output is asked for)
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, PrerenderedJSON):
+            if self.get_indent(accepted_media_type or '', renderer_context or {}) is None:
+                return bytes(data)
+            data = data.loads()
+        return super(PrerenderedJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+
+def ndjson_line(item):
+    """ One NDJSON line (bytes) for an item- compact JSON, as DRF's JSONRenderer writes it.
+    """
+    return (json.dumps(item, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, PrerenderedJSON):
+            data = data.loads()
+        items = data if isinstance(data, list) else [data]
+        return b''.join(ndjson_line(item) for item in items)
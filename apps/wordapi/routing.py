@@ -0,0 +1,137 @@
+""" Dictionary-Words / Anagram API - Read replica routing
+
+    Reads made by the read-only API views (GET requests, and the list/retrieve actions of the model viewsets) go to a read replica,
+    so a writer on the primary (an init_db reload, posts through WordViewSet) doesn't block them. Everything else- writes, reads made while writing,
+    management commands- stays on the 'default' database.
+
+    - ReplicaReadMixin marks a view's reads for the duration of its dispatch. Each request picks one replica (round-robin over WORDAPI_READ_REPLICAS)
+      and reads all of its data from it- engine builds and language lookups included.
+    - Only replicas at the primary's dictionary version are picked (see versioning.py). The version stamp, which engines and cached responses are
+      labelled with, is always the primary's: a replica that's behind it is skipped until its next snapshot, and reads go to the primary meanwhile.
+      So a request's data and the version it's labelled with come from the same dictionary.
+    - ReadReplicaRouter (DATABASE_ROUTERS) sends marked reads to the picked replica. Writes always go to 'default', replicas are never migrated.
+    - SQLite replicas are snapshots of the primary, taken with SQLite's backup API by manage.py snapshot_replicas, and opened read-only
+      (a file: URI with mode=ro). A replica whose file doesn't exist yet is skipped- reads stay on the primary until the first snapshot.
+    - Persistent connections (CONN_MAX_AGE) move on to a new snapshot as they're recycled.
+    - SQLite primaries are switched to WAL journaling (WORDAPI_SQLITE_WAL), so reads still made on the primary aren't blocked by a writer either.
+"""
+
+import itertools, os, threading, time
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .versioning import current_version
+
+
+_local = threading.local()
+_state = {'available': [], 'checked_at': None}
+_round_robin = itertools.count()
+
+
+def replica_aliases():
+    """ Database aliases configured as read replicas
+    """
+    return [alias for alias in getattr(settings, 'WORDAPI_READ_REPLICAS', []) if alias in settings.DATABASES]
+
+
+def sqlite_path(settings_dict):
+    """ File path of an SQLite database from its settings (a plain path, or a file: URI). None if it isn't an SQLite file database.
+    """
+    if not settings_dict['ENGINE'].endswith('sqlite3'):
+        return None
+    name = str(settings_dict['NAME'])
+    if name.startswith('file:'):
+        if 'mode=memory' in name:
+            return None
+        name = name[len('file:'):].split('?', 1)[0]
+    return name if name and name != ':memory:' else None
+
+
+def _replica_ready(alias):
+    settings_dict = connections[alias].settings_dict
+    if not settings_dict['ENGINE'].endswith('sqlite3'):
+        return True # Servers are assumed up
+    path = sqlite_path(settings_dict)
+    return path is not None and os.path.exists(path)
+
+
+def available_replicas():
+    """ Replica aliases ready to be read from. SQLite files are checked for at most once per WORDAPI_VERSION_CHECK_SECONDS.
+    """
+    now = time.monotonic()
+    if _state['checked_at'] is None or now - _state['checked_at'] >= getattr(settings, 'WORDAPI_VERSION_CHECK_SECONDS', 5):
+        _state['available'] = [alias for alias in replica_aliases() if _replica_ready(alias)]
+        _state['checked_at'] = now
+    return _state['available']
+
+
+def pick_replica():
+    """ Next replica alias round-robin, or None if there are none ready at the primary's dictionary version
+    """
+    version = current_version()
+    replicas = [alias for alias in available_replicas() if current_version(alias) >= version]
+    if not replicas:
+        return None
+    return replicas[next(_round_robin) % len(replicas)]
+
+
+@contextmanager
+def read_replica(reads=True):
+    """ Context manager (or decorator) sending this thread's reads inside it to one replica. Nested uses keep the outer replica.
+    """
+    outer = getattr(_local, 'alias', None)
+    if reads and outer is None:
+        _local.alias = pick_replica()
+    try:
+        yield getattr(_local, 'alias', None)
+    finally:
+        _local.alias = outer
+
+
+class ReadReplicaRouter():
+    """ Database router: reads inside read_replica() go to its replica, everything else to 'default'
+    """
+    def db_for_read(self, model, **hints):
+        return getattr(_local, 'alias', None)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True # Replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'WORDAPI_READ_REPLICAS', []):
+            return False # Copied from the primary by snapshot_replicas
+        return None
+
+
+class ReplicaReadMixin():
+    """ API view mixin: reads made while dispatching read-only requests go to a replica.
+
+        replica_methods: HTTP methods that only read. replica_actions: for viewsets, the actions that only read.
+    """
+    replica_methods = ('get', 'head')
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        action_map = getattr(self, 'action_map', None) # Set on viewsets by as_view()
+        reads = method in self.replica_methods and (action_map is None or action_map.get(method) in self.replica_actions)
+        with read_replica(reads):
+            return super(ReplicaReadMixin, self).dispatch(request, *args, **kwargs)
+
+
+@receiver(connection_created, dispatch_uid='wordapi_sqlite_wal')
+def sqlite_wal(sender, connection, **kwargs):
+    # WAL journaling on writable SQLite files: readers and a writer don't block each other. Persistent in the file, so this is a no-op after the first time.
+    if connection.vendor != 'sqlite' or connection.alias in replica_aliases() or not getattr(settings, 'WORDAPI_SQLITE_WAL', True):
+        return
+    if sqlite_path(connection.settings_dict) is not None and 'mode=ro' not in str(connection.settings_dict['NAME']):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
@@ -4,33 +4,156 @@
     - Serializers create JSON http-responses from data-queries in views.py
     - Serializers exist by model type, to handle that model's attributes accordingly. More than one can be made as needed by API views. 
     - Fields specify what attributes/data-tables go into JSON responses in API.
+    - ValuesListSerializer classes are a lightweight, read-only path for large list responses: values_list() tuples written straight to JSON, no model instances.
+    - Serializers' .data (and .json) work is timed as the request's serialization time, not view time (see serializing() in middleware.py).
 """
 
 
+from json.encoder import encode_basestring
+
 from rest_framework import serializers
+from .middleware import serializing
 from .models import *
+from .renderers import PrerenderedJSON
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """ ListSerializer timing .data as serialization (the list serializer of many=True serializers below, by Meta.list_serializer_class)
+    """
+    @property
+    def data(self):
+        with serializing():
+            return super(TimedListSerializer, self).data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """ ModelSerializer timing .data as serialization. Subclasses' Meta should set list_serializer_class = TimedListSerializer, for many=True.
+    """
+    @property
+    def data(self):
+        with serializing():
+            return super(TimedModelSerializer, self).data
 
 
-class WordSerializer(serializers.ModelSerializer): # check type, ID/label # HyperlinkedModelSerializer
+class WordSerializer(TimedModelSerializer): # check type, ID/label # HyperlinkedModelSerializer
     """ Word serializer - the most used for this app
     """
     class Meta:
         model = Word
         fields = ('id', 'label')
+        list_serializer_class = TimedListSerializer
         # TODO: Display related language?
 
 
-class LanguageSerializer(serializers.ModelSerializer):
+class WordFamilySerializer(WordSerializer):
+    """ Word serializer with the word's anagrams inline, from its alphagram's denormalized family data.
+
+        Querysets should select_related('alphagram'), so anagrams come with the words in one query.
+    """
+    anagrams = serializers.SerializerMethodField()
+
+    class Meta(WordSerializer.Meta):
+        fields = ('id', 'label', 'anagrams')
+
+    def get_anagrams(self, obj):
+        return obj.alphagram.family_words(exclude_id=obj.id)
+
+
+class LanguageSerializer(TimedModelSerializer):
     """ Languages Serializer
     """
     class Meta:
         model = WordLanguage
         fields = ('url', 'label')
+        list_serializer_class = TimedListSerializer
 
 
-class AlphaSerializer(serializers.ModelSerializer):
+class AlphaSerializer(TimedModelSerializer):
     """ Alphagram serializer, for testing. Not in API.
     """
     class Meta:
         model = Alphagram
         fields = ('id', 'label')
+        list_serializer_class = TimedListSerializer
+
+
+
+#################################
+##  Read-only list serializers  ##
+#################################
+class ValuesListSerializer():
+    """ Lightweight read-only serializer for list responses, bypassing ModelSerializer.
+
+        Fetches queryset.values_list(*fields) tuples, and writes JSON with a field layout precomputed from the model's fields-
+        no model instances, no per-row field introspection. Output matches the equivalent ModelSerializer(many=True), rendered by DRF's JSONRenderer, byte for byte.
+        Subclasses set `model` and `fields`.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self._rows = None
+
+    @classmethod
+    def layout(cls):
+        """ (row template, field value encoders) for the serializer's fields, computed once per class.
+
+            Non-null integer fields are formatted with %d; non-null text fields are escaped as JSON strings; anything else is JSON-encoded.
+        """
+        if '_layout' not in cls.__dict__:
+            placeholders, encoders = [], []
+            for name in cls.fields:
+                field = cls.model._meta.get_field(name)
+                if field.get_internal_type() in ('AutoField', 'IntegerField', 'PositiveIntegerField', 'BigAutoField') and not field.null:
+                    placeholders.append('%d')
+                    encoders.append(None)
+                elif field.get_internal_type() in ('CharField', 'TextField') and not field.null:
+                    placeholders.append('%s')
+                    encoders.append(encode_basestring)
+                else:
+                    placeholders.append('%s')
+                    encoders.append(PrerenderedJSON.encode_value)
+            template = '{' + ','.join('%s:%s' % (encode_basestring(name), placeholder) for name, placeholder in zip(cls.fields, placeholders)) + '}'
+            cls._layout = (template, tuple(encoders))
+        return cls._layout
+
+    @property
+    def rows(self):
+        """ values_list tuples of the queryset, fetched once
+        """
+        if self._rows is None:
+            self._rows = list(self.queryset.values_list(*self.fields))
+        return self._rows
+
+    @property
+    def data(self):
+        """ List of field-name -> value dicts, as ModelSerializer(many=True).data gives (for Responses rendered other than JSON, e.g. NDJSON)
+        """
+        rows = self.rows # Fetched as view time
+        with serializing():
+            return [dict(zip(self.fields, row)) for row in rows]
+
+    @property
+    def json(self):
+        """ The rows as a pre-rendered JSON array (PrerenderedJSON), for Response data.
+        """
+        template, encoders = self.layout()
+        rows = self.rows # Fetched as view time
+        with serializing():
+            if encoders == (None, encode_basestring):
+                # Common case, (id, label): one formatting operation per row
+                items = [template % (pk, encode_basestring(label)) for pk, label in rows]
+            else:
+                items = [
+                    template % tuple(value if encoder is None else encoder(value) for encoder, value in zip(encoders, row))
+                    for row in rows
+                ]
+            return PrerenderedJSON.from_items(items)
+
+
+class WordValuesSerializer(ValuesListSerializer):
+    """ Read-only WordSerializer(many=True) equivalent, for large word lists
+    """
+    model = Word
+    fields = WordSerializer.Meta.fields
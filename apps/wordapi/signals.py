@@ -0,0 +1,85 @@
+""" Dictionary-Words / Anagram API - Model signal handlers
+
+    Connected in WordapiConfig.ready(). Word writes bump the dictionary version stamp, so in-process engines and caches know to rebuild.
+    Engines that can apply a single write in place (e.g. the trigram index) are updated here instead.
+    Dictionary statistics counters and ShortSubstring rows are adjusted here too, in the writer's transaction (see stats.py and ingest.py).
+    Language writes bump the version as well: which language is the default, and what engines are built from, may have changed.
+"""
+
+import copy
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .engines import ENGINES
+from .ingest import restamp_short_substrings, update_short_substrings
+from .models import Alphagram, Word, WordLanguage
+from .stats import adjust_counts
+from .versioning import bump_version
+
+
+def _word_changed(word, deleted=False):
+    to_version = bump_version()
+    if to_version is None:
+        return # Deferred: engines rebuild from the single bump made later
+    for engine in ENGINES:
+        engine.word_changed(word, to_version - 1, to_version, deleted=deleted)
+    restamp_short_substrings(to_version - 1, to_version)
+
+
+@receiver(pre_save, sender=Word, dispatch_uid='wordapi_word_saving')
+def word_saving(sender, instance, **kwargs):
+    # Palindrome flag, label and alphagram before this save, for updates (a relabel can change them)
+    previous = Word.objects.filter(pk=instance.pk).values_list('is_palindrome', 'label', 'alphagram_id').first() if instance.pk else None
+    instance._was_palindrome = previous[0] if previous else None
+    instance._previous = previous[1:] if previous else None
+
+
+@receiver(post_save, sender=Word, dispatch_uid='wordapi_word_saved')
+def word_saved(sender, instance, created=False, **kwargs):
+    if created:
+        adjust_counts(word_count=1, palindrome_count=int(instance.is_palindrome))
+    elif getattr(instance, '_was_palindrome', None) is not None:
+        adjust_counts(palindrome_count=int(instance.is_palindrome) - int(instance._was_palindrome))
+    update_short_substrings(instance.id, getattr(instance, '_previous', None), (instance.label, instance.alphagram_id), instance.language_id)
+
+    # on_commit: nothing is bumped or updated for a write that's rolled back
+    transaction.on_commit(lambda: _word_changed(instance))
+
+
+@receiver(post_delete, sender=Word, dispatch_uid='wordapi_word_deleted')
+def word_deleted(sender, instance, **kwargs):
+    # Denormalized family data of the word's alphagram (Word.save() handles this for saves)
+    for alphagram in Alphagram.objects.filter(pk=instance.alphagram_id):
+        alphagram.refresh_family()
+    adjust_counts(word_count=-1, palindrome_count=-int(instance.is_palindrome))
+    update_short_substrings(instance.id, (instance.label, instance.alphagram_id), None, instance.language_id)
+
+    # delete() clears the instance's pk after this handler: engines are given a copy that keeps it
+    word = copy.copy(instance)
+    transaction.on_commit(lambda: _word_changed(word, deleted=True))
+
+
+@receiver(post_save, sender=Alphagram, dispatch_uid='wordapi_alphagram_saved')
+def alphagram_saved(sender, instance, created=False, **kwargs):
+    if created:
+        adjust_counts(alphagram_count=1)
+
+
+@receiver(post_delete, sender=Alphagram, dispatch_uid='wordapi_alphagram_deleted')
+def alphagram_deleted(sender, instance, **kwargs):
+    adjust_counts(alphagram_count=-1)
+
+
+@receiver(post_save, sender=WordLanguage, dispatch_uid='wordapi_language_saved')
+def language_saved(sender, instance, created=False, **kwargs):
+    if created:
+        adjust_counts(language_count=1)
+    transaction.on_commit(bump_version)
+
+
+@receiver(post_delete, sender=WordLanguage, dispatch_uid='wordapi_language_deleted')
+def language_deleted(sender, instance, **kwargs):
+    adjust_counts(language_count=-1)
+    transaction.on_commit(bump_version)
@@ -0,0 +1,114 @@
+""" Dictionary-Words / Anagram API - Dictionary statistics
+
+    Dictionary-wide aggregates- word, language, alphagram and palindrome counts, the family-size distribution and the largest anagram families-
+    kept precomputed in a single DictionaryStats row, so the index view and /api/stats/ read one row by primary key instead of scanning and grouping tables.
+
+    - rebuild_stats() recomputes everything from data. Run by init_db after loading (bulk inserts send no signals), and on first read if there's no row yet.
+    - Single writes adjust the row in place: counters by Word, Alphagram and WordLanguage save/delete signals (see signals.py),
+      family sizes by Alphagram.refresh_family(). Adjustments are made in the writer's transaction, so rolled-back writes leave the figures alone.
+    - The largest families list (WORDAPI_STATS_TOP_FAMILIES long) is re-read, by the indexed Alphagram.word_count, only when a resized family is or could be in it.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Alphagram, DictionaryStats, Word, WordLanguage
+
+
+def _top_limit():
+    return getattr(settings, 'WORDAPI_STATS_TOP_FAMILIES', 50)
+
+
+def top_families(limit=50):
+    """ Largest anagram families as [alphagram label, word count, [word labels]], largest first (then by alphagram)
+    """
+    families = Alphagram.objects.filter(word_count__gt=0).order_by('-word_count', 'label').values_list('label', 'word_count', 'family')[:limit]
+    return [[alpha_label, word_count, [label for word_id, label in json.loads(family)]] for alpha_label, word_count, family in families]
+
+
+def rebuild_stats():
+    """ Recompute the statistics row from data. Returns it.
+    """
+    words = Word.objects.aggregate(words=Count('id'), palindromes=Count('id', filter=Q(is_palindrome=True)))
+    family_sizes = dict(
+        (str(word_count), alphagrams) for word_count, alphagrams in
+        Alphagram.objects.filter(word_count__gt=0).order_by().values_list('word_count').annotate(alphagrams=Count('id'))
+    )
+
+    stats, created = DictionaryStats.objects.update_or_create(pk=1, defaults={
+        'word_count': words['words'],
+        'language_count': WordLanguage.objects.count(),
+        'alphagram_count': Alphagram.objects.count(),
+        'family_count': sum(family_sizes.values()),
+        'palindrome_count': words['palindromes'],
+        'family_sizes': json.dumps(family_sizes),
+        'top_families': json.dumps(top_families(_top_limit())),
+    })
+    return stats
+
+
+def get_stats():
+    """ The statistics row- built from data first, if it doesn't exist yet
+    """
+    return DictionaryStats.objects.filter(pk=1).first() or rebuild_stats()
+
+
+def adjust_counts(**changes):
+    """ Add to counter fields of the statistics row, e.g. adjust_counts(word_count=1, palindrome_count=1). Nothing to adjust before a first build.
+    """
+    changes = {field: F(field) + change for field, change in changes.items() if change}
+    if changes:
+        DictionaryStats.objects.filter(pk=1).update(**changes)
+
+
+def family_resized(alphagram, previous_count=0, count=0):
+    """ Adjust family statistics for an alphagram whose word count went from previous_count to count
+    """
+    if previous_count == count:
+        return
+
+    with transaction.atomic():
+        stats = DictionaryStats.objects.select_for_update().filter(pk=1).first()
+        if stats is None:
+            return # Built from data on first read
+
+        sizes = json.loads(stats.family_sizes)
+        for size, change in ((previous_count, -1), (count, 1)):
+            if size:
+                key = str(size)
+                sizes[key] = sizes.get(key, 0) + change
+                if not sizes[key]:
+                    del sizes[key]
+        stats.family_sizes = json.dumps(sizes)
+        stats.family_count += bool(count) - bool(previous_count)
+
+        # Re-read the largest families only if this one is in the list, or now big enough to join it
+        top = json.loads(stats.top_families)
+        limit = _top_limit()
+        if len(top) < limit or count >= top[-1][1] or any(entry[0] == alphagram.label for entry in top):
+            stats.top_families = json.dumps(top_families(limit))
+
+        stats.save(update_fields=['family_sizes', 'family_count', 'top_families', 'updated_at'])
+
+
+def stats_data(stats, top=None):
+    """ API representation of a statistics row, with the top (at most) largest families
+    """
+    families = json.loads(stats.top_families)
+    sizes = json.loads(stats.family_sizes)
+    return {
+        'words': stats.word_count,
+        'languages': stats.language_count,
+        'alphagrams': stats.alphagram_count,
+        'families': stats.family_count,
+        'palindromes': stats.palindrome_count,
+        'family_sizes': [{'size': int(size), 'families': sizes[size]} for size in sorted(sizes, key=int)],
+        'largest_families': [
+            {'alphagram': alpha_label, 'word_count': word_count, 'words': labels}
+            for alpha_label, word_count, labels in families[:top]
+        ],
+        'updated_at': stats.updated_at,
+    }
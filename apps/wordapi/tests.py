@@ -1,3 +1,845 @@
-from django.test import TestCase
+""" Dictionary-Words / Anagram API - Query regression tests
 
-# Create your tests here.
+    Pins the database work behind every URL in apps/wordapi/urls.py, so performance regressions fail before deploy:
+
+    - Query budgets: the most queries each endpoint may run, with the in-process engines on (as deployed) and with them off (the database fallbacks).
+    - Query plans: every query an endpoint runs is put through EXPLAIN QUERY PLAN, with its parameters bound. Plans may not scan a table, search one without a label,
+      alphagram or primary key bound (an index search on language_id alone reads the whole language), or sort rows (e.g. for a default Meta.ordering the query
+      doesn't need), unless the endpoint is allowed to- subqueries included; and where an endpoint depends on a particular index, its plan has to name it.
+
+    Requests are measured warm (engines built, languages read) with the response cache off, so budgets are the steady-state cost of a lookup.
+    Read replica routing is checked against a snapshot of the test database (see routing.py), and sync_db against a fresh load of the same dictionary.
+    Results are checked too, on a few thousand words from data/dictionary.txt: endpoints answer the same with engines on and off,
+    and rewritten queries the same as the ones they replaced.
+    init_db --bulk is checked against a load saving each word.
+
+    Run with: python manage.py test apps.wordapi
+"""
+
+import contextlib, io, itertools, json, os, re, shutil, tempfile, threading, time
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import ingest, languages, middleware, routing, urls, versioning
+from .caching import response_cache
+from .engines import ENGINES, anagram_index
+from .metrics import request_metrics
+from .coalescing import SingleFlight
+from .models import *
+from .pagination import KeysetPagination
+from .renderers import PrerenderedJSONRenderer
+from .serializers import WordSerializer, WordValuesSerializer
+from .stats import get_stats, stats_data
+
+
+# Anagram families, palindromes and phrase anagrams (dormitory -> dirty room) for every lookup to find something
+WORDS = [
+    'listen', 'silent', 'enlist', 'tinsel', 'inlets', 'enlists',
+    'stop', 'pots', 'tops', 'spot', 'post', 'opts',
+    'retains', 'nastier', 'stainer', 'ratines',
+    'dormitory', 'dirty', 'room', 'level', 'noon', 'abba',
+]
+
+ENGINE_SETTINGS = ['WORDAPI_ANAGRAM_INDEX', 'WORDAPI_TRIGRAM_INDEX', 'WORDAPI_PHRASE_INDEX', 'WORDAPI_RACK_INDEX', 'WORDAPI_PATTERN_INDEX', 'WORDAPI_COMPLETION_INDEX']
+
+# Most queries for saving a new word (a new alphagram family)
+WORD_SAVE_QUERIES = 16
+
+# Plan lines for full scans (of any table, aliased tables in subqueries included), searches with no label, alphagram or primary key bound, and sorts
+PLAN_PATTERNS = {
+    'scan': re.compile(r'^SCAN (?!CONSTANT ROW)'),
+    'unbound': re.compile(r'^SEARCH (?!.*\((?:.* AND )?(?:label|alphagram_id|rowid)[=<>])'),
+    'sort': re.compile(r'^USE TEMP B-TREE'),
+}
+
+
+# Words spelled from these letters make the parity tests' dictionary: a few thousand words, in large anagram families
+PARITY_LETTERS = set('aeilnpst')
+
+
+# Batch anagram lookups in the parity tests: families that grow, shrink and appear with the writes, and a label that isn't a word
+PARITY_BATCH = ['spaniel', 'pines', 'spine', 'zest', 'stez', 'missing']
+
+
+# One request to budget:
+#   name: URL name in urls.py
+#   path: request path- formatted with ids of rows from setUpTestData, for detail routes
+#   engine_queries / db_queries: most queries with engines on / off
+#   index: index (or access path) the database plans have to use, if any
+#   allow: plan operations (PLAN_PATTERNS) the endpoint may use- 'unbound' only where the lookup can't be bounded (infix substrings, letter subsets)
+Case = namedtuple('Case', ['name', 'method', 'path', 'engine_queries', 'db_queries', 'index', 'allow'], defaults=((),))
+
+CASES = [
+    # Infix LIKE matches read the language's labels (covering index), unless the trigram index answers
+    Case('substrings', 'get', '/api/substrings/ist/', 0, 1, 'wordapi_word_lang_label_idx', allow=('unbound',)),
+    Case('substrings', 'get', '/api/substrings/ist/?has_anagrams=true&anagrams=true', 0, 1, 'wordapi_word_lang_label_idx', allow=('unbound',)),
+    Case('substrings', 'get', '/api/substrings/i/', 1, 1, 'wordapi_word_lang_label_idx', allow=('unbound',)),
+    Case('substrings', 'get', '/api/substrings/ist/?language=French', 1, 1, 'wordapi_word_lang_label_idx', allow=('unbound',)),
+    Case('anagrams', 'get', '/api/anagrams/listen/', 0, 1, 'wordapi_word_lang_label_idx'),
+    Case('anagrams', 'get', '/api/anagrams/listen/?language=French', 1, 1, 'wordapi_word_lang_label_idx'),
+    Case('batch_anagrams', 'post', '/api/batchanagrams/', 0, 2, 'wordapi_word_lang_label_idx'),
+    # Ordered by label[1:], top 10 kept. The infix match subquery reads the language's labels; families are then fetched by alphagram.
+    Case('anagrams_by_substring', 'get', '/api/substringanagrams/ist/', 0, 1, '(alphagram_id=?)', allow=('sort', 'unbound')),
+    Case('anagrams_by_substring', 'get', '/api/substringanagrams/i/', 1, 1, 'wordapi_shortsubstring'),
+    # Alphagrams and words spelled from the input's letters: letter subsets have no index bound
+    Case('phrase_anagrams', 'get', '/api/phraseanagrams/dormitory/', 0, 2, 'wordapi_alphagram_language_id_label', allow=('unbound',)),
+    Case('racks', 'get', '/api/racks/retains/', 0, 1, 'wordapi_word_lang_label_idx', allow=('unbound',)),
+    Case('patterns', 'get', '/api/patterns/l.st.n/', 0, 1, 'wordapi_word_lang_label_idx (language_id=? AND label>? AND label<?)'), # Leading letters bound the labels
+    Case('patterns', 'get', '/api/patterns/.ilent/', 0, 1, 'wordapi_word_lang_label_idx', allow=('unbound',)),
+    Case('patterns', 'get', '/api/patterns/listen./?blanks=true', 0, 1, 'wordapi_alphagram_language_id_label'),
+    Case('near_anagrams', 'get', '/api/nearanagrams/listen/', 0, 1, 'wordapi_alphagram_language_id_label'),
+    Case('near_anagrams', 'get', '/api/nearanagrams/listen/?language=French', 1, 1, 'wordapi_alphagram_language_id_label'),
+    Case('complete', 'get', '/api/complete/li/', 0, 1, 'wordapi_word_lang_label_idx (language_id=? AND label>? AND label<?)'),
+    Case('complete', 'get', '/api/complete/li/?order=length', 0, 1, None, allow=('sort',)), # Ordered by length, within the prefix's words
+    Case('short_substrings', 'get', '/api/shortsubstrings/li/', 1, 1, 'wordapi_shortsubstring'),
+    Case('stats', 'get', '/api/stats/', 1, 1, 'INTEGER PRIMARY KEY'),
+    Case('engines', 'get', '/api/engines/', 0, 0, None),
+    Case('metrics', 'get', '/api/metrics/', 0, 0, None),
+    Case('index', 'get', '/', 1, 1, 'INTEGER PRIMARY KEY'),
+    Case('api-root', 'get', '/api/', 0, 0, None),
+    # Listings page through an index in order: a scan bounded by the page size, but never a sort. The total count is a scan of its own, unless skipped.
+    Case('word-list', 'get', '/api/words/', 2, 2, 'wordapi_word_label_id_idx', allow=('scan', 'unbound')),
+    Case('word-list', 'get', '/api/words/?count=false', 1, 1, 'wordapi_word_label_id_idx', allow=('scan', 'unbound')),
+    Case('word-list', 'get', '/api/words/?language=French', 2, 2, 'wordapi_word_lang_label_idx', allow=('scan', 'unbound')),
+    Case('word-list', 'get', '/api/words/?count=false&cursor=%(cursor)s', 1, 1, 'wordapi_word_label_id_idx (label>?)'), # Later pages: a range, not a scan
+    Case('word-list', 'get', '/api/words/?count=false&cursor=%(reverse_cursor)s', 1, 1, 'wordapi_word_label_id_idx (label<?)'),
+    Case('word-detail', 'get', '/api/words/%(word)d/', 1, 1, 'INTEGER PRIMARY KEY'),
+    Case('wordlanguage-list', 'get', '/api/languages/', 2, 2, 'sqlite_autoindex_wordapi_wordlanguage', allow=('scan',)),
+    Case('wordlanguage-detail', 'get', '/api/languages/%(language)d/', 1, 1, 'INTEGER PRIMARY KEY'),
+    Case('alphagram-list', 'get', '/api/alphagrams/', 2, 2, 'wordapi_alphagram_label_id_idx', allow=('scan',)),
+    Case('alphagram-detail', 'get', '/api/alphagrams/%(alphagram)d/', 1, 1, 'INTEGER PRIMARY KEY'),
+]
+
+
+def url_names(patterns):
+    """ Set of every URL name in a list of URL patterns, included patterns too
+    """
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+class QueryRecorder():
+    """ Database execute wrapper keeping (sql, params) of every query: plans are explained with the parameters bound, as the app runs them.
+        (SQL with parameter values inlined can get a different plan.)
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql="", params=()):
+    """ EXPLAIN QUERY PLAN detail lines of a query
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def run_on_commit():
+    """ Run the callbacks waiting on the test transaction's commit (version bumps, engine updates), as a real commit would. A TestCase never commits.
+    """
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for savepoint_ids, callback in callbacks:
+        callback()
+
+
+def reset_derived_data():
+    """ Drop in-process state built from another test database: engine builds, the version stamp and language lookups
+    """
+    for engine in ENGINES:
+        engine._data, engine.version = None, None
+    versioning._state.clear()
+    languages._state['version'] = None
+    ingest._short_state['version'] = None
+
+
+@override_settings(WORDAPI_RESPONSE_CACHE_SIZE=0, WORDAPI_VERSION_CHECK_SECONDS=3600)
+class EndpointQueryTests(TestCase):
+    """ Query budgets and query plans of every API endpoint, on a small English dictionary and the same words loaded as French
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(WORDS))
+        try:
+            # Word.save() and init_db print
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command('init_db', '--bulk', dict_file=f.name, stdout=io.StringIO())
+                call_command('init_db', '--bulk', dict_file=f.name, language='French', normalization='casefold,fold_accents', stdout=io.StringIO())
+        finally:
+            os.remove(f.name)
+        reset_derived_data()
+
+        cls.ids = {
+            'word': Word.objects.get(label='listen', language__label='English').id,
+            'language': WordLanguage.objects.get(label='English').id,
+            'alphagram': Alphagram.objects.get(label='eilnst', language__label='English').id,
+        }
+        listen = Word.objects.get(id=cls.ids['word'])
+        cls.ids['cursor'] = KeysetPagination().encode_cursor(False, listen.label, listen.id)
+        cls.ids['reverse_cursor'] = KeysetPagination().encode_cursor(True, listen.label, listen.id)
+
+    def request(self, client, case):
+        path = case.path % self.ids
+        if case.method == 'post':
+            return client.post(path, data='["listen", "stop", "dirty"]', content_type='application/json')
+        return client.get(path)
+
+    def measure(self, case):
+        """ (response, (sql, params) of its queries) of a warm request: a first request builds engines and reads languages, the second is measured
+        """
+        client = Client()
+        self.request(client, case)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.request(client, case)
+        return response, recorder.queries
+
+    def check_case(self, case, max_queries):
+        response, queries = self.measure(case)
+        self.assertEqual(response.status_code, 200, case.path)
+        self.assertLessEqual(len(queries), max_queries, "%s ran %d queries (budget %d):\n%s" % (
+            case.path, len(queries), max_queries, "\n".join(sql for sql, params in queries)
+        ))
+
+        plans = [(sql, explain(sql, params)) for sql, params in queries]
+        for sql, plan in plans:
+            for operation, pattern in PLAN_PATTERNS.items():
+                if operation not in case.allow:
+                    self.assertFalse(any(pattern.match(line) for line in plan), "%s: %s in plan:\n%s\n%s" % (case.path, operation, sql, plan))
+        if case.index and plans:
+            self.assertTrue(
+                any(case.index in line for sql, plan in plans for line in plan),
+                "%s doesn't use %s:\n%s" % (case.path, case.index, "\n".join("%s\n%s" % plan for plan in plans)),
+            )
+
+    def test_every_url_is_budgeted(self):
+        self.assertEqual(url_names(urls.urlpatterns) - {case.name for case in CASES}, set())
+
+    def test_engine_query_budgets(self):
+        for case in CASES:
+            with self.subTest(path=case.path):
+                self.check_case(case, case.engine_queries)
+
+    def test_database_query_budgets(self):
+        with self.settings(**{setting: False for setting in ENGINE_SETTINGS}):
+            for case in CASES:
+                with self.subTest(path=case.path):
+                    self.check_case(case, case.db_queries)
+
+    def test_listings_count_unless_skipped(self):
+        client = Client()
+        self.assertEqual(client.get('/api/words/').json()['count'], Word.objects.count())
+        self.assertEqual(client.get('/api/alphagrams/?count=true').json()['count'], Alphagram.objects.count())
+        self.assertNotIn('count', client.get('/api/words/?count=false').json())
+
+    def short_substring_rows(self):
+        return list(ShortSubstring.objects.order_by('label').values_list('label', 'match_count', 'words', 'anagrams', 'version'))
+
+    @override_settings(WORDAPI_SHORT_SUBSTRING_TOP_N=3)
+    def test_short_substrings_follow_word_writes(self):
+        # Rows are kept current by word writes, as a rebuild would leave them: top-N lists short enough for removals to refill them
+        ingest.build_short_substrings(2, 3, language=WordLanguage.default())
+        with contextlib.redirect_stdout(io.StringIO()):
+            Word(label='tinsels').save() # A new family member, with a new substring
+            relabeled = Word.objects.get(label='stop', language__label='English')
+            relabeled.label = 'spots'
+            relabeled.save() # Leaves one family, starts another
+            Word.objects.get(label='listen', language__label='English').delete()
+            Word.objects.get(label='abba', language__label='English').delete() # The last word containing 'ab' and 'bb'
+            Word.objects.get(label='listen', language__label='French').delete() # Other languages leave the rows alone
+        run_on_commit()
+        kept = self.short_substring_rows()
+        ingest.build_short_substrings(2, 3, language=WordLanguage.default())
+        self.assertEqual(kept, self.short_substring_rows())
+
+        # Served from the rows, not queried
+        client = Client()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn('enlists', [word['label'] for word in client.get('/api/substringanagrams/ti/').json()])
+            self.assertIn('tinsels', [word['label'] for word in client.get('/api/shortsubstrings/ls/').json()['results']])
+            self.assertEqual(client.get('/api/substringanagrams/ab/').status_code, 404)
+        self.assertEqual([query['sql'] for query in queries if '"wordapi_word"' in query['sql']], [])
+
+    def test_word_save_query_budget(self):
+        # Signals, family refresh and statistics updates included
+        with contextlib.redirect_stdout(io.StringIO()), CaptureQueriesContext(connection) as queries:
+            Word(label='tinsels').save()
+        self.assertLessEqual(len(queries), WORD_SAVE_QUERIES, "\n".join(query['sql'] for query in queries))
+
+
+@override_settings(WORDAPI_RESPONSE_CACHE_SIZE=0, WORDAPI_VERSION_CHECK_SECONDS=3600)
+class LookupParityTests(TestCase):
+    """ Endpoints give the same results however they're answered: from in-process engines or queries, by rewritten queries or the ones they replaced
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        labels = ingest.read_dictionary_labels(os.path.join(settings.BASE_DIR, 'data', 'dictionary.txt'))
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(label for label in labels if 3 <= len(label) <= 7 and set(label) <= PARITY_LETTERS))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command('init_db', '--bulk', dict_file=f.name, stdout=io.StringIO())
+        finally:
+            os.remove(f.name)
+        reset_derived_data()
+
+    def tearDown(self):
+        reset_derived_data() # Built from writes that are rolled back now
+
+    def request(self, path, engines=True, **overrides):
+        """ (status code, JSON data) of a request with every engine on or off (then overrides): a GET, or a POST of a JSON list of labels for batch paths
+        """
+        with self.settings(**dict({setting: engines for setting in ENGINE_SETTINGS}, **overrides)):
+            if path.startswith('/api/batchanagrams/'):
+                response = Client().post(path, data=json.dumps(PARITY_BATCH), content_type='application/json')
+            else:
+                response = Client().get(path)
+        return response.status_code, response.json()
+
+    def write_words(self):
+        """ Word writes the engines have to follow (by in-place updates, or rebuilds): a new family member, a new alphagram with a new letter, a delete
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            Word(label='snipeal').save()
+            Word(label='zest').save()
+            Word.objects.get(label='spine').delete()
+        run_on_commit()
+
+    def assertEnginesMatchQueries(self, paths, variants=({},)):
+        """ Every path answers the same with engines on (and each variant of settings on top) and off- before and after word writes, with engines built beforehand
+        """
+        for when in ('before writes', 'after writes'):
+            if when == 'after writes':
+                self.write_words()
+            for path in paths:
+                off = self.request(path, False)
+                self.assertEqual(off[0], 200 if 'missing' not in path else 404, path)
+                for overrides in variants:
+                    with self.subTest(path=path, when=when, **overrides):
+                        self.assertEqual(self.request(path, True, **overrides), off)
+
+    def test_anagram_engine_matches_queries(self):
+        self.assertEnginesMatchQueries([
+            '/api/anagrams/spaniel/', '/api/anagrams/pastel/', '/api/anagrams/listen/', '/api/anagrams/missing/',
+            '/api/batchanagrams/',
+            '/api/substrings/spin/?anagrams=true', '/api/substrings/lin/?has_anagrams=true',
+        ])
+        self.assertIn('snipeal', [word['label'] for word in self.request('/api/anagrams/spaniel/')[1]])
+
+    def test_rack_engine_matches_queries(self):
+        self.assertEnginesMatchQueries([
+            '/api/racks/spaniel/', '/api/racks/aeilnpst/?min_length=5&limit=40', '/api/racks/zestpin/?max_length=4',
+        ], variants=({}, {'WORDAPI_RACK_INDEX': False})) # The matrix, and the letter-set and anagram indexes without it
+
+    def test_pattern_engine_matches_queries(self):
+        self.assertEnginesMatchQueries([
+            '/api/patterns/s.in./', '/api/patterns/pa*/', '/api/patterns/*ist/', '/api/patterns/.a.e*s/?limit=25',
+            '/api/patterns/spin./?blanks=true', '/api/patterns/est./?blanks=true', '/api/patterns/missing/',
+        ], variants=({}, {'WORDAPI_ANAGRAM_INDEX': False})) # Blank tiles probed in the anagram index, and queried with the alphabet of the pattern index
+        self.assertIn('zest', [word['label'] for word in self.request('/api/patterns/est./?blanks=true')[1]]) # A letter new to the alphabet
+
+    def test_completion_engine_matches_queries(self):
+        self.assertEnginesMatchQueries([
+            '/api/complete/sp/', '/api/complete/sni/?anagrams=true', '/api/complete/pla/?order=length', '/api/complete/st/?anagrams=true&limit=20',
+            '/api/complete/s/?order=length&limit=100', '/api/complete/missing/',
+        ])
+
+    def test_near_anagrams(self):
+        for engines in (True, False):
+            with self.subTest(engines=engines):
+                status_code, groups = self.request('/api/nearanagrams/stale/', engines)
+                self.assertEqual(status_code, 200)
+                added = {letter: [word['label'] for word in words] for letter, words in groups['added'].items()}
+                removed = {letter: [word['label'] for word in words] for letter, words in groups['removed'].items()}
+
+                self.assertIn('steals', added['s']) # stale + s
+                self.assertTrue({'pastel', 'plates', 'staple'} <= set(added['p']))
+                self.assertTrue({'tale', 'teal', 'late'} <= set(removed['s'])) # stale - s
+                self.assertEqual(sorted(added['p']), added['p']) # Words by label
+                self.assertFalse({'stale', 'steal', 'least', 'slate'} & {label for words in [*added.values(), *removed.values()] for label in words}) # Not its own anagrams
+                self.assertTrue(set(added) <= PARITY_LETTERS and set(removed) <= set('stale'))
+
+                self.assertEqual(self.request('/api/nearanagrams/qqq/', engines), (404, 'None'))
+                self.assertEqual(self.request('/api/nearanagrams/st4le/', engines), (404, 'None'))
+
+        self.assertEnginesMatchQueries(['/api/nearanagrams/stale/', '/api/nearanagrams/pines/', '/api/nearanagrams/set/'])
+        self.assertIn('z', self.request('/api/nearanagrams/set/')[1]['added']) # zest, a letter new to the alphabet
+
+    def baseline_substring_anagrams(self, substr=""):
+        """ AnagramBySubstringView results as the original view found them: every substring-match's anagrams, a family query per match.
+            (Ties on label[1:] were left in set order; they're broken by label and id here, as the view orders them.)
+        """
+        anagrams = set()
+        for subject in Word.objects.filter(label__icontains=substr):
+            anagrams.update(subject.alphagram.word_set.exclude(id=subject.id))
+        ordered = sorted(anagrams, key=lambda word: (word.label[1:], word.label, word.id))[:SUBSTRING_ANAGRAM_LIMIT]
+        return [{'id': word.id, 'label': word.label} for word in ordered]
+
+    def test_values_serializer_renders_as_model_serializer(self):
+        # Labels that need escaping, and characters JSONRenderer treats specially
+        special = ['na\u00efve', 'say "tea"', 'back\\slash', 'line\u2028break', 'tab\tstop', 'emoji \U0001f600']
+        with contextlib.redirect_stdout(io.StringIO()):
+            for label in special:
+                Word(label=label).save()
+        words = Word.objects.order_by('label', 'id')
+        rendered, expected = PrerenderedJSONRenderer().render, JSONRenderer().render
+
+        with self.subTest('list'):
+            self.assertEqual(rendered(WordValuesSerializer(words).json), expected(WordSerializer(words, many=True).data))
+
+        with self.subTest('detail'):
+            details = words.filter(label__in=special + ['spine'])
+            self.assertEqual(len(details), len(special) + 1)
+            for word in details:
+                self.assertEqual(rendered(WordValuesSerializer(words.filter(pk=word.pk)).json), b'[' + expected(WordSerializer(word).data) + b']')
+
+        with self.subTest('paginated'):
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(words, Request(APIRequestFactory().get('/api/words/')))
+            self.assertTrue(page)
+            values = WordValuesSerializer(words.filter(pk__in=[word.pk for word in page])).data
+            self.assertEqual(
+                rendered(paginator.get_paginated_response(values).data),
+                expected(paginator.get_paginated_response(WordSerializer(page, many=True).data).data),
+            )
+
+        with self.subTest('view'):
+            with self.settings(**{setting: False for setting in ENGINE_SETTINGS}):
+                response = Client().get('/api/substrings/ai/')
+            self.assertEqual(response.content, expected(WordSerializer(Word.objects.filter(label__icontains='ai'), many=True).data))
+
+    def test_substring_anagrams_match_the_original_query(self):
+        for substr in ['e', 'st', 'ist', 'ten', 'lap', 'tinea', 'sp', 'zz']:
+            expected = self.baseline_substring_anagrams(substr)
+            for engines in (True, False):
+                with self.subTest(substr=substr, engines=engines):
+                    self.assertEqual(self.request('/api/substringanagrams/%s/' % substr, engines), (200, expected) if expected else (404, 'None'))
+
+
+    def test_ndjson_streams_the_json_rows(self):
+        # One line per row of the JSON response, each exactly as JSONRenderer writes that row: from the trigram index and from a database cursor
+        for path in ['/api/substrings/pin/', '/api/substrings/pin/?anagrams=true', '/api/substrings/pin/?has_anagrams=true']:
+            for engines in (True, False):
+                with self.subTest(path=path, engines=engines), self.settings(**{setting: engines for setting in ENGINE_SETTINGS}):
+                    rows = Client().get(path).json()
+                    self.assertGreater(len(rows), 1)
+                    response = Client().get(path + ('&' if '?' in path else '?') + 'format=ndjson')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(response.streaming)
+                    self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+                    lines = b"".join(response.streaming_content).split(b"\n")
+                    self.assertEqual(lines.pop(), b"")
+                    self.assertEqual(lines, [JSONRenderer().render(row) for row in rows])
+
+
+@override_settings(WORDAPI_RESPONSE_CACHE_SIZE=0, WORDAPI_VERSION_CHECK_SECONDS=3600)
+class PhraseAnagramTests(TestCase):
+    """ Phrase anagrams are found, each once with its words in order, fewest words first, within the search's limits and time budget
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(WORDS))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command('init_db', '--bulk', dict_file=f.name, stdout=io.StringIO())
+        finally:
+            os.remove(f.name)
+        reset_derived_data()
+
+    def tearDown(self):
+        reset_derived_data()
+
+    def request(self, path, engines=True, **overrides):
+        with self.settings(**dict({setting: engines for setting in ENGINE_SETTINGS}, **overrides)):
+            response = Client().get(path)
+        return response.status_code, response.json()
+
+    def test_phrase_results(self):
+        listen, stop = WORDS[:5], WORDS[6:12] # Families of 'listen' and 'stop', 'enlists' left out
+        expected = sorted(" ".join(sorted(pair)) for pair in itertools.product(listen, stop) if sorted(pair) != ['listen', 'stop'])
+        for engines in (True, False):
+            with self.subTest(engines=engines):
+                self.assertEqual(self.request('/api/phraseanagrams/dormitory/', engines), (200, {'phrase': 'dormitory', 'complete': True, 'results': ['dirty room']}))
+
+                status, data = self.request('/api/phraseanagrams/listen%20stop/', engines)
+                self.assertEqual((status, data['complete']), (200, True))
+                self.assertEqual(data['results'], expected) # Own words left out, none repeated, each phrase's words in order
+                self.assertEqual(data['results'], sorted(set(data['results']), key=lambda phrase: (phrase.count(" "), phrase)))
+
+                status, data = self.request('/api/phraseanagrams/listen%20stop/?limit=5', engines)
+                self.assertEqual((status, data['complete'], data['results']), (200, False, expected[:5]))
+
+    def test_time_budget(self):
+        for engines in (True, False):
+            with self.subTest(engines=engines):
+                start = time.perf_counter()
+                status, data = self.request('/api/phraseanagrams/listen%20stop/', engines, WORDAPI_PHRASE_TIME_BUDGET=0)
+                self.assertLess(time.perf_counter() - start, 0.5)
+                self.assertEqual((status, data['complete'], data['results']), (200, False, []))
+
+
+class BulkLoadTests(TestCase):
+    """ init_db --bulk leaves the same words and alphagrams as saving each word
+    """
+
+    def load(self, labels, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(labels))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command('init_db', *args, dict_file=f.name, stdout=io.StringIO())
+        finally:
+            os.remove(f.name)
+
+    def snapshot(self):
+        return sorted(Word.objects.values_list('label', 'alphagram__label', 'is_palindrome', 'language__label'))
+
+    def test_bulk_load_matches_word_saves(self):
+        labels = ['listen', 'Silent', '', 'enlist', 'level', 'stop', 'pots', 'stop'] # Mixed case, a blank line, a repeated word
+        self.load(labels)
+        saved = self.snapshot()
+        Word.objects.all().delete()
+        Alphagram.objects.all().delete()
+
+        self.load(labels, '--bulk')
+        self.assertEqual(self.snapshot(), saved)
+        self.assertEqual(Alphagram.objects.count(), 3)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """ Read-only requests read from a replica snapshot, writes stay on the primary.
+
+        Snapshots need committed data: the backup API can't copy a database with a write transaction open on it.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for label in WORDS[:6]:
+                Word(label=label).save()
+
+        # A file replica in place of the test mirror
+        self.directory = tempfile.mkdtemp()
+        self.replica = connections['replica']
+        self.mirror_settings = self.replica.settings_dict
+        self.replica.close()
+        self.replica.settings_dict = dict(self.mirror_settings, NAME='file:%s?mode=ro' % os.path.join(self.directory, 'replica.sqlite3'))
+        routing._state['checked_at'] = None
+
+    def tearDown(self):
+        self.replica.close()
+        self.replica.settings_dict = self.mirror_settings
+        routing._state['checked_at'] = None
+        reset_derived_data()
+        shutil.rmtree(self.directory)
+
+    def snapshot(self):
+        call_command('snapshot_replicas', 'replica', stdout=io.StringIO())
+        routing._state['checked_at'] = None
+        reset_derived_data()
+
+    def test_reads_stay_on_primary_without_a_snapshot(self):
+        with routing.read_replica() as alias:
+            self.assertIsNone(alias)
+            self.assertEqual(router.db_for_read(Word), 'default')
+
+    def test_read_only_requests_read_from_replica(self):
+        self.snapshot()
+        for path in ['/api/anagrams/listen/', '/api/words/', '/api/words/%d/' % Word.objects.get(label='listen').id]:
+            with self.subTest(path=path), CaptureQueriesContext(connection) as primary, CaptureQueriesContext(self.replica) as replica:
+                response = Client().get(path)
+            self.assertEqual(response.status_code, 200)
+            primary_reads = [query['sql'] for query in primary if 'wordapi_dictionaryversion' not in query['sql']] # The version stamp is the primary's
+            self.assertEqual(primary_reads, [])
+            self.assertGreater(len(replica), 0)
+
+    def test_writes_go_to_primary(self):
+        self.snapshot()
+        with routing.read_replica():
+            self.assertEqual(router.db_for_read(Word), 'replica')
+            self.assertEqual(router.db_for_write(Word), 'default')
+        self.assertEqual(router.db_for_read(Word), 'default')
+
+        # Replicas are read-only, and lag the primary until the next snapshot
+        with contextlib.redirect_stdout(io.StringIO()):
+            Word(label='tinsels').save()
+        self.assertFalse(Word.objects.using('replica').filter(label='tinsels').exists())
+        self.snapshot()
+        self.assertTrue(Word.objects.using('replica').filter(label='tinsels').exists())
+
+    @override_settings(WORDAPI_RESPONSE_CACHE_SIZE=0, WORDAPI_VERSION_CHECK_SECONDS=0)
+    def test_engines_stay_current_while_a_replica_is_behind(self):
+        self.snapshot()
+        self.assertEqual(Client().get('/api/anagrams/listen/').status_code, 200) # Engines built from the replica
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            Word(label='tinsels').save()
+        for engine in ENGINES:
+            engine._data = None # Rebuilt, as engines that can't apply a write in place are
+
+        for attempt in range(4):
+            response = Client().get('/api/anagrams/enlists/')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('tinsels', [word['label'] for word in response.json()])
+
+
+class VersionBumpTests(TransactionTestCase):
+    """ Writes inside deferred_version_bump() make one bump, on exit, and report the version it made
+    """
+
+    def tearDown(self):
+        reset_derived_data()
+
+    def test_deferred_bump_reports_the_new_version(self):
+        version = versioning.current_version()
+        self.assertEqual(anagram_index.anagrams('listen'), None) # Built before the writes
+        with versioning.deferred_version_bump() as bump, contextlib.redirect_stdout(io.StringIO()):
+            for label in WORDS[:3]:
+                Word(label=label).save()
+            self.assertIsNone(versioning.bump_version())
+            self.assertEqual(versioning.current_version(), version)
+
+        self.assertEqual(bump['version'], version + 1)
+        self.assertEqual(versioning.current_version(), version + 1)
+        self.assertEqual([word['label'] for word in anagram_index.anagrams('listen')], ['enlist', 'silent'])
+
+
+class DictionarySyncTests(TestCase):
+    """ sync_db leaves the same words, families and statistics as loading the new dictionary from scratch, and touches nothing else
+    """
+
+    def load(self, command, labels, *args, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(labels))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command(command, *args, dict_file=f.name, stdout=io.StringIO(), **options)
+        finally:
+            os.remove(f.name)
+
+    def snapshot(self):
+        words = sorted(Word.objects.values_list('label', 'anagram_count', 'is_palindrome', 'language__label'))
+        alphagrams = sorted(
+            (alpha_label, word_count, [label for word_id, label in json.loads(family)], language) # Ids differ between loads
+            for alpha_label, word_count, family, language in Alphagram.objects.values_list('label', 'word_count', 'family', 'language__label')
+        )
+        stats = stats_data(get_stats())
+        del stats['updated_at']
+        return words, alphagrams, stats
+
+    def test_sync_matches_a_fresh_load(self):
+        synced = [label for label in WORDS if label not in ('tinsel', 'level', 'room')] + ['silents', 'listens']
+        self.load('init_db', ['listen', 'silent', 'level'], '--bulk', language='French')
+
+        self.load('init_db', synced, '--bulk')
+        expected = self.snapshot()
+        Word.objects.filter(language__label='English').delete()
+        Alphagram.objects.filter(language__label='English').delete()
+
+        self.load('init_db', WORDS + ['stop'], '--bulk') # A repeated word, as a dictionary loaded twice leaves
+        version = versioning.current_version()
+        self.load('sync_db', synced)
+        self.assertEqual(self.snapshot(), expected)
+        self.assertGreater(versioning.current_version(), version)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.load('sync_db', synced)
+        self.assertFalse([query['sql'] for query in queries if not query['sql'].startswith('SELECT')])
+
+
+@override_settings(WORDAPI_RESPONSE_CACHE_SIZE=16, WORDAPI_VERSION_CHECK_SECONDS=3600)
+class ResponseCacheTests(TestCase):
+    """ Lookups are answered from the response cache until the dictionary changes, and only cached 200s carry an ETag or get a 304
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(WORDS))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command('init_db', '--bulk', dict_file=f.name, stdout=io.StringIO())
+        finally:
+            os.remove(f.name)
+        reset_derived_data()
+
+    def setUp(self):
+        response_cache.clear()
+
+    def tearDown(self):
+        reset_derived_data()
+
+    def word_queries(self, client, path, **headers):
+        """ (response, number of queries of the words table) of a GET
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path, **headers)
+        return response, len([query for query in queries if '"wordapi_word"' in query['sql']])
+
+    def test_hits_etags_and_not_modified(self):
+        client = Client()
+        response, queried = self.word_queries(client, '/api/substrings/i/') # Single letters are always queried
+        self.assertEqual((response.status_code, queried), (200, 1))
+        etag = response['ETag']
+
+        cached, queried = self.word_queries(client, '/api/substrings/i/')
+        self.assertEqual((cached.status_code, queried, cached['ETag']), (200, 0, etag))
+        self.assertEqual(cached.json(), response.json())
+
+        not_modified, queried = self.word_queries(client, '/api/substrings/i/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((not_modified.status_code, queried, not_modified['ETag']), (304, 0, etag))
+
+    def test_errors_get_no_etag(self):
+        client = Client()
+        etag = client.get('/api/anagrams/listen/')['ETag']
+        for i in range(2):
+            response = client.get('/api/anagrams/zzzz/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse(response.has_header('ETag'))
+
+    def test_version_bump_drops_cached_responses(self):
+        client = Client()
+        response = client.get('/api/substrings/nsel/')
+        self.assertEqual([word['label'] for word in response.json()], ['tinsel'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            Word(label='tinsels').save()
+        run_on_commit()
+
+        changed = client.get('/api/substrings/nsel/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual([word['label'] for word in changed.json()], ['tinsel', 'tinsels'])
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    @override_settings(WORDAPI_RESPONSE_CACHE_MAX_ROWS=2)
+    def test_large_responses_are_not_cached(self):
+        client = Client()
+        for i in range(2):
+            response, queried = self.word_queries(client, '/api/substrings/i/')
+            self.assertEqual((response.status_code, queried), (200, 1))
+            self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(response_cache.stats()['entries'], 0)
+
+
+@override_settings(WORDAPI_RESPONSE_CACHE_SIZE=0, WORDAPI_VERSION_CHECK_SECONDS=3600, WORDAPI_TRIGRAM_INDEX=False)
+class RequestTimingTests(TestCase):
+    """ Requests carry a Server-Timing header and feed the /api/metrics/ histograms; serializer work counts as serialization, not view time
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("\n".join(WORDS))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call_command('init_db', '--bulk', dict_file=f.name, stdout=io.StringIO())
+        finally:
+            os.remove(f.name)
+        reset_derived_data()
+
+    def tearDown(self):
+        reset_derived_data()
+        request_metrics.clear()
+
+    def test_server_timing_and_histograms(self):
+        client = Client()
+        client.get('/api/substrings/ist/') # Languages read
+        request_metrics.clear()
+        response = client.get('/api/substrings/ist/')
+        self.assertRegex(
+            response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries", view;dur=[\d.]+, serialize;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+        lines = client.get('/api/metrics/').content.decode('utf-8').splitlines()
+        for metric in ('request_seconds', 'sql_seconds', 'view_seconds', 'serialize_seconds'):
+            self.assertIn('wordapi_%s_count{view="substrings"} 1' % metric, lines)
+        self.assertIn('wordapi_request_queries_bucket{view="substrings",le="0"} 0', lines)
+        self.assertIn('wordapi_request_queries_bucket{view="substrings",le="1"} 1', lines)
+
+    def test_serializer_work_is_serialization(self):
+        timings = middleware.RequestTimings()
+        timings.view_start = time.perf_counter()
+        middleware._active.timings = timings
+        try:
+            for serializer in (WordSerializer(Word.objects.all(), many=True), WordSerializer(Word.objects.first()), WordValuesSerializer(Word.objects.all())):
+                seconds = timings.serializer_seconds
+                serializer.data
+                self.assertGreater(timings.serializer_seconds, seconds, serializer)
+            timings.serializer_seconds = 0.0
+            with middleware.serializing():
+                with middleware.serializing(): # Counted once
+                    time.sleep(0.05)
+        finally:
+            middleware._active.timings = None
+        timings.view_end = timings.render_end = time.perf_counter()
+
+        values = timings.values(timings.view_end)
+        self.assertGreaterEqual(values['serialize_seconds'], 0.05)
+        self.assertLess(values['serialize_seconds'], values['request_seconds'] + 0.001)
+        self.assertLess(values['view_seconds'], 0.05)
+
+
+class SingleFlightTests(SimpleTestCase):
+    """ Concurrent calls with one key run once and share the result, unless waiting times out
+    """
+
+    def run_concurrently(self, flights, calls=8, timeout=5.0):
+        """ (runs of the computation, results) of concurrent calls, made while the first call's computation is held up
+        """
+        release, started, runs, results = threading.Event(), threading.Event(), [], []
+
+        def compute():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        def call():
+            results.append(flights.do('key', compute, timeout, group='view'))
+
+        threads = [threading.Thread(target=call) for i in range(calls)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.2) # Callers are waiting (or timed out)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return runs, results
+
+    def test_concurrent_calls_share_one_run(self):
+        flights = SingleFlight()
+        runs, results = self.run_concurrently(flights)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(results), [('result', False)] + [('result', True)] * 7)
+        self.assertEqual(flights.stats(), {'view': {'executed': 1, 'coalesced': 7, 'timeouts': 0}})
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_waiting_times_out(self):
+        flights = SingleFlight()
+        runs, results = self.run_concurrently(flights, calls=3, timeout=0.01)
+        self.assertEqual(len(runs), 3)
+        self.assertEqual(flights.stats()['view']['timeouts'], 2)
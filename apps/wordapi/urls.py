@@ -33,11 +33,57 @@ urlpatterns = [
     re_path(r'^api/anagrams?\/$', views.AnagramView.as_view(), name="anagrams"),
     re_path(r'^api/anagrams?\/(?P<label_input>.+)/$', views.AnagramView.as_view(), name="anagrams"),
     
+    # Batch anagram route - POST a JSON list (or newline-delimited text) of labels, for a map of label to anagrams
+    # ex: /api/batchanagrams/
+    path('api/batchanagrams/', views.BatchAnagramView.as_view(), name="batch_anagrams"),
+
     # Substring Anagram API routes - Anagrams of words containing queried substring, sorted by 2nd character
     # ex: /api/substringanagrams/foo
     re_path(r'^api/substringanagrams?\/$', views.AnagramBySubstringView.as_view(), name="anagrams_by_substring"), 
     re_path(r'^api/substringanagrams?\/(?P<substr_input>.+)/$', views.AnagramBySubstringView.as_view(), name="anagrams_by_substring"),
     
+    # Phrase anagram routes - combinations of words using exactly the input's letters
+    # ex: /api/phraseanagrams/dormitory
+    re_path(r'^api/phraseanagrams?\/$', views.PhraseAnagramView.as_view(), name="phrase_anagrams"),
+    re_path(r'^api/phraseanagrams?\/(?P<phrase_input>.+)/$', views.PhraseAnagramView.as_view(), name="phrase_anagrams"),
+
+    # Rack routes - words spelled from a rack of letters, longest first
+    # ex: /api/racks/retains?min_length=5&limit=20
+    re_path(r'^api/racks?\/$', views.RackView.as_view(), name="racks"),
+    re_path(r'^api/racks?\/(?P<letters_input>.+)/$', views.RackView.as_view(), name="racks"),
+
+    # Pattern routes - crossword-style patterns: '?' (or '.') for one letter, '*' for any letters
+    # ex: /api/patterns/l.st.n , /api/patterns/..ag* , /api/patterns/list..?blanks=true
+    re_path(r'^api/patterns?\/$', views.PatternView.as_view(), name="patterns"),
+    re_path(r'^api/patterns?\/(?P<pattern_input>.+)/$', views.PatternView.as_view(), name="patterns"),
+
+    # Near-anagram routes - anagrams of the input plus or less one letter, grouped by that letter
+    # ex: /api/nearanagrams/stale
+    re_path(r'^api/nearanagrams?\/$', views.NearAnagramView.as_view(), name="near_anagrams"),
+    re_path(r'^api/nearanagrams?\/(?P<letters_input>.+)/$', views.NearAnagramView.as_view(), name="near_anagrams"),
+
+    # Completion routes - top-k words starting with a prefix, for typeahead
+    # ex: /api/complete/lis?limit=5&order=length&anagrams=true
+    re_path(r'^api/complete\/$', views.CompletionView.as_view(), name="complete"),
+    re_path(r'^api/complete\/(?P<prefix_input>.+)/$', views.CompletionView.as_view(), name="complete"),
+
+    # Short substring routes - precomputed match count and first words, for 1-2 character substrings
+    # ex: /api/shortsubstrings/a
+    re_path(r'^api/shortsubstrings?\/$', views.ShortSubstringView.as_view(), name="short_substrings"),
+    re_path(r'^api/shortsubstrings?\/(?P<substr_input>.+)/$', views.ShortSubstringView.as_view(), name="short_substrings"),
+
+    # Dictionary statistics - counts, family-size distribution, largest anagram families (precomputed)
+    # ex: /api/stats/?top=10
+    path('api/stats/', views.DictionaryStatsView.as_view(), name="stats"),
+
+    # In-process lookup engine stats - build time, memory footprint
+    # ex: /api/engines/
+    path('api/engines/', views.EngineStatsView.as_view(), name="engines"),
+
+    # Request metrics, Prometheus text format - per-URL-name timing histograms
+    # ex: /api/metrics/
+    path('api/metrics/', views.MetricsView.as_view(), name="metrics"),
+
 
     ####################
     ##  Non-API paths ##
@@ -0,0 +1,105 @@
+""" Dictionary-Words / Anagram API - Dictionary version stamp
+
+    Derived, in-process data (lookup engines, cached responses) is only valid for the dictionary it was built from.
+    A single DictionaryVersion row is bumped whenever words change, by Word save/delete signals and by init_db after bulk loads.
+
+    - current_version() is what readers check. It only goes to the database once per WORDAPI_VERSION_CHECK_SECONDS, so request paths stay off SQLite.
+    - The version is the primary ('default') database's, whichever database a request reads from. Replicas' own stamps are checked separately
+      (current_version(alias)), and a replica behind the primary isn't read from- see routing.py.
+    - Bumps made in this process are seen immediately; bumps from other processes (e.g. a manage.py init_db run) within the check interval.
+    - deferred_version_bump() batches many writes (a save()-based dictionary load) under one bump.
+"""
+
+import threading, time
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from .models import DictionaryVersion
+
+
+_state = {} # database alias -> {'version', 'checked_at'}
+_deferred = threading.local()
+
+
+def _check_seconds():
+    return getattr(settings, 'WORDAPI_VERSION_CHECK_SECONDS', 5)
+
+
+def _alias_state(using='default'):
+    return _state.setdefault(using, {'version': 0, 'checked_at': None})
+
+
+def _read_version(using='default'):
+    """ Version stamp as stored in a database. 0 if it has never been bumped (or the table doesn't exist yet).
+    """
+    try:
+        return DictionaryVersion.objects.using(using).filter(pk=1).values_list('version', flat=True).first() or 0
+    except DatabaseError:
+        return 0
+
+
+def current_version(using='default'):
+    """ Current dictionary version of a database (the primary's, by default), re-read from it at most once per check interval.
+
+        Read from the database named, not routed: a request reading from a replica still gets the primary's version.
+    """
+    state = _alias_state(using)
+    now = time.monotonic()
+    if state['checked_at'] is None or now - state['checked_at'] >= _check_seconds():
+        state['version'] = _read_version(using)
+        state['checked_at'] = now
+    return state['version']
+
+
+def expire_version(using='default'):
+    """ Have the next current_version() of a database re-read it, e.g. after a replica snapshot
+    """
+    _state.pop(using, None)
+
+
+def bump_version():
+    """ Increment the dictionary version stamp. Returns the new version- the version before it is always one less.
+
+        Inside deferred_version_bump(), the bump is recorded and made once on exit instead, and None is returned: there's no new version yet.
+    """
+    if getattr(_deferred, 'depth', 0):
+        _deferred.pending = True
+        return None
+
+    state = _alias_state()
+    with transaction.atomic(using='default'):
+        DictionaryVersion.objects.get_or_create(pk=1)
+        DictionaryVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        state['version'] = _read_version()
+
+    state['checked_at'] = time.monotonic()
+    return state['version']
+
+
+def bump_deferred():
+    """ Boolean - if bumps are being deferred, inside deferred_version_bump()
+    """
+    return bool(getattr(_deferred, 'depth', 0))
+
+
+@contextmanager
+def deferred_version_bump():
+    """ Context manager batching every bump_version() call inside it into a single bump, on exit (once committed, inside a transaction).
+
+        Yields a dict whose 'version' is the version that bump made, once made- None if nothing was bumped.
+    """
+    if not getattr(_deferred, 'depth', 0):
+        _deferred.result = {'version': None}
+    _deferred.depth = getattr(_deferred, 'depth', 0) + 1
+    result = _deferred.result
+    try:
+        yield result
+    finally:
+        _deferred.depth -= 1
+        if not _deferred.depth and getattr(_deferred, 'pending', False):
+            _deferred.pending = False
+            transaction.on_commit(lambda: result.update(version=bump_version()))
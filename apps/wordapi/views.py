@@ -8,12 +8,14 @@
     There are attempts here to abstract out some API view class methods and behaviors to try to remain a bit abstract and keep code DRY. This could be enhanced further, especially if this app/project/API were to scale.
 """
 
-# Python libraries. Time and regular expressions
-import datetime, re
+# Python libraries. Time, JSON, iteration tools and regular expressions
+import datetime, itertools, json, re, string
 
-# Django HTTP libraries
+# Django settings, query functions and HTTP libraries
+from django.conf import settings
+from django.db.models.functions import Length
 from django.http import Http404
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 
 # Django rest libraries for responses and views
@@ -21,10 +23,24 @@ from rest_framework import viewsets
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-# API app serializers and data models
+# API app serializers, data models and in-process lookup engines
 from .serializers import *
 from .models import *
+from .engines import ENGINES, LetterCounts, anagram_index, completion_index, letter_set_index, pattern_index, rack_index, trigram_index
+from .engines import blank_alphagrams, blank_anagrams, near_alphagrams, near_anagrams, normalize_pattern, pattern_regex, rack_words, substring_anagrams
+from .caching import cached_response
+from .coalescing import coalesced_response
+from .ingest import chunked, short_substrings_version, substring_anagram_queryset
+from .renderers import NDJSONRenderer, ndjson_line
+from .pagination import KeysetPagination
+from .metrics import render_prometheus
+from .phrases import phrase_anagrams, phrase_letters
+from .stats import get_stats, stats_data
+from .languages import language_scope
+from .versioning import current_version
+from .routing import ReplicaReadMixin, read_replica
 
 
 #############################################
@@ -58,37 +74,164 @@ class ValidParamView():
         """ Boolean. False, if param is too short or isn't valid
 
             This is a hack for not processing very short queries on the DB, primarily for anagrams by substring.
-            NOTE: An expanded build would ideally encorpoate API views to a data model to handle shorter substring queries.
+            NOTE: Shorter substring queries are served from precomputed ShortSubstring data, where it's been generated- see short_substring().
         """
         if len(param_str) < param_len:
             return False
         else:
-            return self.valid_param
+            return self.valid_param(param_str)
+
+    def query_flag(self, request, name=""):
+        """ Boolean - if an optional query-string flag is on (?name=true / 1 / yes)
+        """
+        return request.query_params.get(name, "").lower() in ('1', 'true', 'yes')
+
+    def int_param(self, request, name="", default=None, maximum=None):
+        """ Positive integer query param, capped at maximum (if given). The default if absent or invalid.
+        """
+        try:
+            value = max(int(request.query_params[name]), 1)
+        except (KeyError, ValueError):
+            return default
+        return min(value, maximum) if maximum is not None else value
+
+    def language(self, request):
+        """ LanguageScope a request is scoped to: ?language=<label>, else the default language. None for an unknown language (views 404).
+
+            In-process engines only serve the default language (language.default); views query other languages, filtered by language.
+        """
+        return language_scope(request.query_params.get('language'))
+
+    def short_substrings_stale(self):
+        """ Boolean - if ShortSubstring rows are stamped with an earlier dictionary version, and can't be served.
+
+            Word writes keep the rows current, so this is brief: between a write's version bump and their restamp, or while they're rebuilt.
+        """
+        built_version = short_substrings_version()
+        return built_version is not None and built_version != current_version()
+
+    def short_substring(self, param_str="", language=None):
+        """ Precomputed ShortSubstring row for a short substring query, by exact label. None if the param isn't short, or there are no rows to serve.
+
+            Rows are precomputed for the default language only, and served at the dictionary version they're stamped with only (None while stale).
+            Substrings no word contains have no row: they get an empty, unsaved one.
+        """
+        if len(param_str) > getattr(settings, 'WORDAPI_SHORT_SUBSTRING_MAX_LENGTH', 2) or (language is not None and not language.default):
+            return None
+        if short_substrings_version() is None or self.short_substrings_stale():
+            return None
+        return ShortSubstring.objects.filter(label=param_str.lower()).first() or ShortSubstring(label=param_str.lower())
+
+
+
+""" Inheritable class for API views to stream large result sets as NDJSON
+
+    Opt-in by ?format=ndjson or an "Accept: application/x-ndjson" header. Rows are written as they're read (e.g. from a queryset's .iterator()),
+    so memory stays flat and the first bytes don't wait on the whole result set.
+"""
+class NDJSONStreamMixin():
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def wants_ndjson(self, request):
+        """ Boolean - if NDJSON was negotiated for the request
+        """
+        renderer = getattr(request, 'accepted_renderer', None)
+        return renderer is not None and renderer.format == NDJSONRenderer.format
+
+    def stream_ndjson(self, rows):
+        """ StreamingHttpResponse of NDJSON lines, from an iterable of row dicts. None if there are no rows (views can 404 instead).
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return None
+        return StreamingHttpResponse(
+            (ndjson_line(row) for row in itertools.chain([first], rows)),
+            content_type=NDJSONRenderer.media_type,
+        )
+
+    def stream_words(self, queryset):
+        """ NDJSON stream of a Word queryset's id and label, without building model instances
+        """
+        return self.stream_ndjson(
+            {'id': word_id, 'label': label}
+            for word_id, label in queryset.values_list('id', 'label').iterator()
+        )
 
 
 
 #################
 ##  API Views  ##
 #################
-class WordBySubstringView(ValidParamView, APIView):
+class WordBySubstringView(ReplicaReadMixin, NDJSONStreamMixin, ValidParamView, APIView):
     """ API view for Get word matching query-substring
+
+        Optional query-string flags:
+            ?anagrams=true : each word's anagrams inline, from denormalized family data (no second query)
+            ?has_anagrams=true : only words that have anagrams (indexed anagram_count predicate)
+            ?format=ndjson : rows streamed as newline-delimited JSON
+            ?language=<label> : words of that language (default: WORDAPI_DEFAULT_LANGUAGE)
     """
+    @cached_response
+    @coalesced_response(normalize=str.lower) # Substring searches ignore case
     def get(self, request, format=None, substr_input=""):
         """ API's GET method, for substring-input
 
             Queries Word model (dictionary words) for set of Words for which input is a substring.
+            Inputs of 3+ characters are searched in the in-process trigram index when it's enabled, rather than scanning the table.
         """
-        if self.valid_param(substr_input):
+        language = self.language(request)
+        if language is None:
+            return self.response_404_none()
+
+        include_anagrams = self.query_flag(request, 'anagrams')
+        has_anagrams = self.query_flag(request, 'has_anagrams')
+        in_memory = language.default and trigram_index.enabled() and (anagram_index.enabled() or not (include_anagrams or has_anagrams))
+
+        if self.valid_param(substr_input) and len(substr_input) >= trigram_index.min_length and in_memory:
+            if self.wants_ndjson(request):
+                # Streamed from the sorted matches: no list of word dicts, nor the whole body, built first
+                words = trigram_index.iter_search(substr_input)
+                if include_anagrams or has_anagrams:
+                    words = anagram_index.iter_with_anagrams(words, include_anagrams, has_anagrams)
+                return self.stream_ndjson(words) or self.response_404_none()
+
+            words = trigram_index.search(substr_input)
+            if include_anagrams or has_anagrams:
+                words = anagram_index.with_anagrams(words, include_anagrams, has_anagrams)
+            if words:
+                return Response(words)
+
+        elif self.valid_param(substr_input):
             # Validate query param
             try:
                 # Query filtering for case-insentive containment of the input-string (as a substring) in Word entry labels
-                queryset = Word.objects.filter(label__icontains=substr_input)
-                if not queryset:
+                queryset = Word.objects.filter(language_id=language.id, label__icontains=substr_input)
+                if has_anagrams:
+                    queryset = queryset.filter(anagram_count__gt=0)
+                if include_anagrams:
+                    queryset = queryset.select_related('alphagram')
+
+                if self.wants_ndjson(request):
+                    # Streamed straight from the database cursor
+                    if include_anagrams:
+                        streamed = self.stream_ndjson(WordFamilySerializer(word).data for word in queryset.iterator())
+                    else:
+                        streamed = self.stream_words(queryset)
+                    return streamed or self.response_404_none()
+
+                if include_anagrams:
+                    if not queryset:
+                        return self.response_404_none()
+                    return Response(WordFamilySerializer(queryset, many=True).data)
+
+                # Plain word lists skip model instances: (id, label) rows written straight to JSON
+                serializer = WordValuesSerializer(queryset)
+                if not serializer.rows:
                     return self.response_404_none()
                 else:
                     # Continue if queryset found
-                    serializer = WordSerializer(queryset, many=True)
-                    return Response(serializer.data)
+                    return Response(serializer.json)
             except:
                 # 404/"None" if no results
                 return self.response_404_none()
@@ -97,38 +240,49 @@ class WordBySubstringView(ValidParamView, APIView):
         return self.response_404_none()
 
 
-class AnagramView(ValidParamView, APIView):
+class AnagramView(ReplicaReadMixin, ValidParamView, APIView):
     """ Anagram fetching by Subject-Word label
         
         Queries alphagram of subject-word, filters for words associated, and returns that list sans the subject-word.
-        Returns a set of Word objects
+        Returns a set of Word objects. Without the in-process index, this is one query: the subject-word, joined with its alphagram's family data.
+        ?language=<label> looks the subject-word up in that language (default: WORDAPI_DEFAULT_LANGUAGE).
     """
+    @cached_response
     def get(self, request, format=None, label_input=""):
         """ API get method, takes URL query param
+
+            Answered from the in-process anagram index when it's enabled (no database queries), otherwise queried.
         """
-        if self.valid_param(label_input):
+        language = self.language(request)
+        if language is None:
+            return self.response_404_none()
+
+        if self.valid_param(label_input) and language.default and anagram_index.enabled():
+            anagrams = anagram_index.anagrams(label_input)
+            if anagrams:
+                return Response(anagrams)
+
+        elif self.valid_param(label_input):
             # query param valid- non-exmpty etc
             try:
-                subject_word = Word.objects.get(label=label_input) # Check for subject-word
+                subject_word = Word.objects.select_related('alphagram').get(language_id=language.id, label=label_input) # Check for subject-word
             except:
                 # Subject word doesn't exist in data 
                 # No anagrams. Return none.
                 return self.response_404_none()
             
             # If subject-word object was found:
-            queryset = subject_word.alphagram.word_set.all().exclude(id=subject_word.id)  
-            # Anagram queryset
-            # Set of words sharing same alphagram as the subject-word, excluding the subject-word itself.
+            # Anagrams are the words in its alphagram's (denormalized) family, excluding the subject-word itself.
+            anagrams = subject_word.alphagram.family_words(exclude_id=subject_word.id)
             
-            if queryset.count():
-                # Final check for anagrams present in queryset, else 404
-                serializer = WordSerializer(queryset, many=True)
-                return Response(serializer.data)
+            if anagrams:
+                # Final check for anagrams present, else 404
+                return Response(anagrams)
         
         return self.response_404_none()
 
 
-class AnagramBySubstringView(ValidParamView, APIView):
+class AnagramBySubstringView(ReplicaReadMixin, NDJSONStreamMixin, ValidParamView, APIView):
     """ Anagrams
 
         - Validates query-param
@@ -136,72 +290,487 @@ class AnagramBySubstringView(ValidParamView, APIView):
         - Finds anagrams of said words
         - Returns them ordered by 2nd char (index at [1])
 
-        Enforced here: digits and substring parameters with length less than 2 are ignored.
+        Enforced here: digits and substring parameters with length less than 2 are ignored, unless answered from precomputed ShortSubstring data.
+        ?language=<label> searches that language's words (default: WORDAPI_DEFAULT_LANGUAGE).
     """
+    @cached_response
+    @coalesced_response(normalize=str.lower) # Substring searches ignore case
     def get(self, request, format=None, substr_input=""):
         """ GET request method, taking URL param
+
+            Short substrings with precomputed ShortSubstring data are answered from that row. While the rows are stale, single characters are queried too.
         """
-        if self.long_valid_param(substr_input):
+        language = self.language(request)
+        if language is None:
+            return self.response_404_none()
+
+        short = self.short_substring(substr_input, language) if self.valid_param(substr_input) else None
+        if short is not None:
+            anagrams = json.loads(short.anagrams)
+            if anagrams:
+                return Response(anagrams)
+            return self.response_404_none()
+
+        min_length = 1 if language.default and self.short_substrings_stale() else 2
+        if self.long_valid_param(substr_input, min_length):
             # Valid query substring
 
-            subject_word_set = Word.objects.filter(label__icontains=substr_input) # Queryset of words containing substring. Used as subject-words for anagram fetching.
-            
-            anagram_set = set() # set of anagrams found
-
-            # Nested iterator for anagrams of all subject-words (substring-matches) into anagram list:
-            for subject in subject_word_set:
-                # Iterate every subject-word in queryset
-                anagrams = subject.alphagram.word_set.all().exclude(id=subject.id) # Set of anagrams of the current subject-word (excluding the subject word itself)
-                
-                for ana in anagrams: # Iterate current set of anagrams
-                    anagram_set.add(ana)
-            
-            if anagram_set:
-                # Anagram set isn't empty
-                anagram_set = sorted(anagram_set, key=lambda x: x.label[1:], reverse=False)[:10] # First 10 items of set of results, after sorting by their 2nd character
-                serializer = WordSerializer(anagram_set, many=True)
-                return Response(serializer.data)
+            if language.default and anagram_index.enabled() and trigram_index.enabled() and len(substr_input) >= trigram_index.min_length:
+                # Both in-process indexes are on: no database queries at all
+                anagrams = substring_anagrams(substr_input, SUBSTRING_ANAGRAM_LIMIT)
+            else:
+                anagrams = WordValuesSerializer(substring_anagram_queryset(substr_input, language.id)).data
+
+            if anagrams:
+                return Response(anagrams)
         
         return self.response_404_none()
 
 
+class BatchAnagramView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Anagrams for many words in one request
+
+        POST a JSON list of labels (or {"labels": [...]}), or a newline-delimited text body.
+        Returns a map of each label to its anagrams, as AnagramView gives them- or null where AnagramView would 404.
+        Batches are limited to WORDAPI_BATCH_MAX_SIZE labels. ?language=<label> in the query-string looks labels up in that language.
+    """
+
+    replica_methods = ('post',) # A lookup: POST only to carry the labels
+
+    def _labels(self, request):
+        """ Labels from the request body, stripped, blanks dropped. None if the body isn't a list of labels.
+        """
+        if request.content_type.startswith('application/json'):
+            labels = request.data.get('labels') if isinstance(request.data, dict) else request.data
+            if not isinstance(labels, list) or not all(isinstance(label, str) for label in labels):
+                return None
+        else:
+            labels = request.body.decode('utf-8').splitlines()
+        return [label.strip() for label in labels if label.strip()]
+
+    def _anagrams_by_label(self, labels, language_id=None):
+        """ Anagrams of many subject-words (in a language) from a few IN queries (per chunk of labels): subject-words, then their alphagrams' family data.
+        """
+        subjects = {} # label -> (word id, alphagram id); None for homographs, which AnagramView doesn't resolve
+        for chunk in chunked(labels, 500):
+            for word_id, label, alpha_id in Word.objects.filter(language_id=language_id, label__in=chunk).order_by().values_list('id', 'label', 'alphagram_id'):
+                subjects[label] = None if label in subjects else (word_id, alpha_id)
+
+        alpha_ids = sorted({subject[1] for subject in subjects.values() if subject})
+        families = {}
+        for chunk in chunked(alpha_ids, 500):
+            families.update(Alphagram.objects.filter(id__in=chunk).order_by().values_list('id', 'family'))
+
+        results = {}
+        for label, subject in subjects.items():
+            if subject:
+                word_id, alpha_id = subject
+                results[label] = [
+                    {'id': family_id, 'label': family_label}
+                    for family_id, family_label in json.loads(families[alpha_id])
+                    if family_id != word_id
+                ]
+        return results
+
+    def post(self, request, format=None):
+        """ POST request method, taking labels in the request body
+        """
+        language = self.language(request)
+        if language is None:
+            return self.response_404_none()
+
+        labels = self._labels(request)
+        if labels is None:
+            return Response('Expected a JSON list of labels, or one label per line.', status=status.HTTP_400_BAD_REQUEST)
+
+        max_size = getattr(settings, 'WORDAPI_BATCH_MAX_SIZE', 500)
+        if len(labels) > max_size:
+            return Response('Batch too large: at most %d labels.' % max_size, status=status.HTTP_400_BAD_REQUEST)
+
+        valid_labels = [label for label in labels if self.valid_param(label)]
+        if language.default and anagram_index.enabled():
+            anagrams = {label: anagram_index.anagrams(label) for label in valid_labels}
+        else:
+            anagrams = self._anagrams_by_label(valid_labels, language.id)
+
+        # Same rules as AnagramView: no subject-word, or no anagrams, is null
+        return Response({label: anagrams.get(label) or None for label in labels})
+
+
+class PhraseAnagramView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Phrase anagrams: combinations of dictionary words using exactly the input's letters, e.g. "dormitory" -> "dirty room". See phrases.py.
+
+        Inputs are limited to WORDAPI_PHRASE_MAX_LETTERS letters (spaces and punctuation ignored).
+        Optional query-string params, capped by settings:
+            ?max_words=N : most words per phrase (WORDAPI_PHRASE_MAX_WORDS)
+            ?limit=N : most phrases returned (WORDAPI_PHRASE_MAX_RESULTS)
+            ?language=<label> : words of that language (default: WORDAPI_DEFAULT_LANGUAGE)
+        "complete" is false when the search stopped at a limit, or its time budget (WORDAPI_PHRASE_TIME_BUDGET)- with whatever was found, maybe nothing.
+    """
+    @cached_response
+    def get(self, request, format=None, phrase_input=""):
+        """ GET request method, taking URL param
+        """
+        language = self.language(request)
+        letters = phrase_letters(phrase_input)
+        if not self.valid_param(phrase_input) or not letters or language is None:
+            return self.response_404_none()
+
+        max_letters = getattr(settings, 'WORDAPI_PHRASE_MAX_LETTERS', 20)
+        if len(letters) > max_letters:
+            return Response('Phrase too long: at most %d letters.' % max_letters, status=status.HTTP_400_BAD_REQUEST)
+
+        max_words = getattr(settings, 'WORDAPI_PHRASE_MAX_WORDS', 4)
+        max_results = getattr(settings, 'WORDAPI_PHRASE_MAX_RESULTS', 100)
+        phrases, complete = phrase_anagrams(
+            phrase_input,
+            max_words=self.int_param(request, 'max_words', max_words, max_words),
+            max_results=self.int_param(request, 'limit', max_results, max_results),
+            seconds=getattr(settings, 'WORDAPI_PHRASE_TIME_BUDGET', 0.25),
+            language=language,
+        )
+        if not phrases and complete:
+            return self.response_404_none()
+        return Response({'phrase': phrase_input, 'complete': complete, 'results': phrases})
+
+
+class RackView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Words spelled from a rack of letters: each letter used at most as often as it's in the rack. Longest words first, then by label.
+
+        Answered by one vectorized comparison over a letter-count matrix of every word (RackIndex, with NumPy), else from the letter-set and anagram indexes, else queried.
+        Racks are limited to WORDAPI_RACK_MAX_LETTERS letters.
+        Optional query-string params:
+            ?min_length=N, ?max_length=N : word lengths
+            ?limit=N : top N words by length (at most WORDAPI_RACK_MAX_RESULTS)
+            ?language=<label> : words of that language (default: WORDAPI_DEFAULT_LANGUAGE)
+    """
+    @cached_response
+    def get(self, request, format=None, letters_input=""):
+        """ GET request method, taking URL param
+        """
+        language = self.language(request)
+        letters = phrase_letters(letters_input)
+        if not self.valid_param(letters_input) or not letters or language is None:
+            return self.response_404_none()
+
+        max_letters = getattr(settings, 'WORDAPI_RACK_MAX_LETTERS', 30)
+        if len(letters) > max_letters:
+            return Response('Rack too long: at most %d letters.' % max_letters, status=status.HTTP_400_BAD_REQUEST)
+
+        max_results = getattr(settings, 'WORDAPI_RACK_MAX_RESULTS', 500)
+        min_length = self.int_param(request, 'min_length', 1)
+        max_length = self.int_param(request, 'max_length')
+        limit = self.int_param(request, 'limit', max_results, max_results)
+
+        if language.default and rack_index.enabled():
+            words = rack_index.words_within(letters, min_length, max_length, limit)
+        elif language.default and letter_set_index.enabled() and anagram_index.enabled():
+            words = rack_words(letters, min_length, max_length, limit)
+        else:
+            words = self.rack_query(letters, min_length, max_length, limit, language.id)
+
+        if not words:
+            return self.response_404_none()
+        return Response(words)
+
+    def rack_query(self, letters="", min_length=1, max_length=None, limit=None, language_id=None):
+        """ Rack words (in a language) from the database: words of the rack's letters only (REGEXP), then letter counts checked here
+        """
+        counts = LetterCounts(letters)
+        rack = counts.pack(letters)
+        max_length = min(max_length or len(letters), len(letters))
+
+        queryset = Word.objects.filter(language_id=language_id).annotate(length=Length('label')).filter(
+            label__regex='^[%s]+$' % "".join(sorted(set(letters))), length__gte=min_length, length__lte=max_length,
+        )
+        words = sorted(
+            (-len(label), label, word_id)
+            for word_id, label in queryset.values_list('id', 'label').iterator()
+            if counts.fits(counts.pack(label), rack)
+        )
+        return [{'id': word_id, 'label': label} for length, label, word_id in words[:limit]]
+
+
+class PatternView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Crossword-style pattern search: letters at fixed positions, '?' for any one letter and '*' for any letters (or none), e.g. l?st?n or ??ag*
+
+        '?' has to be URL-encoded (%3F) in a path; '.' or '_' work too, and '%' for '*'.
+        Answered from the in-process positional index (PatternIndex) when it's enabled, otherwise by a REGEXP query (over a range of the label index, when the pattern starts with letters). Words are ordered by label.
+
+        Optional query-string params:
+            ?blanks=true : blank-tile mode- the pattern's letters with each '?' as a blank tile, for anagrams using them (at most WORDAPI_PATTERN_MAX_BLANKS blanks)
+            ?limit=N : most words returned (WORDAPI_PATTERN_MAX_RESULTS)
+            ?language=<label> : words of that language (default: WORDAPI_DEFAULT_LANGUAGE)
+    """
+    @cached_response
+    def get(self, request, format=None, pattern_input=""):
+        """ GET request method, taking URL param
+        """
+        language = self.language(request)
+        pattern = normalize_pattern(pattern_input)
+        if not self.valid_param(pattern) or not all(char.isalpha() or char in '?*' for char in pattern) or language is None:
+            return self.response_404_none()
+
+        max_results = getattr(settings, 'WORDAPI_PATTERN_MAX_RESULTS', 500)
+        limit = self.int_param(request, 'limit', max_results, max_results)
+
+        if self.query_flag(request, 'blanks'):
+            words = self.blank_words(pattern, limit, language)
+            if words is None:
+                max_blanks = getattr(settings, 'WORDAPI_PATTERN_MAX_BLANKS', 2)
+                return Response('Blank-tile patterns take letters and at most %d blanks (?).' % max_blanks, status=status.HTTP_400_BAD_REQUEST)
+        elif language.default and pattern_index.enabled():
+            words = pattern_index.matches(pattern, limit)
+        else:
+            queryset = Word.objects.filter(language_id=language.id, label__regex='^' + pattern_regex(pattern).pattern.replace(r'\Z', '$'))
+            prefix = re.match(r'[^?*]*', pattern).group() # Leading letters: a range of the label index, not a read of every label
+            if prefix:
+                queryset = queryset.filter(label__gte=prefix, label__lt=prefix + '\uffff')
+            words = WordValuesSerializer(queryset.order_by('label', 'id')[:limit]).data
+
+        if not words:
+            return self.response_404_none()
+        return Response(words)
+
+    def blank_words(self, pattern="", limit=None, language=None):
+        """ Anagrams (in a language) of the pattern's letters plus one blank tile per '?'. None if the pattern has a '*', no letters, or too many blanks.
+        """
+        letters = pattern.replace('?', '')
+        blanks = pattern.count('?')
+        if '*' in pattern or not letters or blanks > getattr(settings, 'WORDAPI_PATTERN_MAX_BLANKS', 2):
+            return None
+
+        alphabet = pattern_index.alphabet() if language.default and pattern_index.enabled() else string.ascii_lowercase
+        if language.default and anagram_index.enabled():
+            return blank_anagrams(letters, blanks, alphabet, limit)
+
+        probes = sorted(set(blank_alphagrams(letters, blanks, alphabet, language.normalization)))
+        words = []
+        for chunk in chunked(probes, 500):
+            words += Word.objects.filter(alphagram__language_id=language.id, alphagram__label__in=chunk).order_by().values_list('label', 'id')
+        return [{'id': word_id, 'label': label} for label, word_id in sorted(words)[:limit]]
+
+
+class NearAnagramView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Near-anagrams: words that are an anagram of the input's letters plus one letter, or less one letter (e.g. stale -> steals, tale)
+
+        Each neighbouring alphagram is one probe of the in-process anagram index when it's enabled (a letter of the alphabet added, or a letter removed),
+        otherwise one query for all of them, over the alphagram label index.
+        Results are grouped by the letter added or removed: {"added": {"s": [...]}, "removed": {"s": [...]}}, words ordered by label.
+
+        Optional query-string params:
+            ?language=<label> : words of that language (default: WORDAPI_DEFAULT_LANGUAGE)
+    """
+    @cached_response
+    def get(self, request, format=None, letters_input=""):
+        """ GET request method, taking URL param
+        """
+        language = self.language(request)
+        letters = letters_input.lower()
+        if not self.valid_param(letters) or not letters.isalpha() or language is None:
+            return self.response_404_none()
+
+        alphabet = pattern_index.alphabet() if language.default and pattern_index.enabled() else string.ascii_lowercase
+        alphabet = "".join(sorted(set(make_alphagram(alphabet, language.normalization)))) # Letters as alphagrams spell them
+        if language.default and anagram_index.enabled():
+            groups = near_anagrams(letters, alphabet)
+        else:
+            groups = self.query_near_anagrams(letters, alphabet, language)
+
+        if not groups['added'] and not groups['removed']:
+            return self.response_404_none()
+        return Response(groups)
+
+    def query_near_anagrams(self, letters="", alphabet="", language=None):
+        """ near_anagrams() results from the database: the words of every neighbouring alphagram, in one query
+        """
+        probes = {
+            alpha_label: (change, letter)
+            for change, letter, alpha_label in near_alphagrams(make_alphagram(letters, language.normalization), alphabet)
+        }
+        words = Word.objects.filter(alphagram__language_id=language.id, alphagram__label__in=list(probes)).order_by().values_list('alphagram__label', 'label', 'id')
+
+        groups = {'added': {}, 'removed': {}}
+        for alpha_label, label, word_id in sorted(words, key=lambda word: (word[1], word[2])):
+            change, letter = probes[alpha_label]
+            groups[change].setdefault(letter, []).append({'id': word_id, 'label': label})
+        return {change: dict(sorted(group.items())) for change, group in groups.items()}
+
+
+class CompletionView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Prefix completions, for search-box typeahead: the top k words starting with the prefix
+
+        Answered by bisect over sorted label arrays (CompletionIndex) when it's enabled- cost doesn't grow with the number of words sharing the prefix.
+        Not response-cached: lookups are already sub-millisecond, and typeahead keys would crowd out the cache.
+
+        Optional query-string params:
+            ?limit=N : completions returned (default WORDAPI_COMPLETION_DEFAULT_K, at most WORDAPI_COMPLETION_MAX_K)
+            ?order=length : shortest completions first (default: alphabetical)
+            ?anagrams=true : each completion's anagram count
+            ?language=<label> : words of that language (default: WORDAPI_DEFAULT_LANGUAGE)
+    """
+    def get(self, request, format=None, prefix_input=""):
+        """ GET request method, taking URL param
+        """
+        language = self.language(request)
+        if not self.valid_param(prefix_input) or language is None:
+            return self.response_404_none()
+
+        prefix = prefix_input.lower()
+        limit = self.int_param(
+            request, 'limit', getattr(settings, 'WORDAPI_COMPLETION_DEFAULT_K', 10), getattr(settings, 'WORDAPI_COMPLETION_MAX_K', 100)
+        )
+        by_length = request.query_params.get('order') == 'length'
+
+        if language.default and completion_index.enabled():
+            completions = completion_index.complete(prefix, limit, by_length)
+        else:
+            # A label range rather than startswith: SQLite can't search the (language, label) index by LIKE 'prefix%'
+            queryset = Word.objects.filter(language_id=language.id, label__gte=prefix, label__lt=prefix + '\uffff')
+            if by_length:
+                queryset = queryset.annotate(length=Length('label')).order_by('length', 'label')
+            else:
+                queryset = queryset.order_by('label')
+            completions = []
+            for label, anagram_count in queryset.values_list('label', 'anagram_count').iterator():
+                if not completions or completions[-1][0] != label: # Homographs complete once
+                    completions.append((label, anagram_count))
+                if len(completions) >= limit:
+                    break
+
+        if not completions:
+            return self.response_404_none()
+        if self.query_flag(request, 'anagrams'):
+            return Response([{'label': label, 'anagram_count': anagram_count} for label, anagram_count in completions])
+        return Response([{'label': label} for label, anagram_count in completions])
+
+
+class ShortSubstringView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Precomputed results for short substring queries, for type-as-you-search clients
+
+        Served by exact lookup of ShortSubstring data (generated by init_db), instead of scanning words.
+        Returns the number of words containing the substring, and the first of those words by label.
+        ShortSubstring data is for the default language; ?language=<label> for another language is queried instead,
+        as the default language is while its rows are stale (briefly: word writes keep them current, see short_substrings_stale()).
+    """
+    def get(self, request, format=None, substr_input=""):
+        """ GET request method, taking URL param
+        """
+        language = self.language(request)
+        if self.valid_param(substr_input) and language is not None:
+            if not language.default or self.short_substrings_stale():
+                return self.short_substring_query(substr_input.lower(), language.id)
+
+            short = self.short_substring(substr_input)
+            if short is not None and short.match_count:
+                return Response({
+                    'substring': short.label,
+                    'count': short.match_count,
+                    'results': json.loads(short.words),
+                })
+
+        return self.response_404_none()
+
+    def short_substring_query(self, substr="", language_id=None):
+        """ ShortSubstring-style response for a language without precomputed rows: a count and the first words, queried
+        """
+        if len(substr) > getattr(settings, 'WORDAPI_SHORT_SUBSTRING_MAX_LENGTH', 2):
+            return self.response_404_none()
+
+        queryset = Word.objects.filter(language_id=language_id, label__contains=substr)
+        words = WordValuesSerializer(queryset.order_by('label', 'id')[:getattr(settings, 'WORDAPI_SHORT_SUBSTRING_TOP_N', 50)]).data
+        if not words:
+            return self.response_404_none()
+        return Response({'substring': substr, 'count': queryset.count(), 'results': words})
+
+
+class DictionaryStatsView(ReplicaReadMixin, ValidParamView, APIView):
+    """ Dictionary statistics: word, language, alphagram, anagram family and palindrome counts, the family-size distribution, and the largest anagram families
+
+        Read from the precomputed DictionaryStats row (see stats.py)- one primary key lookup, however large the dictionary.
+
+        Optional query-string params:
+            ?top=N : largest families returned (default and most: WORDAPI_STATS_TOP_FAMILIES)
+    """
+    def get(self, request, format=None):
+        top_limit = getattr(settings, 'WORDAPI_STATS_TOP_FAMILIES', 50)
+        return Response(stats_data(get_stats(), self.int_param(request, 'top', top_limit, top_limit)))
+
+
+class EngineStatsView(APIView):
+    """ In-process lookup engine stats: enabled/built, dictionary version, build time and memory footprint.
+    """
+    def get(self, request, format=None):
+        return Response([engine.stats() for engine in ENGINES])
+
+
+class MetricsView(APIView):
+    """ Request timing histograms per URL name, response cache and engine figures, in Prometheus text format. See metrics.py.
+    """
+    def get(self, request, format=None):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 #############################
 ##  Default API View Sets  ##
 #############################
 """ Django Rest Framework boilerplate for Model API views
     Useful, but non-essential to this API
 """
-class WordViewSet(viewsets.ModelViewSet):
+class WordViewSet(ReplicaReadMixin, NDJSONStreamMixin, viewsets.ModelViewSet):
     """ API endpoint for dictionary words
+
+        Paginated by (label, id) cursor- see pagination.py. ?format=ndjson on the list streams every word (unpaginated), for full-dictionary exports.
+        ?language=<label> lists one language's words (an unknown language 404s).
     """
-    queryset = Word.objects.all().order_by('label')
+    queryset = Word.objects.all().order_by('label', 'id')
     serializer_class = WordSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super(WordViewSet, self).get_queryset()
+        label = self.request.query_params.get('language')
+        if label:
+            language = language_scope(label)
+            if language is None:
+                raise Http404
+            queryset = queryset.filter(language_id=language.id)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if self.wants_ndjson(request):
+            return self.stream_words(self.filter_queryset(self.get_queryset())) or Response([])
+        return super(WordViewSet, self).list(request, *args, **kwargs)
 
 
-class LanguageViewSet(viewsets.ModelViewSet):
+class LanguageViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ API endpoint that allows WordLanguages
     """
     queryset = WordLanguage.objects.all()
     serializer_class = LanguageSerializer
+    pagination_class = KeysetPagination
 
 
-class AlphagramViewSet(viewsets.ModelViewSet):
+class AlphagramViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ API endpoint that allows Alphagrams
 
         Primarily for testing!
     """
     queryset = Alphagram.objects.all()
     serializer_class = LanguageSerializer
+    pagination_class = KeysetPagination
 
 
 ###########################
 ##  Web Views (non-API)  ##
 ###########################
+@read_replica()
 def index(request):
+    stats = get_stats() # Precomputed counts, not COUNT(*) scans per page hit
     return HttpResponse(
         "<p>Word API index View</p><br />" +
-        "<h3>Words in data: " + str( Word.objects.count() ) + "</h3> "+
-        "<h3>Languages: " + str( WordLanguage.objects.count() ) + "</h3> "+
-        "<h3>Alphagrams: " + str( Alphagram.objects.count() ) + "</h3> "+
+        "<h3>Words in data: " + str( stats.word_count ) + "</h3> "+
+        "<h3>Languages: " + str( stats.language_count ) + "</h3> "+
+        "<h3>Alphagrams: " + str( stats.alphagram_count ) + "</h3> "+
         "<p><a href='/api/'>API</a></p>"
         )
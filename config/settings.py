@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.wordapi.middleware.RequestTimingMiddleware', # First, so request timings cover the rest
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,9 +89,19 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 600, # Persistent connections
+    },
+    # Read replica: a snapshot of default, made by manage.py snapshot_replicas, opened read-only. See apps/wordapi/routing.py
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:' + os.path.join(BASE_DIR, 'db.replica.sqlite3') + '?mode=ro',
+        'CONN_MAX_AGE': 60, # Connections move on to a new snapshot as they're recycled
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['apps.wordapi.routing.ReadReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -134,7 +145,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer', # JSON views default for API data
+        'apps.wordapi.renderers.PrerenderedJSONRenderer', # JSON views default for API data (DRF's JSONRenderer, plus pre-rendered list data)
         #'rest_framework.renderers.BrowsableAPIRenderer', # Web views turned off - personal preference :) 
     ),
 
@@ -145,4 +156,102 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSIONS_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
-}
\ No newline at end of file
+}
+
+
+# Word API - in-process lookup engines
+# Engines are built from dictionary data and rebuilt when the dictionary version stamp changes.
+# The stamp is re-read from the database at most once per WORDAPI_VERSION_CHECK_SECONDS.
+
+WORDAPI_VERSION_CHECK_SECONDS = 5
+
+WORDAPI_ANAGRAM_INDEX = True # AnagramView answers from memory
+WORDAPI_TRIGRAM_INDEX = True # Substring searches of 3+ characters use trigram posting lists, not LIKE scans
+
+
+# Word API - precomputed ShortSubstring results, generated by init_db
+# Substrings up to this length are served by exact lookup (3 is supported, at ~18k rows). Top-N words kept per substring.
+
+WORDAPI_SHORT_SUBSTRING_MAX_LENGTH = 2
+WORDAPI_SHORT_SUBSTRING_TOP_N = 50
+
+
+# Word API - response cache, for the substring and anagram endpoints
+# In-process LRU: max entries (0 turns it off), time-to-live in seconds, and most rows a cached response may hold. Cleared whenever the dictionary version changes.
+
+WORDAPI_RESPONSE_CACHE_SIZE = 1024
+WORDAPI_RESPONSE_CACHE_TTL = 300
+WORDAPI_RESPONSE_CACHE_MAX_ROWS = 5000
+
+
+# Word API - request coalescing, for the substring endpoints
+# Concurrent identical lookups (response cache misses) run once and share the result. Seconds a request waits on another before running itself.
+
+WORDAPI_COALESCE_REQUESTS = True
+WORDAPI_COALESCE_TIMEOUT = 5
+
+
+# Word API - batch anagram lookups: most labels accepted per request
+
+WORDAPI_BATCH_MAX_SIZE = 500
+
+
+# Word API - request metrics
+# Query count, SQL/view/serialization time per request, in a Server-Timing header and histograms at /api/metrics/
+
+WORDAPI_METRICS = True
+
+
+# Word API - phrase anagrams (multi-word), at /api/phraseanagrams/
+# Longest input in letters, most words per phrase, most phrases returned, and the search's time budget in seconds
+
+WORDAPI_PHRASE_INDEX = True # Candidate alphagrams from an in-process letter-set index, not a table scan
+WORDAPI_PHRASE_MAX_LETTERS = 20
+WORDAPI_PHRASE_MAX_WORDS = 4
+WORDAPI_PHRASE_MAX_RESULTS = 100
+WORDAPI_PHRASE_TIME_BUDGET = 0.25
+
+
+# Word API - words from a rack of letters, at /api/racks/
+# Longest rack in letters, and most words returned
+
+WORDAPI_RACK_INDEX = True # Letter-count matrix of every word, compared in one vectorized pass (needs NumPy; falls back without it)
+WORDAPI_RACK_MAX_LETTERS = 30
+WORDAPI_RACK_MAX_RESULTS = 500
+
+
+# Word API - crossword-style pattern search, at /api/patterns/
+# Most words returned, and most blank tiles in blank-tile (anagram) mode
+
+WORDAPI_PATTERN_INDEX = True # (position, letter) posting lists per word length, instead of REGEXP scans
+WORDAPI_PATTERN_MAX_RESULTS = 500
+WORDAPI_PATTERN_MAX_BLANKS = 2
+
+
+# Word API - prefix completions, at /api/complete/
+# Completions returned by default, and at most
+
+WORDAPI_COMPLETION_INDEX = True # Sorted label arrays searched by bisect, instead of LIKE 'prefix%' scans
+WORDAPI_COMPLETION_DEFAULT_K = 10
+WORDAPI_COMPLETION_MAX_K = 100
+
+
+# Word API - dictionary statistics, at /api/stats/ and on the index page
+# Largest anagram families kept precomputed (and the most /api/stats/?top= returns)
+
+WORDAPI_STATS_TOP_FAMILIES = 50
+
+
+# Word API - languages
+# Words saved without a language, and requests without ?language=, use this language (else the first language in data).
+# In-process engines are built from its words; other languages are served by language-filtered queries.
+
+WORDAPI_DEFAULT_LANGUAGE = "English"
+
+
+# Word API - read replicas
+# Reads of read-only API requests go to one of these DATABASES aliases (round-robin), writes and everything else to default.
+# SQLite replicas are skipped until snapshot_replicas has created their file. SQLite primaries use WAL journaling.
+
+WORDAPI_READ_REPLICAS = ['replica']
+WORDAPI_SQLITE_WAL = True
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Build in-process lookup engines at startup, rather than on the first request
+from apps.wordapi.engines import warm_engines
+warm_engines()